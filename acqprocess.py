@@ -0,0 +1,392 @@
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
+
+from acquisition import SweepEngine, print_log
+
+# Start method of the acquisition process. Forking a process that runs Tk is
+# unsafe, so spawn is used on every platform; pause and cancel events handed
+# to AcquisitionProcess must be created from this context.
+CONTEXT = multiprocessing.get_context("spawn")
+
+# Frames held by the ring buffer. The GUI only draws the newest one, the
+# other slots give the writer room while a frame is being copied out.
+RING_SLOTS = 4
+
+# Slot header: sequence, traces and points as int64, then the state label
+STATE_LABEL_BYTES = 32
+SLOT_HEADER_BYTES = 3 * 8 + STATE_LABEL_BYTES
+
+# Interval at which messages and frames are relayed to the GUI, in seconds
+RELAY_INTERVAL = 0.05
+
+# Time the acquisition process gets to exit after it reported, in seconds
+EXIT_TIMEOUT = 5.0
+
+
+class FrameRing:
+    """
+    Ring buffer of trace frames in shared memory, written by the acquisition
+    process and read by the GUI process without pickling or locks.
+
+    The buffer starts with the number of frames written so far, followed by
+    `slots` slots of a header (sequence, traces, points, state label) and
+    room for `capacity` float64 values. A slot's sequence is odd while the
+    slot is being written, so a reader that sees an odd or changed sequence
+    drops the frame instead of drawing a torn one.
+
+    Attributes:
+        name (str) : Shared memory name, used to attach from another process.
+        capacity (int) : Values a frame may hold at most.
+        slots (int) : Number of frames held.
+    """
+
+    def __init__(self, capacity, name=None, slots=RING_SLOTS):
+        """
+        Initialization Function
+
+        Args:
+            capacity (int): Values a frame may hold at most.
+            name (str, optional): Attach to an existing ring of that name.
+                Defaults to None (create a new one, removed on close).
+            slots (int, optional): Number of frames held.
+        """
+        import numpy as np
+
+        self.capacity = int(capacity)
+        self.slots = slots
+        self.slot_bytes = SLOT_HEADER_BYTES + 8 * self.capacity
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(
+            name=name, create=self.owner, size=8 + slots * self.slot_bytes
+        )
+        self.name = self.memory.name
+
+        buffer = self.memory.buf
+        self.count = np.ndarray((1,), dtype=np.int64, buffer=buffer)
+        self.headers = []
+        self.labels = []
+        self.values = []
+        for i in range(slots):
+            offset = 8 + i * self.slot_bytes
+            self.headers.append(
+                np.ndarray((3,), dtype=np.int64, buffer=buffer, offset=offset)
+            )
+            self.labels.append(buffer[offset + 24 : offset + SLOT_HEADER_BYTES])
+            self.values.append(
+                np.ndarray(
+                    (self.capacity,),
+                    dtype=np.float64,
+                    buffer=buffer,
+                    offset=offset + SLOT_HEADER_BYTES,
+                )
+            )
+        self.read_count = int(self.count[0])
+
+    def write(self, state, values):
+        """
+        Appends a frame, overwriting the oldest one. Only the acquisition
+        process writes.
+
+        Args:
+            state (int or str): Measured state or capture label.
+            values (np.ndarray): Traces, shape (traces, frequencies).
+
+        Returns:
+            bool: False if the frame is larger than the capacity
+        """
+        import numpy as np
+
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim != 2 or values.size > self.capacity:
+            return False
+
+        index = int(self.count[0])
+        slot = index % self.slots
+        header = self.headers[slot]
+        header[0] += 1
+        header[1], header[2] = values.shape
+        self.labels[slot][:] = (
+            str(state).encode()[:STATE_LABEL_BYTES].ljust(STATE_LABEL_BYTES, b"\0")
+        )
+        self.values[slot][: values.size] = values.ravel()
+        header[0] += 1
+        self.count[0] = index + 1
+        return True
+
+    def latest(self):
+        """
+        Returns the newest frame not read yet. Older unread frames are skipped.
+
+        Returns:
+            tuple or None: (state label, values copy), None if there is no new
+            or only a torn frame
+        """
+        count = int(self.count[0])
+        if count == self.read_count:
+            return None
+        self.read_count = count
+
+        slot = (count - 1) % self.slots
+        header = self.headers[slot]
+        sequence = int(header[0])
+        if sequence % 2:
+            return None
+
+        traces, points = int(header[1]), int(header[2])
+        values = self.values[slot][: traces * points].reshape(traces, points).copy()
+        state = bytes(self.labels[slot]).rstrip(b"\0").decode()
+        if int(header[0]) != sequence:
+            return None
+        return state, values
+
+    def close(self):
+        """Releases the buffer; the creating side also removes it"""
+        # Views into the buffer have to go before it can be closed
+        self.count = None
+        self.headers, self.labels, self.values = [], [], []
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+def connect_vna(resource_name):
+    """
+    Opens a VNA session of this process to a resource that is already known,
+    without scanning.
+
+    Args:
+        resource_name (str): VISA resource string.
+
+    Returns:
+        BaseVNA or None: Connected VNA, None if it did not answer
+    """
+    import pyvisa as visa
+
+    from vna import KeysightVNA, RohdeSchwartzVNA, VNAFactory
+
+    return VNAFactory.probe_resource(
+        visa.ResourceManager(), resource_name, (RohdeSchwartzVNA, KeysightVNA)
+    )
+
+
+def acquisition_main(job, ring_name, capacity, messages, pause_event, cancel_event):
+    """
+    Entry point of the acquisition process: connects to the VNA, runs one
+    SweepEngine call and reports through `messages` as ("log", message, tag),
+    ("axis", frequencies, trace names) and finally ("done", result).
+    """
+    from runner import make_settle
+
+    def log(message, tag="info"):
+        messages.put(("log", message, tag))
+
+    ring = FrameRing(capacity, name=ring_name)
+    axis = [None, None]
+    oversized = []
+
+    def on_traces(state, frequencies, names, values):
+        # The engine reuses its axis, so it is sent once rather than per frame
+        if frequencies is not axis[0] or names != axis[1]:
+            axis[:] = [frequencies, list(names)]
+            messages.put(("axis", list(frequencies), list(names)))
+        if not ring.write(state, values) and not oversized:
+            oversized.append(state)
+            log(
+                f"[WARN] Traces too large for the live view from state {state}",
+                "warning",
+            )
+
+    result = False
+    vna = None
+    try:
+        vna = connect_vna(job["resource"])
+        if vna is None:
+            log(
+                f"[ERROR] Acquisition process could not open {job['resource']}", "error"
+            )
+            return
+
+        engine = SweepEngine(
+            vna,
+            job["fpga"],
+            log=log,
+            settle=make_settle(vna, job["settle"], job["delay"], log),
+            pause_event=pause_event,
+            cancel_event=cancel_event,
+            on_traces=on_traces,
+            **job["options"],
+        )
+        result = getattr(engine, job["method"])(*job["args"])
+    except Exception as e:
+        log(f"[ERROR] Acquisition process failed: {e}", "error")
+    finally:
+        if vna is not None:
+            try:
+                vna.instru.close()
+            except Exception:
+                pass
+        ring.close()
+        messages.put(("done", bool(result)))
+
+
+class AcquisitionProcess:
+    """
+    Runs SweepEngine calls in a process of their own, so acquisition timing no
+    longer shares the GIL with Tk, plotting, analysis and logging, and the
+    other way round.
+
+    Only plain data crosses the process boundary: the job (engine options,
+    plans, folders) at start, log messages and the frequency axis over a
+    queue, pause and cancel as shared events, and the traces of every state
+    through a FrameRing. The VNA session of this process is released while
+    the acquisition process opens its own to the same resource, since
+    USB-TMC and GPIB instruments take one session at a time, and reopened
+    once it is done. The FPGA is triggered on the port found here.
+
+    Attributes:
+        vna (BaseVNA) : VNA connected in this process.
+        fpga (FPGA) : FPGA found in this process.
+        pause_event (multiprocessing.Event) : Set while the sweep is paused.
+        cancel_event (multiprocessing.Event) : Set to cancel the sweep.
+        log (callable) : Receives the process's log messages.
+        on_traces (callable or None) : Receives the newest traces, as
+            on_traces(state, frequencies, trace_names, values).
+    """
+
+    def __init__(
+        self,
+        vna,
+        fpga,
+        pause_event,
+        cancel_event,
+        log=None,
+        on_traces=None,
+        settle=None,
+        delay=0,
+    ):
+        """
+        Initialization Function
+
+        Args:
+            vna (BaseVNA): VNA connected in this process.
+            fpga (FPGA): FPGA found in this process; it is copied to the
+                acquisition process.
+            pause_event (multiprocessing.Event): Pause flag from CONTEXT.
+            cancel_event (multiprocessing.Event): Cancel flag from CONTEXT.
+            log (callable, optional): Progress callback. Defaults to print.
+            on_traces (callable, optional): Called with the newest traces,
+                at most every RELAY_INTERVAL seconds.
+            settle (dict, optional): Settle mode, tolerance and max_wait, as
+                in a test plan. Defaults to a fixed delay.
+            delay (float, optional): Settle delay in seconds. Defaults to 0.
+        """
+        self.vna = vna
+        self.fpga = fpga
+        self.pause_event = pause_event
+        self.cancel_event = cancel_event
+        self.log = log if log is not None else print_log
+        self.on_traces = on_traces
+        self.settle = settle or {"mode": "Fixed", "tolerance": 0, "max_wait": 0}
+        self.delay = delay
+
+    def run(self, method, *args, **options):
+        """
+        Runs engine.method(*args) in the acquisition process and relays its
+        messages and traces until it is done.
+
+        Args:
+            method (str): "run", "run_blocks", "resume" or "capture".
+            *args: Arguments of the engine method.
+            **options: SweepEngine options such as bands or mask.
+
+        Returns:
+            bool: Result of the engine method, False if the process failed
+        """
+        # No published frame is larger than the full sweep of channel 1
+        freqs, names = self.vna.get_trace_info()
+        ring = FrameRing(max(1, len(freqs) * len(names)))
+        messages = CONTEXT.Queue()
+        job = {
+            "method": method,
+            "args": args,
+            "options": options,
+            "resource": self.vna.resource_name,
+            "fpga": self.fpga,
+            "settle": self.settle,
+            "delay": self.delay,
+        }
+
+        process = CONTEXT.Process(
+            target=acquisition_main,
+            args=(
+                job,
+                ring.name,
+                ring.capacity,
+                messages,
+                self.pause_event,
+                self.cancel_event,
+            ),
+            daemon=True,
+        )
+
+        result = None
+        axis = None
+        self.vna.release()
+        try:
+            process.start()
+            while result is None:
+                try:
+                    message = messages.get(timeout=RELAY_INTERVAL)
+                except queue.Empty:
+                    message = None
+                    if not process.is_alive():
+                        # Its last messages may still be in flight
+                        try:
+                            message = messages.get(timeout=1)
+                        except queue.Empty:
+                            self.log(
+                                f"[ERROR] Acquisition process exited unexpectedly (code {process.exitcode})",
+                                "error",
+                            )
+                            result = False
+
+                if message is not None:
+                    kind, *payload = message
+                    if kind == "log":
+                        self.log(*payload)
+                    elif kind == "axis":
+                        axis = payload
+                    elif kind == "done":
+                        result = payload[0]
+
+                self.relay_frame(ring, axis)
+        finally:
+            if process.is_alive():
+                process.join(EXIT_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            ring.close()
+            try:
+                self.vna.reopen()
+            except Exception as e:
+                self.log(f"[ERROR] Could not reconnect to the VNA: {e}", "error")
+
+        return result
+
+    def relay_frame(self, ring, axis):
+        """Passes the newest frame of the ring to on_traces, if its axis is known"""
+        if self.on_traces is None or axis is None:
+            return
+
+        frame = ring.latest()
+        if frame is None:
+            return
+
+        import numpy as np
+
+        state, values = frame
+        freqs, names = axis
+        if values.shape == (len(names), len(freqs)):
+            self.on_traces(state, np.asarray(freqs), names, values)
@@ -0,0 +1,983 @@
+import os
+import time
+import uuid
+import contextlib
+
+from checkpoint import Checkpoint
+from vna import band_slice
+
+
+def print_log(message, tag="info"):
+    """Default progress callback, prints to the terminal"""
+    print(message)
+
+
+def settle_state(
+    vna, state, mode, delay, tolerance, max_wait, log=print_log, phase=None
+):
+    """
+    Waits for the DUT to settle after a state has been triggered. Fixed mode
+    sleeps for the delay, adaptive modes sleep for the delay and then poll the
+    VNA until successive readings agree within the tolerance.
+
+    Args:
+        vna (BaseVNA): Connected VNA.
+        state (int): Triggered state.
+        mode (str): "Fixed", "Adaptive (trace)" or "Adaptive (marker)".
+        delay (float): Fixed delay, the minimum wait in adaptive modes.
+        tolerance (float): dB or degrees between successive readings.
+        max_wait (float): Upper bound on adaptive settling in seconds.
+        log (callable, optional): Progress callback. Defaults to print.
+        phase (list[bool], optional): Phase flag per trace, see
+            BaseVNA.wait_for_settle. Defaults to reading them from the VNA.
+    """
+    time.sleep(delay)
+    if mode == "Fixed":
+        return
+
+    source = "marker" if mode == "Adaptive (marker)" else "trace"
+    settled, waited = vna.wait_for_settle(
+        tolerance, max_wait, source=source, phase=phase
+    )
+    if settled:
+        log(f"State {state} settled in {waited:.2f} s", "info")
+    else:
+        log(f"[WARNING] State {state} did not settle within {waited:.2f} s", "warning")
+
+
+def check_bands(bands, low, high):
+    """
+    Checks the bands saved from one sweep.
+
+    Args:
+        bands (list): (start, stop) of every band in GHz, main band first.
+        low (float): Start of the sweep in GHz.
+        high (float): Stop of the sweep in GHz.
+
+    Raises:
+        ValueError: If a band lies outside the sweep or is given twice.
+    """
+    seen = []
+    for start, stop in bands:
+        if not low <= start <= stop <= high:
+            raise ValueError(f"Band {start}-{stop} is not within the sweep range")
+        # Equal bands would append every state to the same files twice
+        if (start, stop) in seen:
+            raise ValueError(f"Band {start}-{stop} is given twice")
+        seen.append((start, stop))
+
+
+def check_mask_options(mask, channels):
+    """
+    Checks that a limit mask is not combined with further channels. A mask
+    is aligned to the traces of channel 1, so the states of other channels
+    would go unchecked.
+
+    Args:
+        mask (str or None): Limit mask file.
+        channels (list): Channels measured besides channel 1.
+
+    Raises:
+        ValueError: If both are given.
+    """
+    if mask and channels:
+        raise ValueError("A limit mask cannot be combined with further channels")
+
+
+class SweepEngine:
+    """
+    Runs a planned state sweep: triggers each state on the FPGA, waits for the
+    DUT to settle and saves the VNA traces.
+
+    Attributes:
+        vna (BaseVNA) : Connected VNA.
+        fpga (FPGA) : Connected FPGA.
+        log (callable) : Called as log(message, tag) for progress messages.
+        settle (callable) : Called with the state after it has been triggered.
+        pause_event (threading.Event or None) : Set while the sweep is paused.
+        cancel_event (threading.Event or None) : Set to cancel the sweep.
+        reference_folder (str or None) : Reference-line folder new sweeps are
+            normalized to.
+        on_traces (callable or None) : Receives the traces of every fetch.
+        bands (list[tuple]) : Additional (start, stop) bands in GHz.
+        channels (list[int]) : Further VNA channels measured with channel 1.
+        storage (bool) : Keep the traces on the VNA until the sweep is done.
+        screening (dict or None) : Screening setup replacing trace fetches.
+        mask (str or None) : Limit mask file states are checked against.
+        abort_on_fail (bool) : Stop at the first hard mask failure.
+    """
+
+    def __init__(
+        self,
+        vna,
+        fpga,
+        log=None,
+        settle=None,
+        pause_event=None,
+        cancel_event=None,
+        reference_folder=None,
+        on_traces=None,
+        bands=None,
+        channels=None,
+        storage=False,
+        screening=None,
+        mask=None,
+        abort_on_fail=False,
+    ):
+        """
+        Initialization Function
+
+        Args:
+            vna (BaseVNA): Connected VNA.
+            fpga (FPGA): Connected FPGA.
+            log (callable, optional): Progress callback. Defaults to print.
+            settle (callable, optional): Settle callback. Defaults to no wait.
+            pause_event (threading.Event, optional): Pause flag.
+            cancel_event (threading.Event, optional): Cancel flag.
+            reference_folder (str, optional): Reference-line folder new sweeps
+                are normalized to. Defaults to None (raw traces only).
+            on_traces (callable, optional): Called as on_traces(state,
+                frequencies, trace_names, values) with the saved band of every
+                fetch, e.g. to plot it. Must return quickly.
+            bands (list[tuple], optional): Additional (start, stop) bands in
+                GHz written from the same sweeps as the main band. Defaults to
+                None (main band only).
+            channels (list[int], optional): Further VNA channels fetched after
+                channel 1 for every state and saved in every band. Defaults to
+                None (channel 1 only).
+            storage (bool, optional): Store the traces of every state in files
+                on the VNA and transfer them once the sweep is done, instead
+                of fetching every state. Defaults to False.
+            screening (dict, optional): Screening setup from parse_screening.
+                Only marker values and limit flags are read per state, instead
+                of traces. Defaults to None (traces).
+            mask (str, optional): Limit mask file every fetched state is
+                checked against. Defaults to None (no check).
+            abort_on_fail (bool, optional): Stop the sweep at the first state
+                failing the mask hard. Defaults to False.
+        """
+        self.vna = vna
+        self.fpga = fpga
+        self.log = log if log is not None else print_log
+        self.settle = settle if settle is not None else lambda state: None
+        self.pause_event = pause_event
+        self.cancel_event = cancel_event
+        self.reference_folder = reference_folder
+        self.on_traces = on_traces
+        self.bands = [tuple(band) for band in bands or []]
+        self.channels = [channel for channel in channels or [] if channel != 1]
+        self.storage = storage
+        self.screening = screening
+        self.mask = mask
+        self.abort_on_fail = abort_on_fail
+        self.publish_axis = None
+
+    def should_continue(self):
+        """
+        Blocks while the sweep is paused.
+
+        Returns:
+            bool: False if the sweep has been cancelled
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            return False
+
+        while self.pause_event is not None and self.pause_event.is_set():
+            time.sleep(0.1)
+
+        return not (self.cancel_event is not None and self.cancel_event.is_set())
+
+    def run(self, plan, folder_name, start_freq, stop_freq):
+        """
+        Triggers and measures every state of a plan. A checkpoint manifest is
+        kept in the folder so the sweep can be resumed if it is interrupted.
+        With a reference folder, normalized copies of the traces are written
+        to the normalized/ subfolder next to the raw ones. Additional bands
+        are written next to the main band, named by their own range, and
+        further channels next to channel 1, named by their channel. In
+        screening mode only screening.csv is written.
+
+        Args:
+            plan (StatePlan): States to measure.
+            folder_name (str): Directory to store trace CSV files.
+            start_freq (float): Start frequency in GHz.
+            stop_freq (float): Stop frequency in GHz.
+
+        Returns:
+            bool: True if every state was measured
+        """
+        return self.sweep(self.prepare(plan, folder_name, start_freq, stop_freq))
+
+    def prepare(self, plan, folder_name, start_freq, stop_freq):
+        """
+        Creates the measurement folder and its checkpoint manifest.
+
+        Args:
+            plan (StatePlan): States to measure.
+            folder_name (str): Directory to store trace CSV files.
+            start_freq (float): Start frequency in GHz.
+            stop_freq (float): Stop frequency in GHz.
+
+        Returns:
+            Checkpoint: Checkpoint of the new sweep
+        """
+        os.makedirs(folder_name, exist_ok=True, mode=0o777)
+        if self.screening:
+            from screening import SCREENING_FILE
+
+            return Checkpoint.create(
+                folder_name,
+                plan,
+                self.vna.cached_configuration(),
+                start_freq,
+                stop_freq,
+                [SCREENING_FILE],
+                screening=self.screening,
+            )
+
+        _, trace_names = self.vna.cached_trace_info(start_freq, stop_freq)
+        for band_start, band_stop in self.bands:
+            _, band_names = self.vna.cached_trace_info(band_start, band_stop)
+            trace_names = trace_names + band_names
+        if self.reference_folder:
+            from reference import NORMALIZED_FOLDER
+
+            trace_names = trace_names + [
+                f"{NORMALIZED_FOLDER}/{name}" for name in trace_names
+            ]
+        for channel in self.channels:
+            for band_start, band_stop in [(start_freq, stop_freq)] + self.bands:
+                _, band_names = self.vna.cached_trace_info(
+                    band_start, band_stop, channel
+                )
+                trace_names = trace_names + band_names
+        mask = None
+        if self.mask:
+            from limitmask import MASK_RESULTS_FILE
+
+            trace_names = trace_names + [MASK_RESULTS_FILE]
+            mask = {"file": os.path.abspath(self.mask), "abort": self.abort_on_fail}
+
+        return Checkpoint.create(
+            folder_name,
+            plan,
+            self.vna.cached_configuration(),
+            start_freq,
+            stop_freq,
+            trace_names,
+            reference=self.reference_folder,
+            bands=self.bands,
+            channels=self.channels,
+            storage=f"mack_{uuid.uuid4().hex[:8]}" if self.storage else None,
+            mask=mask,
+        )
+
+    def run_blocks(self, blocks, folder_name, start_freq, stop_freq):
+        """
+        Measures several state blocks (e.g. all four KU TRM blocks) in one
+        session. Every block gets its own numbered subfolder and checkpoint,
+        all created up front so an interrupted session can be resumed from
+        the parent folder. The sweep metadata is read from the VNA once and
+        shared by all blocks.
+
+        Args:
+            blocks (list[tuple]): (name, StatePlan) of every block, in order.
+            folder_name (str): Parent measurement folder.
+            start_freq (float): Start frequency in GHz.
+            stop_freq (float): Stop frequency in GHz.
+
+        Returns:
+            bool: True if every block was measured
+        """
+        with self.held_sweep_info():
+            checkpoints = [
+                self.prepare(
+                    plan,
+                    os.path.join(folder_name, f"{i}_{name}"),
+                    start_freq,
+                    stop_freq,
+                )
+                for i, (name, plan) in enumerate(blocks, start=1)
+            ]
+            return self.sweep_blocks(checkpoints)
+
+    def sweep_blocks(self, checkpoints):
+        """Sweeps the unfinished checkpoints of a block session in order"""
+        for checkpoint in checkpoints:
+            if checkpoint.finished:
+                continue
+
+            block = os.path.basename(checkpoint.folder_name)
+            self.log(f"Block {block}: {len(checkpoint.remaining)} states", "info")
+            if not self.sweep(checkpoint):
+                return False
+
+        self.log("All blocks completed", "success")
+        return True
+
+    @contextlib.contextmanager
+    def held_sweep_info(self):
+        """Holds the VNA's sweep cache for a block, unless a caller already does"""
+        if self.vna.sweep_cache is not None:
+            yield
+            return
+
+        self.vna.hold_sweep_info()
+        try:
+            yield
+        finally:
+            self.vna.hold_sweep_info(False)
+
+    def resume(self, folder_name):
+        """
+        Continues an interrupted sweep in the same folder. Only the states that
+        were not completed are triggered, after checking that the VNA is still
+        configured as it was when the sweep started.
+
+        Args:
+            folder_name (str): Measurement folder of the interrupted sweep.
+
+        Returns:
+            bool: True if the sweep is complete
+        """
+        checkpoint = Checkpoint.load(folder_name)
+        if checkpoint is None:
+            blocks = Checkpoint.load_blocks(folder_name)
+            if blocks:
+                return self.resume_blocks(blocks)
+
+            self.log(f"[ERROR] No checkpoint found in {folder_name}", "error")
+            return False
+
+        if checkpoint.finished:
+            self.log("This measurement is already complete", "info")
+            return True
+
+        mismatch = checkpoint.config_mismatch(self.vna.cached_configuration())
+        if mismatch:
+            self.log(
+                f"[ERROR] VNA configuration differs from the interrupted run: {', '.join(mismatch)}",
+                "error",
+            )
+            return False
+
+        checkpoint.restore_files()
+        self.log(
+            f"Resuming measurement: {len(checkpoint.remaining)} of {len(checkpoint.logical_order)} states left",
+            "info",
+        )
+        return self.sweep(checkpoint)
+
+    def resume_blocks(self, checkpoints):
+        """
+        Continues an interrupted block session.
+
+        Args:
+            checkpoints (list[Checkpoint]): Checkpoints of the blocks, in order.
+
+        Returns:
+            bool: True if every block is complete
+        """
+        config = self.vna.cached_configuration()
+        for checkpoint in checkpoints:
+            mismatch = checkpoint.config_mismatch(config)
+            if mismatch and not checkpoint.finished:
+                self.log(
+                    f"[ERROR] VNA configuration differs from the interrupted run: {', '.join(mismatch)}",
+                    "error",
+                )
+                return False
+
+        with self.held_sweep_info():
+            for checkpoint in checkpoints:
+                if not checkpoint.finished:
+                    checkpoint.restore_files()
+            return self.sweep_blocks(checkpoints)
+
+    def sweep(self, checkpoint):
+        """
+        Measures the remaining states of a checkpoint, recording each one.
+        Every state is fetched once and all bands of the checkpoint are cut
+        from the same sweep. In storage mode the VNA only writes every state
+        to a file of its own, and the files are transferred and written out
+        once all states are stored. When the plan was acquired in a different
+        order, the trace files are rewritten in logical order once the sweep
+        has completed.
+
+        Args:
+            checkpoint (Checkpoint): Sweep to run.
+
+        Returns:
+            bool: True if every state was measured
+        """
+        folder_name = checkpoint.folder_name
+        start_freq = checkpoint.start_freq
+        stop_freq = checkpoint.stop_freq
+
+        screen = None
+        if checkpoint.screening:
+            from screening import Screen
+
+            try:
+                screen = Screen(
+                    self.vna, checkpoint.screening, folder_name, start_freq, stop_freq
+                )
+                errors = screen.setup()
+            except Exception as e:
+                errors = [str(e)]
+            if errors:
+                self.log(f"[ERROR] Could not set up screening: {errors[0]}", "error")
+                return False
+            self.log(f"Screening {len(screen.columns)} values per state", "info")
+
+        checker = None
+        if checkpoint.mask:
+            from limitmask import MaskCheck
+
+            try:
+                checker = MaskCheck(
+                    self.vna,
+                    checkpoint.mask["file"],
+                    folder_name,
+                    start_freq,
+                    stop_freq,
+                )
+            except (OSError, ValueError, KeyError) as e:
+                self.log(f"[ERROR] Could not load limit mask: {e}", "error")
+                return False
+            self.log(f"Checking states against {checkpoint.mask['file']}", "info")
+
+        writers = []
+        if not checkpoint.storage:
+            try:
+                writers = self.band_writers(checkpoint)
+            except (OSError, ValueError) as e:
+                self.log(f"[ERROR] Could not prepare the band files: {e}", "error")
+                return False
+        else:
+            self.log("Storing traces on the VNA until the sweep is done", "info")
+        if checkpoint.reference:
+            self.log(f"Normalizing to reference in {checkpoint.reference}", "info")
+        if checkpoint.bands:
+            self.log(
+                f"Writing {len(checkpoint.bands) + 1} bands from every sweep", "info"
+            )
+        channel_wait = 0.0
+        if checkpoint.channels:
+            channel_wait = self.channel_sweep_wait(checkpoint.channels)
+            self.log(
+                f"Measuring channels 1, {', '.join(map(str, checkpoint.channels))} with every state",
+                "info",
+            )
+
+        for state in checkpoint.remaining:
+            if not self.should_continue():
+                self.log("[CANCELLED] Test was cancelled.", "warning")
+                self.log(f"Run can be resumed from {folder_name}", "info")
+                return False
+
+            if not self.fpga.trigger_state(state):
+                self.log(
+                    "[ERROR] FPGA communication failed. Please make sure FPGA is connected and all applications using the port are closed",
+                    "error",
+                )
+                self.log(f"Run can be resumed from {folder_name}", "info")
+                return False
+
+            triggered = time.perf_counter()
+            self.log(f"[TRIGGER] Triggered state {state}", "success")
+
+            if not self.should_continue():
+                self.log("[CANCELLED] Test was cancelled.", "warning")
+                self.log(f"Run can be resumed from {folder_name}", "info")
+                return False
+
+            try:
+                self.settle(state)
+                if screen is not None:
+                    values, passed = screen.measure()
+                    screen.save(state, values, passed)
+                    if not passed:
+                        self.log(f"[FAIL] State {state} is outside its limits", "error")
+                elif checkpoint.storage:
+                    self.wait_for_channels(triggered, channel_wait)
+                    self.store_state(checkpoint)
+                else:
+                    trace_values = self.vna.save_traces(
+                        state, folder_name, start_freq, stop_freq
+                    )
+                    if writers:
+                        # Channel 1 is written by save_traces; the band files
+                        # are only written once every channel has been read
+                        self.wait_for_channels(triggered, channel_wait)
+                        fetched = {1: trace_values}
+                        for channel in checkpoint.channels:
+                            fetched[channel] = self.vna.get_trace_data(channel)
+                        self.write_bands(writers, state, fetched)
+                    self.publish(state, trace_values, start_freq, stop_freq)
+                    if checker is not None:
+                        result = checker.check(state, trace_values)
+            except Exception as e:
+                self.log(f"[ERROR] Measurement of state {state} failed: {e}", "error")
+                self.log(f"Run can be resumed from {folder_name}", "info")
+                return False
+
+            checkpoint.record(state)
+            self.log(f"Saved measurement for state {state}", "success")
+
+            if checker is not None and not checkpoint.storage:
+                if result in ("FAIL", "HARD"):
+                    self.log(f"[FAIL] State {state} is outside the limit mask", "error")
+                if result == "HARD" and checkpoint.mask["abort"]:
+                    self.log(
+                        f"[ABORT] State {state} failed the limit mask hard, sweep stopped",
+                        "error",
+                    )
+                    self.log(f"Run can be resumed from {folder_name}", "info")
+                    return False
+
+        if checkpoint.storage and not self.transfer_stored(checkpoint, checker):
+            return False
+
+        if checkpoint.needs_reorder:
+            for name in checkpoint.trace_names:
+                reorder_rows(f"{folder_name}/{name}", checkpoint.logical_order)
+
+        checkpoint.finish()
+        if checkpoint.storage:
+            self.delete_stored(checkpoint)
+        if checker is not None:
+            counts = checker.summary()
+            self.log(
+                "Limit mask: "
+                + ", ".join(f"{n} {result}" for result, n in sorted(counts.items())),
+                "success" if set(counts) <= {"PASS", "NO MASK"} else "error",
+            )
+        if screen is not None:
+            screened, failed = screen.summary()
+            self.log(
+                f"Screening: {screened - failed} of {screened} states passed",
+                "success" if not failed else "error",
+            )
+        self.log("Test completed", "success")
+        self.vna.reset_indices()
+        return True
+
+    @staticmethod
+    def write_bands(writers, state, fetched):
+        """
+        Writes the bands of one state.
+
+        Args:
+            writers (list[BandWriter]): Writers of the sweep.
+            state (int): Measured state.
+            fetched (dict): Channel to all trace values fetched for it.
+        """
+        import numpy as np
+
+        values = {}
+        for writer in writers:
+            if writer.channel not in values:
+                values[writer.channel] = np.asarray(
+                    fetched[writer.channel], dtype=float
+                ).reshape(-1, writer.steps)
+            writer.save(state, values[writer.channel])
+
+    def stored_files(self, checkpoint, index):
+        """
+        Names of the files on the VNA holding the state acquired at a given
+        position of a storage-mode sweep, per channel.
+
+        Args:
+            checkpoint (Checkpoint): Storage-mode sweep.
+            index (int): Position in the acquisition order.
+
+        Returns:
+            dict: Channel to file name
+        """
+        return {
+            channel: f"{checkpoint.storage}_{index}_ch{channel}.csv"
+            for channel in [1] + checkpoint.channels
+        }
+
+    def channel_sweep_wait(self, channels):
+        """
+        Returns the time after a trigger by which every channel has completed
+        a sweep started after the trigger. Settling only watches channel 1,
+        and the VNA sweeps its channels one after the other, so this is one
+        sweep of every channel plus the longest sweep of a further channel.
+
+        Args:
+            channels (list[int]): Channels measured besides channel 1.
+
+        Returns:
+            float: Time in seconds
+        """
+        times = {channel: self.vna.get_sweep_time(channel) for channel in channels}
+        return self.vna.get_sweep_time(1) + sum(times.values()) + max(times.values())
+
+    @staticmethod
+    def wait_for_channels(triggered, channel_wait):
+        """Sleeps until channel_wait seconds have passed since the trigger"""
+        remaining = triggered + channel_wait - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def store_state(self, checkpoint):
+        """
+        Has the VNA store the traces of the state being measured, one file per
+        channel. Each file costs a single round-trip.
+
+        Args:
+            checkpoint (Checkpoint): Storage-mode sweep.
+
+        Raises:
+            RuntimeError: If the VNA reports an error.
+        """
+        index = len(checkpoint.completed)
+        for channel, file_name in self.stored_files(checkpoint, index).items():
+            errors = self.vna.store_trace_data(file_name, channel)
+            if errors:
+                raise RuntimeError(f"VNA could not store {file_name}: {errors[0]}")
+
+    def transfer_stored(self, checkpoint, checker=None):
+        """
+        Transfers the files of a storage-mode sweep from the VNA and writes
+        every state in the normal output format, main band included. An
+        interrupted transfer is repeated from the start when resumed.
+
+        Args:
+            checkpoint (Checkpoint): Storage-mode sweep with every state stored.
+            checker (MaskCheck, optional): Limit mask the states are checked
+                against while they are written.
+
+        Returns:
+            bool: True if every state was written
+        """
+        folder_name = checkpoint.folder_name
+        start_freq = checkpoint.start_freq
+        stop_freq = checkpoint.stop_freq
+
+        try:
+            writers = [
+                BandWriter(self.vna, folder_name, start_freq, stop_freq)
+            ] + self.band_writers(checkpoint)
+        except (OSError, ValueError) as e:
+            self.log(f"[ERROR] Could not prepare the band files: {e}", "error")
+            return False
+
+        traces = {
+            channel: len(self.vna.cached_trace_info(start_freq, stop_freq, channel)[1])
+            for channel in [1] + checkpoint.channels
+        }
+
+        order = checkpoint.acquisition_order
+        self.log(f"Transferring {len(order)} stored states from the VNA", "info")
+        for index, state in enumerate(order):
+            if not self.should_continue():
+                self.log("[CANCELLED] Transfer was cancelled.", "warning")
+                self.log(f"Run can be resumed from {folder_name}", "info")
+                return False
+
+            try:
+                fetched = {
+                    channel: self.vna.parse_stored_traces(
+                        self.vna.read_stored_file(file_name), traces[channel]
+                    )
+                    for channel, file_name in self.stored_files(
+                        checkpoint, index
+                    ).items()
+                }
+                self.write_bands(writers, state, fetched)
+                if checker is not None:
+                    checker.check(state, fetched[1])
+            except Exception as e:
+                self.log(f"[ERROR] Transfer of state {state} failed: {e}", "error")
+                self.log(f"Run can be resumed from {folder_name}", "info")
+                return False
+
+        self.log("Transfer completed", "success")
+        return True
+
+    def delete_stored(self, checkpoint):
+        """Removes the files of a finished storage-mode sweep from the VNA"""
+        for index in range(len(checkpoint.acquisition_order)):
+            for file_name in self.stored_files(checkpoint, index).values():
+                self.vna.delete_stored_file(file_name)
+
+    def band_writers(self, checkpoint):
+        """
+        Creates the writers for the additional bands of a checkpoint, with a
+        reference for the normalized copies of every band, and for every band
+        of the further channels. The primary band of channel 1 is written by
+        save_traces. Further channels are not normalized, since reference
+        lines are only saved for channel 1.
+
+        Args:
+            checkpoint (Checkpoint): Sweep to write.
+
+        Returns:
+            list[BandWriter]: Writers, empty if only the primary band is saved
+        """
+        folder_name = checkpoint.folder_name
+        primary = (checkpoint.start_freq, checkpoint.stop_freq)
+        writers = [
+            BandWriter(self.vna, folder_name, start, stop)
+            for start, stop in checkpoint.bands
+        ]
+
+        if checkpoint.reference:
+            from reference import NORMALIZED_FOLDER
+
+            normalized_folder = os.path.join(folder_name, NORMALIZED_FOLDER)
+            writers += [
+                BandWriter(
+                    self.vna,
+                    normalized_folder,
+                    start,
+                    stop,
+                    reference_folder=checkpoint.reference,
+                    reference_band=primary,
+                )
+                for start, stop in [primary] + checkpoint.bands
+            ]
+
+        writers += [
+            BandWriter(self.vna, folder_name, start, stop, channel=channel)
+            for channel in checkpoint.channels
+            for start, stop in [primary] + checkpoint.bands
+        ]
+        return writers
+
+    def publish(self, state, trace_values, start_freq, stop_freq):
+        """
+        Passes the saved band of freshly fetched traces to on_traces, if set.
+        Failures are logged and never stop the sweep.
+
+        Args:
+            state (int or str): Measured state or capture label.
+            trace_values (list): All trace values as fetched from the VNA.
+            start_freq (float): Start frequency in GHz.
+            stop_freq (float): Stop frequency in GHz.
+        """
+        if self.on_traces is None:
+            return
+
+        import numpy as np
+
+        try:
+            # The axis is read once per engine so publishing adds no queries
+            if self.publish_axis is None:
+                in_gigs, trace_names = self.vna.cached_trace_info(start_freq, stop_freq)
+                band = band_slice(in_gigs, start_freq, stop_freq)
+                self.publish_axis = (
+                    len(in_gigs),
+                    band,
+                    np.asarray(in_gigs[band]),
+                    trace_names,
+                )
+
+            steps, band, freqs, trace_names = self.publish_axis
+            values = np.asarray(trace_values, dtype=float).reshape(-1, steps)
+            self.on_traces(state, freqs, trace_names, values[:, band])
+        except Exception as e:
+            self.log(f"[WARN] Could not publish traces: {e}", "warning")
+
+    def capture(
+        self, folder_name, start_freq, stop_freq, captures, interval, save_raw=False
+    ):
+        """
+        Fetches the traces repeatedly without triggering states and keeps running
+        per-point statistics (mean, standard deviation, min, max). Phase traces
+        use circular statistics. Only the summaries are written, plus one row
+        per capture in raw/ when save_raw is set.
+
+        Args:
+            folder_name (str): Directory to store the CSV files.
+            start_freq (float): Start frequency in GHz.
+            stop_freq (float): Stop frequency in GHz.
+            captures (int): Number of captures.
+            interval (float): Time between the start of two captures in seconds.
+            save_raw (bool, optional): Also store every capture. Defaults to False.
+
+        Returns:
+            bool: True if all captures were taken
+        """
+        from stats import StreamingStats
+
+        in_gigs, trace_names = self.vna.cached_trace_info(start_freq, stop_freq)
+        steps = len(in_gigs)
+        band = band_slice(in_gigs, start_freq, stop_freq)
+        freqs = in_gigs[band]
+
+        stats = [
+            StreamingStats(circular=is_phase)
+            for is_phase in self.vna.get_phase_traces()
+        ]
+
+        os.makedirs(f"{folder_name}/summary", exist_ok=True, mode=0o777)
+        if save_raw:
+            os.makedirs(f"{folder_name}/raw", exist_ok=True, mode=0o777)
+            for name in trace_names:
+                with open(f"{folder_name}/raw/{name}", mode="w") as f:
+                    f.write(self.vna.sep + self.vna.sep.join(map(str, freqs)) + "\n")
+
+        completed = True
+        t0 = time.perf_counter()
+        for n in range(captures):
+            # Wait for the next slot, staying responsive to pause/cancel
+            while time.perf_counter() < t0 + n * interval:
+                if self.cancel_event is not None and self.cancel_event.is_set():
+                    break
+                time.sleep(max(0, min(0.1, t0 + n * interval - time.perf_counter())))
+
+            if not self.should_continue():
+                self.log("[CANCELLED] Capture was cancelled.", "warning")
+                completed = False
+                break
+
+            trace_values = self.vna.get_trace_data()
+            for i, name in enumerate(trace_names):
+                values = trace_values[
+                    band.start + (i * steps) : band.stop + (i * steps)
+                ]
+                stats[i].update(values)
+
+                if save_raw:
+                    with open(f"{folder_name}/raw/{name}", mode="a") as f:
+                        f.write(f"{n}," + self.vna.sep.join(map(str, values)) + "\n")
+
+            self.publish(f"capture {n + 1}", trace_values, start_freq, stop_freq)
+            self.log(f"Capture {n + 1}/{captures} done", "info")
+
+        if stats and stats[0].count:
+            for i, name in enumerate(trace_names):
+                stats[i].save(f"{folder_name}/summary/{name}", freqs)
+            self.log(f"Statistics over {stats[0].count} captures saved", "success")
+
+        return completed
+
+
+class BandWriter:
+    """
+    Appends one frequency band of every fetched state to trace files in the
+    same layout as the ones written by save_traces. Used to cut additional
+    bands out of a single sweep, to save further channels and, with a
+    reference, to write normalized copies of the traces.
+
+    Attributes:
+        folder_name (str) : Folder the traces are written to.
+        trace_names (list[str]) : Trace file names of the band.
+        steps (int) : Frequency points per trace as fetched from the VNA.
+        band (slice) : Frequency points kept in the files.
+        reference (Reference or None) : Reference aligned to the kept points.
+        channel (int) : VNA channel the band is cut from.
+    """
+
+    def __init__(
+        self,
+        vna,
+        folder_name,
+        start_freq,
+        stop_freq,
+        reference_folder=None,
+        reference_band=None,
+        channel=1,
+    ):
+        """
+        Initialization Function
+
+        Args:
+            vna (BaseVNA): Connected VNA.
+            folder_name (str): Folder to write the traces to.
+            start_freq (float): Start frequency of the band in GHz.
+            stop_freq (float): Stop frequency of the band in GHz.
+            reference_folder (str, optional): Reference-line folder to
+                normalize to. Defaults to None (raw traces).
+            reference_band (tuple, optional): (start, stop) in GHz the
+                reference line was saved for. Defaults to this band.
+            channel (int, optional): VNA channel the band is cut from.
+                Defaults to 1.
+
+        Raises:
+            ValueError: If the channel's sweep or the reference line does not
+                cover the band.
+        """
+        in_gigs, self.trace_names = vna.cached_trace_info(
+            start_freq, stop_freq, channel
+        )
+        if not len(in_gigs) or not in_gigs[0] <= start_freq <= stop_freq <= in_gigs[-1]:
+            raise ValueError(
+                f"Channel {channel} does not cover {start_freq}-{stop_freq} GHz"
+            )
+        self.channel = channel
+        self.steps = len(in_gigs)
+        self.band = band_slice(in_gigs, start_freq, stop_freq)
+        freqs = in_gigs[self.band]
+        self.sep = vna.sep
+
+        self.reference = None
+        if reference_folder:
+            from reference import Reference
+
+            # Reference files are named after the band they were saved for
+            ref_start, ref_stop = reference_band or (start_freq, stop_freq)
+            _, reference_names = vna.cached_trace_info(ref_start, ref_stop)
+            self.reference = Reference(
+                reference_folder, reference_names, freqs, vna.get_trace_formats()
+            )
+
+        self.folder_name = folder_name
+        os.makedirs(self.folder_name, exist_ok=True, mode=0o777)
+        for name in self.trace_names:
+            file_path = os.path.join(self.folder_name, name)
+            if not os.path.exists(file_path):
+                with open(file_path, mode="w") as f:
+                    f.write(self.sep + self.sep.join(map(str, freqs)) + "\n")
+
+    def save(self, state, values):
+        """
+        Appends the band of one state to the files, normalized if the writer
+        has a reference.
+
+        Args:
+            state (int): Measured state.
+            values (np.ndarray): All fetched traces, shape (traces, steps).
+        """
+        rows = values[:, self.band]
+        if self.reference is not None:
+            rows = self.reference.apply(rows)
+
+        for name, row in zip(self.trace_names, rows):
+            with open(os.path.join(self.folder_name, name), mode="a") as f:
+                f.write(f"{state}," + self.sep.join(map(str, row.tolist())) + "\n")
+
+
+def reorder_rows(file_path, order):
+    """
+    Rewrites a trace CSV (header row, then one row per state) so that the state
+    rows follow the given order. Repeated states keep their acquisition order.
+
+    Args:
+        file_path (str): Trace CSV file.
+        order (list[int]): States in the order they should appear.
+    """
+    if not os.path.exists(file_path):
+        return
+
+    with open(file_path, "r") as f:
+        header = f.readline()
+        rows = {}
+        for line in f:
+            state = line.split(",", 1)[0]
+            rows.setdefault(state, []).append(line)
+
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(header)
+        for state in order:
+            lines = rows.get(str(state))
+            if lines:
+                f.write(lines.pop(0))
+
+    os.replace(tmp_path, file_path)
@@ -0,0 +1,270 @@
+import numpy as np
+import pandas as pd
+
+# Upper bound on the size of the temporary distance array (elements)
+CHUNK_ELEMENTS = 2**24
+
+
+def base_reference(trace_data):
+    """
+    Expresses the phase of every state relative to the first state, in [0, 360).
+
+    Args:
+        trace_data (pd.DataFrame): Phase in degrees, states as rows and
+            frequencies as columns.
+
+    Returns:
+        pd.DataFrame: Base-referenced phase
+    """
+    base_data = trace_data - trace_data.iloc[0]
+    return base_data.where(base_data >= 0, base_data + 360)
+
+
+def ideal_phases(bits):
+    """Ideal phase of every code of a bits-bit phase shifter, in degrees"""
+    one_angle = 360 / 2**bits
+    return np.arange(2**bits) * one_angle
+
+
+def nearest_states(base, ideal):
+    """
+    For every ideal phase and frequency, finds the state whose base-referenced
+    phase is closest. Ties go to the lowest state index.
+
+    Args:
+        base (np.ndarray): Base-referenced phase, shape (states, frequencies).
+        ideal (np.ndarray): Ideal phases, shape (codes,).
+
+    Returns:
+        np.ndarray: State indices, shape (codes, frequencies)
+    """
+    n_states, n_freqs = base.shape
+    indices = np.empty((len(ideal), n_freqs), dtype=np.intp)
+
+    # Work on blocks of frequencies so the distance array stays bounded
+    step = max(1, CHUNK_ELEMENTS // max(1, len(ideal) * n_states))
+    for start in range(0, n_freqs, step):
+        block = base[:, start : start + step]
+        distance = np.abs(ideal[:, None, None] - block[None, :, :])
+        indices[:, start : start + step] = np.argmin(distance, axis=1)
+
+    return indices
+
+
+def analyze(trace_data, resolutions, amp_data=None):
+    """
+    Maps measured phase states to the ideal phases of several bit resolutions
+    in one pass. The base-referenced phase matrix is computed once and shared.
+
+    Args:
+        trace_data (pd.DataFrame): Phase in degrees, states as rows and
+            frequencies as columns.
+        resolutions (list[int]): Bit resolutions to evaluate.
+        amp_data (pd.DataFrame, optional): Amplitude with the same layout,
+            rearranged with the selected states.
+
+    Returns:
+        tuple: (pd.DataFrame base-referenced phase,
+            dict bits -> dict with "indices", "re_arranged", "max_rms_min",
+            "rmse" and "amp" (None without amplitude data))
+    """
+    base_data = base_reference(trace_data)
+    base = base_data.to_numpy(dtype=float)
+    columns = base_data.columns
+    amp = amp_data.to_numpy(dtype=float) if amp_data is not None else None
+
+    results = {}
+    for bits in resolutions:
+        ideal = ideal_phases(bits)
+        indices = nearest_states(base, ideal)
+
+        chosen = np.take_along_axis(base, indices, axis=0)
+        diff = ideal[:, None] - chosen
+        rmse = np.sqrt(np.mean(diff**2, axis=0))
+
+        results[bits] = {
+            "indices": indices,
+            "re_arranged": pd.DataFrame(chosen, columns=columns),
+            "max_rms_min": pd.DataFrame(
+                [diff.max(axis=0), rmse, diff.min(axis=0)], columns=columns
+            ),
+            "rmse": pd.Series(rmse, index=columns),
+            "amp": (
+                pd.DataFrame(
+                    np.take_along_axis(amp, indices, axis=0), columns=amp_data.columns
+                )
+                if amp is not None
+                else None
+            ),
+        }
+
+    return base_data, results
+
+
+def summarize(results):
+    """
+    Condenses the per-frequency errors of every resolution into one table.
+
+    Args:
+        results (dict): Output of analyze.
+
+    Returns:
+        pd.DataFrame: One row per resolution
+    """
+    rows = {}
+    for bits, result in results.items():
+        max_rms_min = result["max_rms_min"].to_numpy()
+        rows[bits] = {
+            "max_error": max_rms_min[0].max(),
+            "mean_rmse": max_rms_min[1].mean(),
+            "worst_rmse": max_rms_min[1].max(),
+            "min_error": max_rms_min[2].min(),
+        }
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis("bits")
+
+
+def save_report(file_path, base_data, results):
+    """
+    Writes a single Excel report keyed by resolution: the base-referenced
+    phase, a summary per resolution and the rearranged phase, error table,
+    RMS and (if available) rearranged amplitude of every resolution.
+
+    Args:
+        file_path (str): Output .xlsx file.
+        base_data (pd.DataFrame): Base-referenced phase.
+        results (dict): Output of analyze.
+    """
+    with pd.ExcelWriter(file_path, engine="openpyxl") as writer:
+        summarize(results).to_excel(writer, sheet_name="summary")
+        base_data.to_excel(writer, sheet_name="positive_converted")
+
+        for bits, result in results.items():
+            result["re_arranged"].to_excel(writer, sheet_name=f"re_arranged_{bits}")
+            result["max_rms_min"].to_excel(writer, sheet_name=f"PS_MAX_RMS_MIN_{bits}")
+            result["rmse"].to_excel(writer, sheet_name=f"RMS_{bits}")
+            if result["amp"] is not None:
+                result["amp"].to_excel(writer, sheet_name=f"AMP_{bits}")
+
+
+def wrap_phase(phase):
+    """
+    Wraps phase into [0, 360). A small negative phase modulo 360 rounds to
+    exactly 360.0 in floating point, which is folded back to 0.
+    """
+    phase = np.asarray(phase) % 360
+    return np.where(phase >= 360, phase - 360, phase)
+
+
+def combined_grid(ps_phase, ps_amp, att_phase, att_amp):
+    """
+    Predicts phase and amplitude of every (phase shifter, attenuator) state pair
+    from the two separately measured blocks, relative to both reference states.
+    Relative phase and dB of the two blocks add.
+
+    Args:
+        ps_phase (np.ndarray): Phase shifter phase, shape (ps_states, freqs).
+        ps_amp (np.ndarray): Phase shifter amplitude in dB, same shape.
+        att_phase (np.ndarray): Attenuator phase, shape (att_states, freqs).
+        att_amp (np.ndarray): Attenuator amplitude in dB, same shape.
+
+    Returns:
+        tuple: (phase in [0, 360), amplitude in dB), both of shape
+            (ps_states * att_states, freqs) with the attenuator index varying fastest
+    """
+    ps_phase = ps_phase - ps_phase[0]
+    ps_amp = ps_amp - ps_amp[0]
+    att_phase = att_phase - att_phase[0]
+    att_amp = att_amp - att_amp[0]
+
+    phase = wrap_phase(ps_phase[:, None, :] + att_phase[None, :, :])
+    amp = ps_amp[:, None, :] + att_amp[None, :, :]
+    n_freqs = ps_phase.shape[1]
+    return phase.reshape(-1, n_freqs), amp.reshape(-1, n_freqs)
+
+
+def optimal_states(ps_phase, ps_amp, att_phase, att_amp, targets, db_weight=1.0):
+    """
+    Finds, per frequency, the phase shifter/attenuator state pair closest to each
+    target (relative phase, relative amplitude) point.
+
+    A KD-tree is built per frequency over the combined measured grid, with the
+    phase axis periodic and the amplitude axis scaled by db_weight (degrees per
+    dB), and all targets are looked up in bulk.
+
+    Args:
+        ps_phase (pd.DataFrame): Phase shifter phase, states as rows.
+        ps_amp (pd.DataFrame): Phase shifter amplitude in dB, same layout.
+        att_phase (pd.DataFrame): Attenuator phase, states as rows.
+        att_amp (pd.DataFrame): Attenuator amplitude in dB, same layout.
+        targets (np.ndarray): Target points, shape (n, 2) as (phase, dB).
+        db_weight (float, optional): Degrees that count as much as 1 dB.
+            Defaults to 1.0.
+
+    Returns:
+        pd.DataFrame: One row per (frequency, target) with the selected states,
+            their predicted phase and amplitude and the errors
+
+    Raises:
+        ValueError: If the files have no frequency column in common.
+    """
+    from scipy.spatial import cKDTree
+
+    columns = [c for c in ps_phase.columns if c in set(att_phase.columns)]
+    if not columns:
+        raise ValueError("Phase shifter and attenuator files share no frequencies")
+
+    phase, amp = combined_grid(
+        ps_phase[columns].to_numpy(dtype=float),
+        ps_amp[columns].to_numpy(dtype=float),
+        att_phase[columns].to_numpy(dtype=float),
+        att_amp[columns].to_numpy(dtype=float),
+    )
+    n_att = len(att_phase.index)
+    ps_labels = np.asarray(ps_phase.index)
+    att_labels = np.asarray(att_phase.index)
+
+    targets = np.asarray(targets, dtype=float)
+    query = np.column_stack([wrap_phase(targets[:, 0]), targets[:, 1] * db_weight])
+
+    tables = []
+    for f, column in enumerate(columns):
+        points = np.column_stack([phase[:, f], amp[:, f] * db_weight])
+        tree = cKDTree(points, boxsize=[360, 0])
+        distance, index = tree.query(query)
+
+        phase_error = (phase[index, f] - query[:, 0] + 180) % 360 - 180
+        tables.append(
+            pd.DataFrame(
+                {
+                    "frequency": column,
+                    "target_phase": targets[:, 0],
+                    "target_db": targets[:, 1],
+                    "ps_state": ps_labels[index // n_att],
+                    "att_state": att_labels[index % n_att],
+                    "phase": phase[index, f],
+                    "db": amp[index, f],
+                    "phase_error": phase_error,
+                    "db_error": amp[index, f] - targets[:, 1],
+                    "distance": distance,
+                }
+            )
+        )
+
+    return pd.concat(tables, ignore_index=True)
+
+
+def read_targets(file_path):
+    """
+    Reads target points from a CSV with phase (degrees) in the first column and
+    amplitude (dB) in the second. Rows that are not numeric, such as a header,
+    are skipped.
+
+    Args:
+        file_path (str): Targets CSV file.
+
+    Returns:
+        np.ndarray: Targets, shape (n, 2)
+    """
+    table = pd.read_csv(file_path, header=None, usecols=[0, 1])
+    table = table.apply(pd.to_numeric, errors="coerce").dropna()
+    return table.to_numpy(dtype=float)
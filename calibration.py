@@ -0,0 +1,157 @@
+import struct
+import zlib
+
+import numpy as np
+
+from analysis import ideal_phases
+
+# Layout of a compiled calibration image (all fields big-endian):
+#   header  : magic, format version, bits, band count
+#   bands   : start and stop frequency of every band in kHz (uint32 each)
+#   table   : band-major, one uint16 physical state per ideal code
+#   trailer : CRC-32 of everything before it
+LUT_MAGIC = b"MKLT"
+LUT_VERSION = 1
+HEADER_FORMAT = ">4sBBH"
+BAND_FORMAT = ">II"
+
+
+def parse_bands(spec, frequencies):
+    """
+    Parses frequency bands written as "start-stop" pairs in GHz, separated by
+    commas (e.g. "8-9,9-10"). An empty spec gives one band covering all
+    frequencies.
+
+    Args:
+        spec (str): Band specification.
+        frequencies (np.ndarray): Measured frequencies in GHz.
+
+    Returns:
+        list[tuple]: (start, stop) of every band in GHz
+
+    Raises:
+        ValueError: If a band is malformed or contains no measured frequency.
+    """
+    if not spec.strip():
+        return [(float(frequencies.min()), float(frequencies.max()))]
+
+    bands = []
+    for item in spec.split(","):
+        try:
+            start, stop = (float(x) for x in item.split("-"))
+        except ValueError:
+            raise ValueError(f"Invalid band '{item.strip()}', expected start-stop")
+        if stop < start:
+            raise ValueError(f"Band '{item.strip()}' ends before it starts")
+        if not np.any((frequencies >= start) & (frequencies <= stop)):
+            raise ValueError(f"Band '{item.strip()}' contains no measured frequency")
+        bands.append((start, stop))
+    return bands
+
+
+def compile_lut(base_data, bits, bands):
+    """
+    Chooses, for every band and ideal code, the physical state whose
+    base-referenced phase has the lowest RMS error to the ideal phase over
+    all frequencies of the band.
+
+    Args:
+        base_data (pd.DataFrame): Base-referenced phase from analyze, states
+            as rows (indexed by physical state) and frequencies in GHz as
+            columns.
+        bits (int): Phase shifter resolution.
+        bands (list[tuple]): (start, stop) of every band in GHz.
+
+    Returns:
+        np.ndarray: Physical states, shape (bands, 2**bits)
+    """
+    base = base_data.to_numpy(dtype=float)
+    frequencies = base_data.columns.astype(float).to_numpy()
+    states = np.asarray(base_data.index, dtype=np.int64)
+    ideal = ideal_phases(bits)
+
+    table = np.empty((len(bands), len(ideal)), dtype=np.int64)
+    for b, (start, stop) in enumerate(bands):
+        block = base[:, (frequencies >= start) & (frequencies <= stop)]
+        # mean((i - b)^2) expanded, so no codes x states x points array is built
+        error = (
+            ideal[:, None] ** 2
+            - 2 * ideal[:, None] * block.mean(axis=1)[None, :]
+            + (block**2).mean(axis=1)[None, :]
+        )
+        table[b] = states[np.argmin(error, axis=1)]
+    return table
+
+
+def build_image(table, bits, bands):
+    """
+    Packs a calibration table into the binary image uploaded to the FPGA.
+
+    Args:
+        table (np.ndarray): Output of compile_lut.
+        bits (int): Phase shifter resolution.
+        bands (list[tuple]): (start, stop) of every band in GHz.
+
+    Returns:
+        bytes: Calibration image
+    """
+    image = struct.pack(HEADER_FORMAT, LUT_MAGIC, LUT_VERSION, bits, len(bands))
+    for start, stop in bands:
+        image += struct.pack(BAND_FORMAT, round(start * 1e6), round(stop * 1e6))
+    image += np.asarray(table, dtype=">u2").tobytes()
+    return image + struct.pack(">I", zlib.crc32(image))
+
+
+def read_image(image):
+    """
+    Unpacks and verifies a calibration image.
+
+    Args:
+        image (bytes): Calibration image.
+
+    Returns:
+        tuple: (table as np.ndarray, bits, list of (start, stop) bands in GHz)
+
+    Raises:
+        ValueError: If the image is not a valid calibration image.
+    """
+    header_size = struct.calcsize(HEADER_FORMAT)
+    band_size = struct.calcsize(BAND_FORMAT)
+    if len(image) < header_size + 4:
+        raise ValueError("Calibration image is truncated")
+
+    magic, version, bits, n_bands = struct.unpack_from(HEADER_FORMAT, image)
+    if magic != LUT_MAGIC or version != LUT_VERSION:
+        raise ValueError("Not a calibration image of a supported version")
+
+    table_offset = header_size + n_bands * band_size
+    expected = table_offset + n_bands * 2**bits * 2 + 4
+    if len(image) != expected:
+        raise ValueError(
+            f"Calibration image has {len(image)} bytes, expected {expected}"
+        )
+    if struct.unpack(">I", image[-4:])[0] != zlib.crc32(image[:-4]):
+        raise ValueError("Calibration image checksum mismatch")
+
+    bands = [
+        tuple(x / 1e6 for x in struct.unpack_from(BAND_FORMAT, image, offset))
+        for offset in range(header_size, table_offset, band_size)
+    ]
+    table = np.frombuffer(
+        image, dtype=">u2", offset=table_offset, count=n_bands * 2**bits
+    )
+    return table.reshape(n_bands, 2**bits).astype(np.int64), bits, bands
+
+
+def save_image(file_path, table, bits, bands):
+    """
+    Writes a calibration image to a .lut file.
+
+    Args:
+        file_path (str): Output file.
+        table (np.ndarray): Output of compile_lut.
+        bits (int): Phase shifter resolution.
+        bands (list[tuple]): (start, stop) of every band in GHz.
+    """
+    with open(file_path, "wb") as f:
+        f.write(build_image(table, bits, bands))
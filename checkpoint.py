@@ -0,0 +1,263 @@
+import os
+import json
+import datetime
+
+# Manifest stored inside every measurement folder
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+class Checkpoint:
+    """
+    Manifest kept next to a sweep's trace files so that an interrupted sweep
+    can be resumed. It records the VNA configuration, the planned states, the
+    states measured so far and the size of every trace file after the last
+    completed state.
+
+    Attributes:
+        folder_name (str) : Measurement folder the manifest belongs to.
+        data (dict) : Manifest contents.
+    """
+
+    def __init__(self, folder_name, data):
+        """
+        Initialization Function
+
+        Args:
+            folder_name (str): Measurement folder.
+            data (dict): Manifest contents.
+        """
+        self.folder_name = folder_name
+        self.data = data
+
+    @classmethod
+    def create(
+        cls,
+        folder_name,
+        plan,
+        config,
+        start_freq,
+        stop_freq,
+        trace_names,
+        reference=None,
+        bands=None,
+        channels=None,
+        storage=None,
+        screening=None,
+        mask=None,
+    ):
+        """
+        Starts a new manifest for a sweep and writes it to the folder.
+
+        Args:
+            folder_name (str): Measurement folder.
+            plan (StatePlan): Planned states.
+            config (dict): VNA configuration from BaseVNA.get_configuration.
+            start_freq (float): Start frequency in GHz.
+            stop_freq (float): Stop frequency in GHz.
+            trace_names (list[str]): Trace file names written by the sweep.
+            reference (str, optional): Reference-line folder the traces are
+                normalized to. Defaults to None (no normalization).
+            bands (list[tuple], optional): Additional (start, stop) bands in
+                GHz cut from the same sweeps. Defaults to None.
+            channels (list[int], optional): Further VNA channels fetched
+                with channel 1. Defaults to None.
+            storage (str, optional): Prefix of the files the traces are
+                stored in on the VNA. Defaults to None (fetched every state).
+            screening (dict, optional): Screening setup read back instead of
+                traces. Defaults to None.
+            mask (dict, optional): Limit mask file and whether to abort at the
+                first hard failure. Defaults to None (no check).
+
+        Returns:
+            Checkpoint: The new checkpoint
+        """
+        checkpoint = cls(
+            folder_name,
+            {
+                "created": datetime.datetime.now().isoformat(),
+                "config": config,
+                "start_freq": start_freq,
+                "stop_freq": stop_freq,
+                "trace_names": list(trace_names),
+                "reference": reference,
+                "bands": [list(band) for band in bands or []],
+                "channels": list(channels or []),
+                "storage": storage,
+                "screening": screening,
+                "mask": mask,
+                "logical_order": list(plan.logical_order),
+                "acquisition_order": list(plan.acquisition_order),
+                "completed": [],
+                "offsets": {},
+                "finished": False,
+            },
+        )
+        checkpoint.save()
+        return checkpoint
+
+    @classmethod
+    def load(cls, folder_name):
+        """
+        Reads the manifest of a measurement folder.
+
+        Args:
+            folder_name (str): Measurement folder.
+
+        Returns:
+            Checkpoint or None: The checkpoint, None if the folder has none
+        """
+        try:
+            with open(os.path.join(folder_name, CHECKPOINT_FILE), "r") as f:
+                return cls(folder_name, json.load(f))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    @classmethod
+    def load_blocks(cls, folder_name):
+        """
+        Reads the manifests of a block session, one per numbered subfolder.
+
+        Args:
+            folder_name (str): Parent measurement folder.
+
+        Returns:
+            list[Checkpoint]: Checkpoints in block order, empty if there are none
+        """
+        try:
+            names = os.listdir(folder_name)
+        except OSError:
+            return []
+
+        blocks = []
+        for name in names:
+            number = name.split("_", 1)[0]
+            if number.isdigit():
+                checkpoint = cls.load(os.path.join(folder_name, name))
+                if checkpoint is not None:
+                    blocks.append((int(number), checkpoint))
+        return [checkpoint for _, checkpoint in sorted(blocks, key=lambda b: b[0])]
+
+    @property
+    def start_freq(self):
+        return self.data["start_freq"]
+
+    @property
+    def stop_freq(self):
+        return self.data["stop_freq"]
+
+    @property
+    def trace_names(self):
+        return self.data["trace_names"]
+
+    @property
+    def reference(self):
+        return self.data.get("reference")
+
+    @property
+    def bands(self):
+        """Additional (start, stop) bands, empty for single-band sweeps"""
+        return [tuple(band) for band in self.data.get("bands", [])]
+
+    @property
+    def channels(self):
+        """Further VNA channels, empty for single-channel sweeps"""
+        return self.data.get("channels", [])
+
+    @property
+    def storage(self):
+        """Prefix of the files stored on the VNA, None if fetched every state"""
+        return self.data.get("storage")
+
+    @property
+    def screening(self):
+        """Screening setup, None if traces are saved"""
+        return self.data.get("screening")
+
+    @property
+    def mask(self):
+        """Limit mask file and abort flag, None if states are not checked"""
+        return self.data.get("mask")
+
+    @property
+    def logical_order(self):
+        return self.data["logical_order"]
+
+    @property
+    def acquisition_order(self):
+        return self.data["acquisition_order"]
+
+    @property
+    def completed(self):
+        return self.data["completed"]
+
+    @property
+    def finished(self):
+        return self.data["finished"]
+
+    @property
+    def needs_reorder(self):
+        return self.data["acquisition_order"] != self.data["logical_order"]
+
+    @property
+    def remaining(self):
+        """States still to be measured, in acquisition order"""
+        return self.data["acquisition_order"][len(self.data["completed"]) :]
+
+    def config_mismatch(self, config):
+        """
+        Compares a VNA configuration with the one the sweep was started with.
+
+        Args:
+            config (dict): Current VNA configuration.
+
+        Returns:
+            list[str]: Names of settings that differ
+        """
+        recorded = self.data["config"]
+        keys = set(recorded) | set(config)
+        return sorted(key for key in keys if recorded.get(key) != config.get(key))
+
+    def restore_files(self):
+        """
+        Cuts every trace file back to its size after the last completed state,
+        dropping rows that were only partly written. Files that were created
+        after the last checkpoint are removed so their header is rewritten.
+        """
+        offsets = self.data["offsets"]
+        for name in self.trace_names:
+            file_path = os.path.join(self.folder_name, name)
+            if not os.path.exists(file_path):
+                continue
+
+            if name in offsets:
+                with open(file_path, "r+") as f:
+                    f.truncate(offsets[name])
+            else:
+                os.remove(file_path)
+
+    def record(self, state):
+        """
+        Marks a state as measured and stores the current trace file sizes.
+
+        Args:
+            state (int): State that has just been saved.
+        """
+        self.data["completed"].append(state)
+        for name in self.trace_names:
+            file_path = os.path.join(self.folder_name, name)
+            if os.path.exists(file_path):
+                self.data["offsets"][name] = os.path.getsize(file_path)
+        self.save()
+
+    def finish(self):
+        """Marks the sweep as complete"""
+        self.data["finished"] = True
+        self.save()
+
+    def save(self):
+        """Writes the manifest atomically"""
+        file_path = os.path.join(self.folder_name, CHECKPOINT_FILE)
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f, indent=4)
+        os.replace(tmp_path, file_path)
@@ -1,6 +1,19 @@
+import os
+import json
 import serial  # type: ignore
 import serial.tools.list_ports  # type: ignore
 
+# Location where the last used FPGA port is remembered
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".mack_iitm")
+FPGA_CACHE_FILE = os.path.join(CACHE_DIR, "fpga.json")
+
+# Word that starts a calibration table upload. States are 2-byte words well
+# below this value, so the firmware can tell an upload from a trigger.
+LUT_UPLOAD_COMMAND = b"\xff\xa5"
+# Reply the firmware sends once an upload passed its checksum
+LUT_ACK = b"OK"
+LUT_CHUNK_SIZE = 256
+
 
 class FPGA:
     """
@@ -11,15 +24,41 @@ class FPGA:
         port (str or None) : The port that FPGA is connected to.
         baudrate (int) : UART communication speed
         timeout (int) : timeout for operations
+        vid (int or None) : USB vendor ID the FPGA adapter must match.
+        pid (int or None) : USB product ID the FPGA adapter must match.
+        serial_number (str or None) : USB serial number the adapter must match.
+        probe_command (bytes or None) : Command sent to verify the FPGA responds.
+        probe_response (bytes or None) : Expected prefix of the probe reply.
     """
 
-    def __init__(self, baudrate=9600, timeout=1):
+    def __init__(
+        self,
+        baudrate=9600,
+        timeout=1,
+        vid=None,
+        pid=None,
+        serial_number=None,
+        probe_command=None,
+        probe_response=None,
+    ):
         """
         Initialization Function
 
+        Values not given here are taken from the FPGA settings file
+        (~/.mack_iitm/fpga.json) when it sets them. The adapter has to be
+        identified by a USB vendor ID, product ID or serial number, or answer
+        a probe command; a generic USB-serial port is never picked unchecked.
+
         Args:
             baudrate (int, optional): UART communication speed. Defaults to 9600.
             timeout (int, optional): Timeout for operations. Defaults to 1.
+            vid (int, optional): USB vendor ID. Defaults to any.
+            pid (int, optional): USB product ID. Defaults to any.
+            serial_number (str, optional): USB serial number. Defaults to any.
+            probe_command (bytes, optional): Command used to verify the FPGA.
+                Defaults to None (no probe).
+            probe_response (bytes, optional): Expected reply prefix. Defaults to
+                None (any non-empty reply).
         """
         self.connected = False
         # self.connected = True  # TODO : comment it
@@ -27,32 +66,202 @@ class FPGA:
         self.baudrate = baudrate
         self.timeout = timeout
 
+        cache = self.load_cache()
+        self.last_port = cache.get("port")
+        self.last_serial_number = cache.get("serial_number")
+
+        self.vid = vid if vid is not None else cache.get("vid")
+        self.pid = pid if pid is not None else cache.get("pid")
+        self.serial_number = serial_number
+
+        if probe_command is None and cache.get("probe_command"):
+            probe_command = bytes.fromhex(cache["probe_command"])
+        if probe_response is None and cache.get("probe_response"):
+            probe_response = bytes.fromhex(cache["probe_response"])
+        self.probe_command = probe_command
+        self.probe_response = probe_response
+
     def initialize_fpga(self):
         """
-        Scans connected serial ports and checks if FPGA is connected or not
+        Scans connected serial ports and checks if FPGA is connected or not.
+        Only adapters matching the configured VID/PID/serial number are
+        considered, the remembered adapter is tried first and every candidate
+        has to answer the probe command. Without a probe command only a single
+        candidate is accepted, since several could not be told apart, and
+        without one nor any USB identity no port is picked at all.
 
         Returns:
             bool: Returns True if FPGA is found. Otherwise return False
         """
         # return  # TODO : comment it
-        keyword = "USB Serial"
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            if keyword.lower() in port.description.lower():
+        if self.probe_command is None and not self.identified():
+            self.connected = False
+            print(
+                "[ERROR] FPGA adapter not configured; set vid/pid or probe_command "
+                f"in {FPGA_CACHE_FILE}, or pass serial_number"
+            )
+            return False
+
+        candidates = self.find_candidate_ports()
+        if len(candidates) > 1 and self.probe_command is None:
+            self.connected = False
+            print(
+                f"[ERROR] {len(candidates)} ports could be the FPGA "
+                f"({', '.join(port.device for port in candidates)}); "
+                f"set probe_command or vid/pid in {FPGA_CACHE_FILE}, or pass serial_number"
+            )
+            return False
+
+        for port in candidates:
+            if self.probe(port.device):
                 print(f"[INFO] Found FPGA on {port.device}")
                 self.port = port.device
                 self.connected = True
+                self.save_cache(port)
                 return True
 
+        self.connected = False
         print("[ERROR] FPGA not found")
         return False
 
-    def trigger_state(self, state):
+    def reconnect(self):
+        """
+        Re-establishes the connection after a cable glitch. Only the adapter
+        that was last used is considered, matched by serial number so a
+        changed port name is still found.
+
+        Returns:
+            bool: Returns True if the FPGA was found again. Otherwise False
+        """
+        self.connected = False
+        for port in serial.tools.list_ports.comports():
+            if self.last_serial_number:
+                if port.serial_number != self.last_serial_number:
+                    continue
+            elif port.device != self.last_port:
+                continue
+
+            if self.probe(port.device):
+                print(f"[INFO] Reconnected to FPGA on {port.device}")
+                self.port = port.device
+                self.connected = True
+                self.save_cache(port)
+                return True
+
+        print("[ERROR] FPGA reconnection failed")
+        return False
+
+    def identified(self):
+        """Returns True if a USB vendor ID, product ID or serial number is set"""
+        return any(
+            value is not None for value in [self.vid, self.pid, self.serial_number]
+        )
+
+    def find_candidate_ports(self):
         """
-        Sends a single byte to the FPGA to trigger a single state
+        Lists serial ports that match the configured adapter, remembered one
+        first. Without USB IDs, USB-serial adapters are listed by description
+        for the probe command to tell apart.
+
+        Returns:
+            list: ListPortInfo objects of matching ports
+        """
+        candidates = []
+        for port in serial.tools.list_ports.comports():
+            if self.vid is None and self.pid is None:
+                # No USB IDs configured, narrow the ports down for probing
+                if "usb serial" not in (port.description or "").lower():
+                    continue
+            else:
+                if self.vid is not None and port.vid != self.vid:
+                    continue
+                if self.pid is not None and port.pid != self.pid:
+                    continue
+            if self.serial_number and port.serial_number != self.serial_number:
+                continue
+            candidates.append(port)
+
+        def remembered_first(port):
+            if self.last_serial_number and port.serial_number:
+                return port.serial_number != self.last_serial_number
+            return port.device != self.last_port
+
+        return sorted(candidates, key=remembered_first)
+
+    def probe(self, device):
+        """
+        Verifies that the FPGA answers on a port.
+
+        Args:
+            device (str): Port name, e.g. COM3 or /dev/ttyUSB0
+
+        Returns:
+            bool: True if the port can be opened and the FPGA answered the
+            probe. Without a probe command, opening the port is enough; that
+            is only used for adapters identified by USB IDs.
+        """
+        try:
+            with serial.Serial(device, self.baudrate, timeout=self.timeout) as ser:
+                if self.probe_command is None:
+                    return True
+
+                ser.reset_input_buffer()
+                ser.write(self.probe_command)
+                ser.flush()
+
+                expected = len(self.probe_response) if self.probe_response else 1
+                response = ser.read(expected)
+
+                if self.probe_response:
+                    return response.startswith(self.probe_response)
+                return bool(response)
+        except serial.SerialException:
+            return False
+
+    def load_cache(self):
+        """
+        Returns the remembered FPGA settings, or an empty dict.
+        """
+        try:
+            with open(FPGA_CACHE_FILE, "r") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def save_cache(self, port):
+        """
+        Remembers the port and USB serial number of the connected FPGA. The
+        vendor and product IDs are not stored, so they only ever filter
+        adapters when configured.
+
+        Args:
+            port (ListPortInfo): Port the FPGA was found on.
+        """
+        cache = self.load_cache()
+        cache.update(
+            {
+                "port": port.device,
+                "serial_number": port.serial_number,
+            }
+        )
+        self.last_port = port.device
+        self.last_serial_number = port.serial_number
+
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(FPGA_CACHE_FILE, "w") as f:
+                json.dump(cache, f, indent=4)
+        except Exception as e:
+            print(f"[WARN] Could not remember FPGA port: {e}")
+
+    def trigger_state(self, state, retry=True):
+        """
+        Sends a single byte to the FPGA to trigger a single state. If the port
+        has gone away, reconnects to the same adapter once and retries.
 
         Args:
             state (int): State that needs to be triggered
+            retry (bool, optional): Reconnect and retry on a serial error.
 
         Returns:
             bool: Returns True if state was successfully triggered. Otherwise False
@@ -77,6 +286,48 @@ class FPGA:
                     print("[WARN] No response received from FPGA")
 
                 return True
+        except serial.SerialException as e:
+            print(f"[ERROR] Serial communication error: {e}")
+            if retry and self.reconnect():
+                return self.trigger_state(state, retry=False)
+            return False
+
+    def upload_lut(self, image, chunk_size=LUT_CHUNK_SIZE):
+        """
+        Uploads a compiled calibration image (see calibration.build_image) in a
+        single transfer: the upload command, the image length as a 4-byte
+        big-endian word and the image itself, sent in chunks. The firmware
+        verifies the trailing CRC-32 and acknowledges the table.
+
+        Args:
+            image (bytes): Calibration image.
+            chunk_size (int, optional): Bytes written per serial write.
+
+        Returns:
+            bool: Returns True if the FPGA acknowledged the table. Otherwise False
+        """
+        if not self.connected:
+            print("[ERROR] No device connected. Call initialize_fpga() first.")
+            return False
+
+        # Sending the image takes about 10 bits per byte on the UART
+        timeout = self.timeout + 10 * len(image) / self.baudrate
+        try:
+            with serial.Serial(self.port, self.baudrate, timeout=timeout) as ser:
+                ser.reset_input_buffer()
+                ser.write(LUT_UPLOAD_COMMAND + len(image).to_bytes(4, "big"))
+                for offset in range(0, len(image), chunk_size):
+                    ser.write(image[offset : offset + chunk_size])
+                ser.flush()
+                print(f"[UART] Uploaded calibration table ({len(image)} bytes)")
+
+                response = ser.read(len(LUT_ACK))
+                if response == LUT_ACK:
+                    print("[INFO] Calibration table acknowledged by FPGA")
+                    return True
+
+                print(f"[ERROR] Calibration table rejected by FPGA: {response}")
+                return False
         except serial.SerialException as e:
             print(f"[ERROR] Serial communication error: {e}")
             return False
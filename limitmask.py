@@ -0,0 +1,325 @@
+import os
+
+import numpy as np
+
+# File the mask check results of a sweep are written to
+MASK_RESULTS_FILE = "mask_results.csv"
+
+# Default deviation, in multiples of the tolerance, that counts as a hard failure
+DEFAULT_HARD_FACTOR = 2.0
+
+
+def trace_key(name):
+    """
+    Returns the part of a trace file name after the band prefix (e.g.
+    "Trc1.csv" or "Ch2_Trc1.csv"), which identifies the trace independently of
+    the band it was saved for.
+    """
+    return name.split("_", 1)[-1]
+
+
+def golden_trace_files(folder_name):
+    """
+    Lists the trace files of the sweep band of a golden-unit measurement
+    folder. Files of further bands cut from the same sweeps are left out, so
+    every trace key maps to a single file.
+
+    Args:
+        folder_name (str): Measurement folder.
+
+    Returns:
+        dict: Trace key to file path
+
+    Raises:
+        ValueError: If the folder holds several bands and has no checkpoint
+            telling which one is the sweep band.
+    """
+    from checkpoint import Checkpoint
+
+    bands = {}
+    for name in sorted(os.listdir(folder_name)):
+        band = name.split("_", 1)[0]
+        if name.endswith(".csv") and "-" in band and "_" in name:
+            bands.setdefault(band, {})[trace_key(name)] = os.path.join(
+                folder_name, name
+            )
+
+    checkpoint = Checkpoint.load(folder_name)
+    if checkpoint is not None:
+        return bands.get(f"{checkpoint.start_freq}-{checkpoint.stop_freq}", {})
+    if len(bands) > 1:
+        raise ValueError(
+            f"{folder_name} holds the bands {', '.join(bands)} and no checkpoint "
+            "telling the sweep band"
+        )
+    return next(iter(bands.values()), {})
+
+
+def phase_trace_keys(vna):
+    """
+    Reads from the display formats on the VNA which traces hold phase, over
+    every channel.
+
+    Args:
+        vna (BaseVNA): Connected VNA, set up as for the golden units.
+
+    Returns:
+        list[str]: Trace keys of the phase traces
+    """
+    keys = []
+    for channel in vna.get_channels():
+        _, trace_names = vna.get_trace_info(channel=channel)
+        formats = vna.get_trace_formats(channel)
+        keys += [
+            trace_key(name)
+            for name, fmt in zip(trace_names, formats)
+            if fmt.upper().startswith("PHAS")
+        ]
+    return keys
+
+
+def build_mask(
+    golden_folders,
+    db_tolerance,
+    deg_tolerance,
+    phase_keys,
+    sigma=3.0,
+    hard_factor=DEFAULT_HARD_FACTOR,
+):
+    """
+    Derives a limit mask from the measurements of one or more golden units.
+    The centre of every trace, state and frequency is the mean over the units
+    (circular mean for phase) and the tolerance is the larger of the fixed
+    tolerance and sigma standard deviations over the units.
+
+    Args:
+        golden_folders (list[str]): Measurement folders of the golden units,
+            all measured with the same states and frequency axis.
+        db_tolerance (float): Fixed tolerance of magnitude traces, above 0.
+        deg_tolerance (float): Fixed tolerance of phase traces in degrees,
+            above 0.
+        phase_keys (list[str]): Trace keys holding phase, e.g. from
+            phase_trace_keys.
+        sigma (float, optional): Spread multiplier when there are several
+            golden units. Defaults to 3.
+        hard_factor (float, optional): Deviation, in multiples of the
+            tolerance, from which a failure is hard. Defaults to 2.
+
+    Returns:
+        dict: Mask arrays, as written by save_mask
+
+    Raises:
+        ValueError: If a tolerance is not positive or the golden units do not
+            share traces, states and frequencies.
+    """
+    from tracecache import load_trace_csv
+
+    if not golden_folders:
+        raise ValueError("No golden unit selected")
+    if db_tolerance <= 0 or deg_tolerance <= 0:
+        raise ValueError("Mask tolerances must be above 0")
+
+    units = [golden_trace_files(folder) for folder in golden_folders]
+    keys = sorted(set.intersection(*(set(files) for files in units)))
+    if not keys:
+        raise ValueError("The golden units have no trace file in common")
+
+    first = load_trace_csv(units[0][keys[0]])
+    frequencies = first.columns.astype(float).to_numpy()
+    states = np.asarray(first.index, dtype=np.int64)
+
+    stack = np.empty((len(units), len(keys), len(states), len(frequencies)))
+    for u, files in enumerate(units):
+        for k, key in enumerate(keys):
+            data = load_trace_csv(files[key])
+            # Repeated states keep their first measurement
+            data = data[~data.index.duplicated()]
+            if list(data.columns.astype(float)) != list(frequencies) or list(
+                data.index
+            ) != list(states):
+                raise ValueError(
+                    f"{files[key]} does not match the states and frequencies of {units[0][keys[0]]}"
+                )
+            stack[u, k] = data.to_numpy(dtype=float)
+
+    phase = np.array([key in phase_keys for key in keys])
+
+    center = stack.mean(axis=0)
+    spread = stack.std(axis=0)
+    if phase.any():
+        phasors = np.exp(1j * np.deg2rad(stack[:, phase]))
+        mean = phasors.mean(axis=0)
+        center[phase] = np.rad2deg(np.angle(mean))
+        # Circular standard deviation in degrees
+        resultant = np.clip(np.abs(mean), 1e-12, 1)
+        spread[phase] = np.rad2deg(np.sqrt(-2 * np.log(resultant)))
+
+    fixed = np.where(phase, deg_tolerance, db_tolerance)[:, None, None]
+    tolerance = np.maximum(fixed, sigma * spread)
+
+    return {
+        "keys": np.array(keys),
+        "phase": phase,
+        "states": states,
+        "frequencies": frequencies,
+        "center": center,
+        "tolerance": tolerance,
+        "hard_factor": np.array(float(hard_factor)),
+        "units": np.array(len(units)),
+    }
+
+
+def save_mask(file_path, mask):
+    """Writes a mask from build_mask to a compressed .npz file"""
+    np.savez_compressed(file_path, **mask)
+
+
+def load_mask(file_path):
+    """
+    Reads a mask written by save_mask.
+
+    Returns:
+        dict: Mask arrays
+    """
+    with np.load(file_path) as data:
+        return {key: data[key] for key in data.files}
+
+
+class MaskCheck:
+    """
+    Checks every fetched state against a golden-unit limit mask. The mask is
+    aligned to the band of the sweep once, so each state is checked in a
+    single vectorized step. One row per state is written to mask_results.csv
+    with the worst deviation in multiples of the tolerance, the number of
+    points outside the mask and the result: PASS, FAIL, HARD (beyond the
+    mask's hard factor) or NO MASK (state not in the golden data).
+
+    Attributes:
+        file_path (str) : Mask results file.
+        hard_factor (float) : Deviation counting as a hard failure.
+    """
+
+    def __init__(self, vna, mask_file, folder_name, start_freq, stop_freq):
+        """
+        Initialization Function
+
+        Args:
+            vna (BaseVNA): Connected VNA.
+            mask_file (str): Mask written by save_mask.
+            folder_name (str): Measurement folder.
+            start_freq (float): Start frequency in GHz.
+            stop_freq (float): Stop frequency in GHz.
+
+        Raises:
+            ValueError: If the mask lacks a trace, does not cover the band or
+                was built for other trace formats.
+        """
+        from vna import band_slice
+
+        mask = load_mask(mask_file)
+        in_gigs, trace_names = vna.cached_trace_info(start_freq, stop_freq)
+        self.steps = len(in_gigs)
+        self.band = band_slice(in_gigs, start_freq, stop_freq)
+        freqs = np.asarray(in_gigs[self.band], dtype=float)
+
+        mask_keys = list(mask["keys"])
+        mask_freqs = mask["frequencies"]
+        tolerance = 1e-9 * max(1.0, abs(freqs).max())
+        if (
+            mask_freqs[0] > freqs[0] + tolerance
+            or mask_freqs[-1] < freqs[-1] - tolerance
+        ):
+            raise ValueError(
+                f"Mask covers {mask_freqs[0]}-{mask_freqs[-1]} GHz, "
+                f"sweep needs {freqs[0]}-{freqs[-1]} GHz"
+            )
+
+        rows = []
+        for name in trace_names:
+            if trace_key(name) not in mask_keys:
+                raise ValueError(f"Mask has no trace {trace_key(name)}")
+            rows.append(mask_keys.index(trace_key(name)))
+
+        # Phase traces are taken from the display formats, not the values
+        self.phase = np.array(vna.get_phase_traces(), dtype=bool)
+        if list(self.phase) != list(mask["phase"][rows]):
+            raise ValueError("The VNA's trace formats differ from the mask's")
+        self.center = np.empty((len(rows), len(mask["states"]), len(freqs)))
+        self.tolerance = np.empty_like(self.center)
+        for i, k in enumerate(rows):
+            for s in range(len(mask["states"])):
+                center = mask["center"][k, s]
+                if self.phase[i]:
+                    # Interpolate the continuous phase, not the wrapped one
+                    center = np.rad2deg(np.unwrap(np.deg2rad(center)))
+                self.center[i, s] = np.interp(freqs, mask_freqs, center)
+                self.tolerance[i, s] = np.interp(
+                    freqs, mask_freqs, mask["tolerance"][k, s]
+                )
+
+        self.state_rows = {}
+        for s, state in enumerate(mask["states"].tolist()):
+            self.state_rows.setdefault(state, s)
+        self.hard_factor = float(mask["hard_factor"])
+
+        self.file_path = os.path.join(folder_name, MASK_RESULTS_FILE)
+        if not os.path.exists(self.file_path):
+            with open(self.file_path, mode="w") as f:
+                f.write("state,worst_ratio,failed_points,result\n")
+
+    def check(self, state, trace_values):
+        """
+        Checks one state and appends its row.
+
+        Args:
+            state (int): Measured state.
+            trace_values (list): All trace values as fetched from the VNA.
+
+        Returns:
+            str: "PASS", "FAIL", "HARD" or "NO MASK"
+        """
+        row = self.state_rows.get(int(state))
+        if row is None:
+            self.save(state, "", "", "NO MASK")
+            return "NO MASK"
+
+        values = np.asarray(trace_values, dtype=float).reshape(-1, self.steps)
+        deviation = values[:, self.band] - self.center[:, row]
+        deviation[self.phase] = (deviation[self.phase] + 180) % 360 - 180
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.abs(deviation) / self.tolerance[:, row]
+        ratio = np.nan_to_num(ratio, nan=np.inf)
+        # No deviation passes, even where the tolerance is 0
+        ratio[deviation == 0] = 0
+
+        worst = float(ratio.max()) if ratio.size else 0.0
+        failed = int(np.count_nonzero(ratio > 1))
+        if worst > self.hard_factor:
+            result = "HARD"
+        elif failed:
+            result = "FAIL"
+        else:
+            result = "PASS"
+
+        self.save(state, f"{worst:.4g}", failed, result)
+        return result
+
+    def save(self, state, worst, failed, result):
+        with open(self.file_path, mode="a") as f:
+            f.write(f"{state},{worst},{failed},{result}\n")
+
+    def summary(self):
+        """
+        Counts the results written so far.
+
+        Returns:
+            dict: Result to number of states
+        """
+        counts = {}
+        with open(self.file_path, "r") as f:
+            next(f)
+            for line in f:
+                result = line.rstrip("\n").rsplit(",", 1)[-1]
+                counts[result] = counts.get(result, 0) + 1
+        return counts
@@ -0,0 +1,187 @@
+import threading
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+# Redraws per second at most
+MAX_FPS = 10
+
+
+def minmax_decimate(x, y, buckets):
+    """
+    Reduces a trace to the minimum and maximum of each of `buckets` equal
+    slices, which keeps every peak visible when drawn at that pixel width.
+
+    Args:
+        x (np.ndarray): Frequency axis.
+        y (np.ndarray): Trace values.
+        buckets (int): Number of slices, normally the plot width in pixels.
+
+    Returns:
+        tuple: (x, y) with at most 2 * buckets points
+    """
+    n = len(y)
+    if buckets < 1 or n <= 2 * buckets:
+        return x, y
+
+    starts = np.linspace(0, n, buckets, endpoint=False).astype(np.intp)
+    ends = np.append(starts[1:], n) - 1
+
+    dec_x = np.empty(2 * buckets)
+    dec_y = np.empty(2 * buckets)
+    dec_x[0::2] = x[starts]
+    dec_x[1::2] = x[ends]
+    dec_y[0::2] = np.minimum.reduceat(y, starts)
+    dec_y[1::2] = np.maximum.reduceat(y, starts)
+    return dec_x, dec_y
+
+
+class LivePlot:
+    """
+    Embedded plot of the most recently measured traces, one panel per trace.
+
+    The acquisition thread hands over data with submit(), which only stores a
+    reference. The Tk thread polls at no more than MAX_FPS, decimates the
+    newest traces to the panel width and redraws just the lines with
+    blitting; the axes are only redrawn when the traces or their range
+    change.
+
+    Attributes:
+        canvas (FigureCanvasTkAgg) : Tk canvas of the figure.
+        figure (Figure) : Matplotlib figure.
+    """
+
+    def __init__(self, parent, root, max_fps=MAX_FPS):
+        """
+        Initialization Function
+
+        Args:
+            parent (tk.Widget): Widget the plot is packed into.
+            root (tk.Tk): Root window, used for scheduling redraws.
+            max_fps (int, optional): Maximum redraws per second.
+        """
+        self.root = root
+        self.interval_ms = max(1, int(1000 / max_fps))
+
+        self.figure = Figure(figsize=(6, 3), dpi=100)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=parent)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+
+        self.lock = threading.Lock()
+        self.pending = None
+        self.names = None
+        self.axes = []
+        self.lines = []
+        self.title = None
+        self.background = None
+
+        self.root.after(self.interval_ms, self.poll)
+
+    def submit(self, state, frequencies, names, values):
+        """
+        Hands over the traces of a state. Safe to call from any thread and
+        never blocks on drawing; a frame not drawn yet is replaced.
+
+        Args:
+            state (int or str): Measured state, shown in the title.
+            frequencies (np.ndarray): Frequency axis in GHz.
+            names (list[str]): Trace names.
+            values (np.ndarray): Traces, shape (traces, frequencies).
+        """
+        with self.lock:
+            self.pending = (state, frequencies, list(names), values)
+
+    def poll(self):
+        with self.lock:
+            data, self.pending = self.pending, None
+
+        if data is not None:
+            try:
+                self.render(*data)
+            except Exception as e:
+                print(f"[WARN] Live plot update failed: {e}")
+
+        self.root.after(self.interval_ms, self.poll)
+
+    def render(self, state, frequencies, names, values):
+        frequencies = np.asarray(frequencies, dtype=float)
+        values = np.asarray(values, dtype=float)
+
+        if names != self.names:
+            self.build(names)
+
+        full_redraw = False
+        for ax, line, y in zip(self.axes, self.lines, values):
+            buckets = max(1, int(ax.bbox.width))
+            line.set_data(*minmax_decimate(frequencies, y, buckets))
+
+            if ax.get_xlim() != (frequencies[0], frequencies[-1]):
+                ax.set_xlim(frequencies[0], frequencies[-1])
+                full_redraw = True
+            if self.rescale(ax, y):
+                full_redraw = True
+
+        self.title.set_text(f"State {state}")
+
+        if full_redraw or self.background is None:
+            # The draw event captures the new background
+            self.canvas.draw()
+        else:
+            self.blit()
+
+    def build(self, names):
+        """Creates one panel per trace"""
+        self.figure.clear()
+        self.names = names
+        self.axes = self.figure.subplots(len(names), 1, sharex=True, squeeze=False)
+        self.axes = list(self.axes[:, 0])
+        self.lines = []
+        for ax, name in zip(self.axes, names):
+            ax.set_ylabel(name.rsplit("_", 1)[-1].replace(".csv", ""), fontsize=8)
+            ax.tick_params(labelsize=8)
+            ax.grid(True, alpha=0.3)
+            (line,) = ax.plot([], [], linewidth=0.8, animated=True)
+            self.lines.append(line)
+        self.axes[-1].set_xlabel("Frequency (GHz)", fontsize=8)
+        self.title = self.figure.suptitle("", fontsize=9, animated=True)
+        self.background = None
+
+    def rescale(self, ax, y):
+        """
+        Widens the y range when the trace leaves it and narrows it when the
+        trace uses less than a quarter of it.
+
+        Returns:
+            bool: True if the limits changed
+        """
+        finite = y[np.isfinite(y)]
+        if not len(finite):
+            return False
+
+        low, high = finite.min(), finite.max()
+        bottom, top = ax.get_ylim()
+        span = top - bottom
+        if bottom <= low and high <= top and (high - low) >= 0.25 * span:
+            return False
+
+        margin = max(0.1 * (high - low), 0.5)
+        ax.set_ylim(low - margin, high + margin)
+        return True
+
+    def on_draw(self, event=None):
+        """Captures the static parts of the figure after a full draw"""
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_artists()
+
+    def draw_artists(self):
+        for ax, line in zip(self.axes, self.lines):
+            ax.draw_artist(line)
+        if self.title is not None:
+            self.figure.draw_artist(self.title)
+
+    def blit(self):
+        self.canvas.restore_region(self.background)
+        self.draw_artists()
+        self.canvas.blit(self.figure.bbox)
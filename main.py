@@ -1,22 +1,48 @@
+import time
+
+# Taken before any other import, so the startup time includes import cost
+STARTUP_T0 = time.perf_counter()
+
 import json
-import math
-import csv
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
 import datetime
-import time
 import threading
-import pandas as pd
-import numpy as np
 
+from acqprocess import CONTEXT, AcquisitionProcess
+from acquisition import SweepEngine, check_bands, check_mask_options, settle_state
 from fpga import FPGA
+from planner import (
+    KU_TRM_STATES,
+    ORDERINGS,
+    StatePlan,
+    module_blocks,
+    parse_state_spec,
+    read_states_csv,
+)
+from refcache import DEFAULT_MAX_AGE_HOURS, find_reference, register_reference
+from runner import record_queue_result, serial_folder
+from screening import (
+    SEARCHES,
+    check_screening_options,
+    parse_limit_spec,
+    parse_screening,
+)
 from vna import VNA
 
+# Startup times are appended here so they can be tracked across releases
+STARTUP_LOG_FILE = os.path.join(
+    os.path.expanduser("~"), ".mack_iitm", "startup_times.csv"
+)
+
 
 class MackIITMGUI:
     def __init__(self, root):
         self.delay = 0  # Default delay in seconds
+        self.settle_tolerance = 0.05  # dB or degrees between successive sweeps
+        self.settle_max_wait = 2.0  # Upper bound on adaptive settling in seconds
+        self.settle_phase = None  # Phase flag per trace, read once per run
 
         self.root = root
         self.root.title("MACK IITM TESTING SYSTEM")
@@ -30,13 +56,28 @@ class MackIITMGUI:
         self.vna = VNA()
 
         self.file_path = ""
+        self.csv_label_var = tk.StringVar(value="No file selected")
         self.mode_var = tk.StringVar(value="")
         self.device_type_var = tk.StringVar(value="")
         self.test_running = False
 
         self.phase_file_path = ""
         self.amp_file_path = ""
+        self.live_plot = None
+        self.extra_bands = []
+        self.extra_channels = []
+        self.store_on_vna = False
+        self.screening = None
+        self.abort_on_fail = False
+        self.isolated_acquisition = False
         self.analysis_save_path = ""
+        self.att_phase_file_path = ""
+        self.att_amp_file_path = ""
+        self.targets_file_path = ""
+        self.golden_folders = []
+        self.mask_file_path = ""
+        # Set once the operator chose to test without a valid reference line
+        self.raw_traces_confirmed = False
 
         self.title_label = ttk.Label(
             self.root,
@@ -49,15 +90,11 @@ class MackIITMGUI:
         self.create_console()
         self.log("Welcome! Please ensure VNA is connected to before proceeding.")
 
-        self.pause_event = threading.Event()
-        self.cancel_event = threading.Event()
+        # Shared with the acquisition process when it runs in one
+        self.pause_event = CONTEXT.Event()
+        self.cancel_event = CONTEXT.Event()
 
-        self.trigger_states = {
-            ("Transmitter", "Phase Shifter"): (0, 127),
-            ("Transmitter", "Attenuator"): (128, 383),
-            ("Receiver", "Phase Shifter"): (384, 511),
-            ("Receiver", "Attenuator"): (512, 767),
-        }
+        self.trigger_states = KU_TRM_STATES
 
     def create_widgets(self):
         self.tab_control = ttk.Notebook(self.root)
@@ -65,9 +102,15 @@ class MackIITMGUI:
 
         self.testing_tab = ttk.Frame(self.tab_control)
         self.analysis_tab = ttk.Frame(self.tab_control)
+        self.live_tab = ttk.Frame(self.tab_control)
 
         self.tab_control.add(self.testing_tab, text="Testing")
         self.tab_control.add(self.analysis_tab, text="Analysis")
+        self.tab_control.add(self.live_tab, text="Live View")
+
+        # Frame contents that are built the first time they are displayed
+        self.deferred_setups = {}
+        self.tab_control.bind("<<NotebookTabChanged>>", self.on_tab_changed)
 
         # Testing Tab Content
         self.main_container = self.testing_tab
@@ -90,21 +133,78 @@ class MackIITMGUI:
         self.setup_device_select_frame()
 
         self.frame2 = ttk.Frame(self.content_frame)
-        self.setup_frame2()
+        self.defer_setup(self.frame2, self.setup_frame2)
 
         self.config_frame = ttk.Frame(self.content_frame)
-        self.setup_config_frame()
+        self.defer_setup(self.config_frame, self.setup_config_frame)
 
         self.calib_frame = ttk.Frame(self.content_frame)
-        self.setup_calib_frame()
+        self.defer_setup(self.calib_frame, self.setup_calib_frame)
 
         self.frame3 = ttk.Frame(self.content_frame)
-        self.setup_frame3()
+        self.defer_setup(self.frame3, self.setup_frame3)
 
         self.amplifier_test_frame = ttk.Frame(self.content_frame)
-        self.setup_amplifier_frame()
+        self.defer_setup(self.amplifier_test_frame, self.setup_amplifier_frame)
 
         # Analysis Tab Content
+        self.defer_setup(self.analysis_tab, self.setup_analysis_tab)
+
+        # Live View Tab Content
+        self.defer_setup(self.live_tab, self.setup_live_tab)
+
+    def defer_setup(self, frame, setup):
+        """Registers the function that builds a frame's contents on first display"""
+        self.deferred_setups[frame] = setup
+
+    def ensure_built(self, frame):
+        """Builds the contents of a deferred frame if that has not happened yet"""
+        setup = self.deferred_setups.pop(frame, None)
+        if setup is not None:
+            setup()
+
+    def is_built(self, frame):
+        return frame not in self.deferred_setups
+
+    def show_frame(self, frame, **pack_options):
+        """Packs a frame, building its contents first if needed"""
+        self.ensure_built(frame)
+        frame.pack(**pack_options)
+
+    def on_tab_changed(self, event=None):
+        selected = self.tab_control.nametowidget(self.tab_control.select())
+        self.ensure_built(selected)
+
+    def report_startup_time(self):
+        """Logs the time until the GUI is first idle and appends it to the log file"""
+        elapsed_ms = (time.perf_counter() - STARTUP_T0) * 1000
+        self.log(f"[INFO] Startup time: {elapsed_ms:.0f} ms", "info")
+
+        try:
+            os.makedirs(os.path.dirname(STARTUP_LOG_FILE), exist_ok=True)
+            with open(STARTUP_LOG_FILE, "a") as f:
+                f.write(f"{datetime.datetime.now().isoformat()},{elapsed_ms:.1f}\n")
+        except OSError as e:
+            print(f"[WARN] Could not record startup time: {e}")
+
+    def setup_live_tab(self):
+        """Embeds the live trace plot, fed by the sweep engine"""
+        try:
+            from liveplot import LivePlot
+        except ImportError as e:
+            ttk.Label(
+                self.live_tab, text=f"Live view unavailable: {e}", foreground="red"
+            ).pack(pady=20)
+            return
+
+        self.live_plot = LivePlot(self.live_tab, self.root)
+
+    def publish_traces(self, state, frequencies, names, values):
+        """Hands the traces of a measured state to the live plot, if it is open"""
+        if self.live_plot is not None:
+            self.live_plot.submit(state, frequencies, names, values)
+
+    def setup_analysis_tab(self):
         analysis_container = ttk.Frame(self.analysis_tab)
         analysis_container.pack(fill="both", expand=True)
 
@@ -113,7 +213,7 @@ class MackIITMGUI:
         inner_frame.pack(anchor="center", pady=20)
 
         # Row 0: Equibits label and entry
-        ttk.Label(inner_frame, text="Equibits", font=("Arial", 10)).grid(
+        ttk.Label(inner_frame, text="Equibits (e.g. 4-7)", font=("Arial", 10)).grid(
             row=0, column=0, sticky="w", padx=(0, 10), pady=5
         )
         self.equibits_entry = ttk.Entry(inner_frame, width=40)
@@ -163,6 +263,273 @@ class MackIITMGUI:
             row=7, column=0, columnspan=2, sticky="ew", pady=15
         )
 
+        # Row 8: Joint phase/attenuation search. The phase and amplitude files
+        # above are used as the phase shifter block.
+        joint_frame = ttk.LabelFrame(inner_frame, text="Joint State Search")
+        joint_frame.grid(row=8, column=0, columnspan=2, sticky="ew", pady=5)
+        joint_frame.columnconfigure(1, weight=1)
+
+        self.att_phase_label = ttk.Label(
+            joint_frame, text="No attenuator phase file selected"
+        )
+        self.att_amp_label = ttk.Label(
+            joint_frame, text="No attenuator amplitude file selected"
+        )
+        self.targets_label = ttk.Label(joint_frame, text="No targets file selected")
+        uploads = [
+            ("Attenuator Phase CSV", "att_phase_file_path", self.att_phase_label),
+            ("Attenuator Amplitude CSV", "att_amp_file_path", self.att_amp_label),
+            ("Targets CSV (phase, dB)", "targets_file_path", self.targets_label),
+        ]
+        for row, (text, attribute, label) in enumerate(uploads):
+            ttk.Button(
+                joint_frame,
+                text=text,
+                command=lambda a=attribute, l=label, t=text: self.upload_joint_csv(
+                    a, l, t
+                ),
+            ).grid(row=row, column=0, sticky="ew", padx=5, pady=2)
+            label.grid(row=row, column=1, sticky="w", padx=5)
+
+        ttk.Label(joint_frame, text="Degrees per dB").grid(
+            row=3, column=0, sticky="w", padx=5, pady=2
+        )
+        self.db_weight_entry = ttk.Entry(joint_frame, width=10)
+        self.db_weight_entry.insert(0, "1")
+        self.db_weight_entry.grid(row=3, column=1, sticky="w", padx=5)
+
+        ttk.Button(
+            joint_frame, text="Find Optimal States", command=self.run_joint_search
+        ).grid(row=4, column=0, columnspan=2, sticky="ew", padx=5, pady=5)
+
+        # Row 9: Calibration tables compiled by Run Analysis
+        lut_frame = ttk.LabelFrame(inner_frame, text="Calibration LUT")
+        lut_frame.grid(row=9, column=0, columnspan=2, sticky="ew", pady=5)
+        lut_frame.columnconfigure(1, weight=1)
+
+        ttk.Label(lut_frame, text="Bands in GHz (e.g. 8-9,9-10)").grid(
+            row=0, column=0, sticky="w", padx=5, pady=2
+        )
+        self.lut_bands_entry = ttk.Entry(lut_frame, width=30)
+        self.lut_bands_entry.grid(row=0, column=1, sticky="ew", padx=5)
+
+        ttk.Button(lut_frame, text="Upload LUT to FPGA", command=self.upload_lut).grid(
+            row=1, column=0, columnspan=2, sticky="ew", padx=5, pady=5
+        )
+
+        # Row 10: Limit mask from golden-unit measurement folders
+        mask_frame = ttk.LabelFrame(inner_frame, text="Golden Limit Mask")
+        mask_frame.grid(row=10, column=0, columnspan=2, sticky="ew", pady=5)
+        mask_frame.columnconfigure(1, weight=1)
+
+        ttk.Button(
+            mask_frame, text="Add Golden Unit Folder", command=self.add_golden_folder
+        ).grid(row=0, column=0, sticky="ew", padx=5, pady=2)
+        self.golden_label = ttk.Label(mask_frame, text="No golden unit selected")
+        self.golden_label.grid(row=0, column=1, sticky="w", padx=5)
+
+        self.mask_entries = {}
+        fields = [
+            ("db", "Tolerance (dB)", "1"),
+            ("deg", "Tolerance (deg)", "10"),
+            ("sigma", "Sigma (several units)", "3"),
+            ("hard", "Hard failure (x tolerance)", "2"),
+        ]
+        for row, (key, text, default) in enumerate(fields, start=1):
+            ttk.Label(mask_frame, text=text).grid(
+                row=row, column=0, sticky="w", padx=5, pady=2
+            )
+            entry = ttk.Entry(mask_frame, width=10)
+            entry.insert(0, default)
+            entry.grid(row=row, column=1, sticky="w", padx=5)
+            self.mask_entries[key] = entry
+
+        ttk.Button(mask_frame, text="Build Mask", command=self.build_limit_mask).grid(
+            row=5, column=0, columnspan=2, sticky="ew", padx=5, pady=5
+        )
+
+    def add_golden_folder(self):
+        """Adds the measurement folder of a golden unit to the mask inputs"""
+        folder_path = filedialog.askdirectory(title="Select golden unit folder")
+        if not folder_path:
+            self.log("[Analysis] Golden unit selection cancelled.", "warning")
+            return
+
+        if folder_path not in self.golden_folders:
+            self.golden_folders.append(folder_path)
+        self.golden_label.config(text=f"{len(self.golden_folders)} golden unit(s)")
+        self.log(f"[Analysis] Golden unit added: {folder_path}", "info")
+
+    def build_limit_mask(self):
+        """Builds a limit mask from the golden units and saves it as .npz"""
+        try:
+            values = {key: float(e.get()) for key, e in self.mask_entries.items()}
+            if (
+                values["sigma"] < 0
+                or min(values["db"], values["deg"], values["hard"]) <= 0
+            ):
+                raise ValueError
+        except ValueError:
+            self.log(
+                "[ERROR] Mask tolerances and hard failure factor must be above 0, sigma non-negative.",
+                "error",
+            )
+            return
+
+        if not self.golden_folders:
+            self.log("[ERROR] Please add a golden unit folder.", "error")
+            return
+        if not self.analysis_save_path:
+            self.log("[ERROR] Please select a save location.", "error")
+            return
+        if not self.vna.connected:
+            self.log(
+                "[ERROR] Connect the VNA, set up as for the golden units, to read the trace formats.",
+                "error",
+            )
+            return
+
+        try:
+            from limitmask import build_mask, phase_trace_keys, save_mask
+
+            mask = build_mask(
+                self.golden_folders,
+                values["db"],
+                values["deg"],
+                phase_trace_keys(self.vna),
+                sigma=values["sigma"],
+                hard_factor=values["hard"],
+            )
+            mask_path = os.path.join(self.analysis_save_path, "limit_mask.npz")
+            save_mask(mask_path, mask)
+        except Exception as e:
+            self.log(f"[ERROR] Could not build limit mask: {e}", "error")
+            return
+
+        phase = [key for key, p in zip(mask["keys"], mask["phase"]) if p]
+        self.log(
+            f"[INFO] Mask of {len(mask['keys'])} traces x {len(mask['states'])} states "
+            f"from {len(self.golden_folders)} golden unit(s); phase traces: {', '.join(phase) or 'none'}",
+            "info",
+        )
+        self.log(f"Save location: {mask_path}", "info")
+
+    def upload_lut(self):
+        """Sends a compiled calibration LUT file to the FPGA"""
+        if not self.fpga.connected:
+            self.log("[ERROR] FPGA not connected.", "error")
+            return
+        if self.test_running:
+            self.log("[ERROR] Wait for the running test to finish.", "error")
+            return
+
+        file_path = filedialog.askopenfilename(filetypes=[("Calibration LUT", "*.lut")])
+        if not file_path:
+            self.log("[Analysis] LUT upload cancelled.", "warning")
+            return
+
+        try:
+            from calibration import read_image
+
+            with open(file_path, "rb") as f:
+                image = f.read()
+            table, bits, bands = read_image(image)
+        except (OSError, ValueError) as e:
+            self.log(f"[ERROR] Invalid calibration LUT: {e}", "error")
+            return
+
+        self.log(
+            f"[INFO] Uploading {bits}-bit LUT with {len(bands)} bands ({len(image)} bytes)...",
+            "info",
+        )
+        threading.Thread(target=self._upload_lut, args=(image,), daemon=True).start()
+
+    def _upload_lut(self, image):
+        if self.fpga.upload_lut(image):
+            self.log_threadsafe("[INFO] Calibration LUT uploaded", "success")
+        else:
+            self.log_threadsafe("[ERROR] Calibration LUT upload failed", "error")
+
+    def upload_joint_csv(self, attribute, label, description):
+        """
+        Selects one of the joint search input files.
+
+        Args:
+            attribute (str): Attribute the file path is stored in.
+            label (ttk.Label): Label showing the file name.
+            description (str): Name of the file used in messages.
+        """
+        file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
+        if file_path:
+            setattr(self, attribute, file_path)
+            filename = os.path.basename(file_path)
+            label.config(text=filename)
+            self.log(f"[Analysis] {description} uploaded: {filename}", "info")
+        else:
+            self.log(f"[Analysis] {description} upload cancelled.", "warning")
+
+    def run_joint_search(self):
+        """
+        Finds the phase shifter/attenuator state pair closest to every target
+        point at every frequency and saves the table as CSV.
+        """
+        try:
+            db_weight = float(self.db_weight_entry.get())
+            if db_weight <= 0:
+                raise ValueError
+        except ValueError:
+            self.log("[ERROR] Degrees per dB must be a positive number.", "error")
+            return
+
+        required = [
+            (self.phase_file_path, "phase shifter phase CSV"),
+            (self.amp_file_path, "phase shifter amplitude CSV"),
+            (self.att_phase_file_path, "attenuator phase CSV"),
+            (self.att_amp_file_path, "attenuator amplitude CSV"),
+            (self.targets_file_path, "targets CSV"),
+        ]
+        for path, description in required:
+            if not path:
+                self.log(f"[ERROR] Please upload a {description}.", "error")
+                return
+
+        if not self.analysis_save_path:
+            self.log("[ERROR] Please select a save location.", "error")
+            return
+
+        try:
+            from analysis import optimal_states, read_targets
+            from tracecache import load_trace_csv
+
+            self.log("[INFO] Searching optimal states...", "info")
+            start = time.perf_counter()
+            table = optimal_states(
+                load_trace_csv(self.phase_file_path),
+                load_trace_csv(self.amp_file_path),
+                load_trace_csv(self.att_phase_file_path),
+                load_trace_csv(self.att_amp_file_path),
+                read_targets(self.targets_file_path),
+                db_weight,
+            )
+
+            report_path = os.path.join(self.analysis_save_path, "Optimal_States.csv")
+            table.to_csv(report_path, index=False)
+
+            self.log(
+                f"[INFO] {len(table)} lookups in {time.perf_counter() - start:.1f} s, "
+                f"worst phase error {table['phase_error'].abs().max():.3f} deg, "
+                f"worst amplitude error {table['db_error'].abs().max():.3f} dB",
+                "info",
+            )
+            self.log(f"Save location: {report_path}", "info")
+            self.log("[INFO] Joint state search completed successfully!", "success")
+        except Exception as e:
+            self.log(
+                "[ERROR] Joint state search failed. Please ensure the correct files are added.",
+                "error",
+            )
+            self.log(f"{e}", "error")
+
     def upload_amp_csv(self):
         file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
         if file_path:
@@ -206,8 +573,15 @@ class MackIITMGUI:
         try:
             equibits = self.equibits_entry.get().strip()
             amp_analysis = True
-            if not equibits.isdigit():
-                self.log("[ERROR] Equibits must be a positive integer.", "error")
+            try:
+                resolutions = sorted(set(parse_state_spec(equibits)))
+            except ValueError:
+                resolutions = []
+            if not resolutions or min(resolutions) < 1:
+                self.log(
+                    "[ERROR] Equibits must be positive integers, e.g. 4,5,6,7 or 4-7.",
+                    "error",
+                )
                 return
 
             if not self.phase_file_path:
@@ -223,135 +597,42 @@ class MackIITMGUI:
 
             self.log("[INFO] Starting analysis...", "info")
 
-            trace_data = pd.read_csv(
-                # "/home/ganther/Hithesh/Projects/MACK/VNA_automation/results/measurements with report/15.5-17.5_Trc3.csv",
-                # "/home/ganther/Hithesh/Projects/MACK/VNA_automation/results/measurement 201 points/15.5-17.5_Trc6.csv",
-                self.phase_file_path,
-                index_col=0,
-            )
-
-            if amp_analysis:
-                amp_data = pd.read_csv(
-                    # "/home/ganther/Hithesh/Projects/MACK/VNA_automation/results/measurements with report/15.5-17.5_Trc3.csv",
-                    # "/home/ganther/Hithesh/Projects/MACK/VNA_automation/results/measurement 201 points/15.5-17.5_Trc6.csv",
-                    self.amp_file_path,
-                    index_col=0,
+            from analysis import analyze, save_report, summarize
+            from calibration import compile_lut, parse_bands, save_image
+            from tracecache import load_trace_csv
+
+            # Parsed once, then memory-mapped from a binary sidecar
+            trace_data = load_trace_csv(self.phase_file_path)
+            amp_data = load_trace_csv(self.amp_file_path) if amp_analysis else None
+
+            # All resolutions share the base-referenced phase matrix
+            base_data, results = analyze(trace_data, resolutions, amp_data)
+
+            bits_label = "-".join(str(bits) for bits in resolutions)
+            report_path = f"{self.analysis_save_path}/Analysis_{bits_label}.xlsx"
+            save_report(report_path, base_data, results)
+
+            # One calibration image per resolution for upload to the FPGA
+            frequencies = base_data.columns.astype(float).to_numpy()
+            bands = parse_bands(self.lut_bands_entry.get(), frequencies)
+            for bits in resolutions:
+                lut_path = f"{self.analysis_save_path}/Calibration_{bits}.lut"
+                save_image(lut_path, compile_lut(base_data, bits, bands), bits, bands)
+                self.log(
+                    f"[INFO] {bits}-bit calibration LUT ({len(bands)} bands) saved to {lut_path}",
+                    "info",
                 )
-                re_arr_amp = amp_data.copy()
-
-            equi_bits = int(self.equibits_entry.get())
-
-            # Adjust phase relative to first value
-            base_data = trace_data - trace_data.iloc[0]
-            base_data = base_data.where(base_data >= 0, base_data + 360)
-            base_data.to_excel(
-                f"{self.analysis_save_path}/Analysis_{equi_bits}.xlsx",
-                sheet_name="positive_converted",
-            )
 
-            # Ideal reference values
-            one_angle = 360 / 2**equi_bits
-            ideal = [i * one_angle for i in range(2**equi_bits)]  # C in MATLAB
-
-            def process_it(bd):
-                C = np.array(ideal)
-                Array4_column = np.array(bd)
-                z = []
-                O_column = []
-
-                for k in range(len(C)):
-                    z1 = C[k] - Array4_column
-                    min_abs_diff = np.min(np.abs(z1))
-                    z.append(min_abs_diff)
-                    indices_with_min = np.where(np.abs(z1) == min_abs_diff)[0]
-                    min_index = np.min(indices_with_min)
-                    # MATLAB is 1-based indexing
-                    O_column.append(int(min_index) + 1)
-
-                re_arr = list()
-                for i in O_column:
-                    re_arr.append(bd.iloc[i - 1])
-
-                print(f"Max z: {max(z)}, Min z: {min(z)}")
-                print(O_column)
-                return pd.DataFrame(re_arr), O_column
-
-            # Method 1: Process all columns and store re_arranged in a dictionary
-            re_arranged = {}
-            rmse_values = {}
-            max_min_errors = {}
-            ideal_df = pd.DataFrame(ideal)
-
-            for i, column in enumerate(base_data.columns):
-                print(f"Processing column: {column}")
-
-                # Process the column
-                fixed, ocol = process_it(base_data[column])
-                if amp_analysis:
-                    for j, col in enumerate(ocol):
-                        print(col)
-                        re_arr_amp.iloc[j, i] = amp_data.iloc[col - 1, i]
-
-                # Calculate RMSE
-                diff = ideal_df - fixed
-                diff_squared = diff**2
-                avg = diff_squared.values.mean()
-                rmse = math.sqrt(avg)
-
-                # Store re_arranged
-                re_arranged[column] = fixed.iloc[
-                    :, 0
-                ].values  # Extract the series from DataFrame
-                rmse_values[column] = rmse
-                max_min_errors[column] = {
-                    "max_error": diff.max()[0],
-                    "min_error": diff.min()[0],
-                }
-
-                print(f"RMSE for {column}: {rmse}")
-                print("-" * 50)
-
-            max_rms_min = {}
-
-            for col in rmse_values.keys():
-                max_rms_min[col] = [
-                    max_min_errors[col]["max_error"],
-                    rmse_values[col],
-                    max_min_errors[col]["min_error"],
-                ]
-
-            max_rms_min_df = pd.DataFrame(max_rms_min)
-            max_rms_min_df.to_excel(
-                f"{self.analysis_save_path}/PS_MAX_RMS_MIN_{equi_bits}.xlsx"
-            )
-            re_arranged_df = pd.DataFrame(re_arranged)
-
-            with pd.ExcelWriter(
-                f"{self.analysis_save_path}/Analysis_{equi_bits}.xlsx",
-                engine="openpyxl",
-                mode="a",
-                if_sheet_exists="replace",
-            ) as writer:
-                re_arranged_df.to_excel(writer, sheet_name="re_arranged")
-
-            with pd.ExcelWriter(
-                f"{self.analysis_save_path}/PS_MAX_RMS_MIN_{equi_bits}.xlsx",
-                engine="openpyxl",
-                mode="a",
-                if_sheet_exists="replace",
-            ) as writer:
-                # pd.DataFrame(rmse_values).to_excel(writer, sheet_name="RMS")
-                pd.Series(rmse_values).to_excel(writer, sheet_name="RMS")
-                # re_arranged_df.to_excel(writer, sheet_name="re_arranged")
-
-            if amp_analysis:
-                re_arr_amp.to_excel(f"{self.analysis_save_path}/AMP_{equi_bits}.xlsx")
+            for bits, row in summarize(results).iterrows():
+                self.log(
+                    f"{bits} bits: worst RMSE {row['worst_rmse']:.3f}, max error {row['max_error']:.3f}, min error {row['min_error']:.3f}",
+                    "info",
+                )
 
             self.log(f"Equibits: {equibits}", "info")
             self.log(f"Phase file: {os.path.basename(self.phase_file_path)}", "info")
-            self.log(f"Save location: {self.analysis_save_path}", "info")
+            self.log(f"Save location: {report_path}", "info")
 
-            # Here you would implement your analysis logic
             self.log("[INFO] Analysis completed successfully!", "success")
         except Exception as e:
             self.log(
@@ -472,6 +753,20 @@ class MackIITMGUI:
             state="readonly",
         )
 
+        # Measure all four blocks in one session instead of the selected one
+        self.full_module_var = tk.BooleanVar(value=False)
+        self.full_module_check = ttk.Checkbutton(
+            self.ku_trm_options_frame,
+            text="Full module (all blocks)",
+            variable=self.full_module_var,
+            command=self.on_full_module_change,
+        )
+
+    def on_full_module_change(self):
+        state = ["disabled"] if self.full_module_var.get() else ["!disabled"]
+        self.role_dropdown.state(state)
+        self.module_type_dropdown.state(state)
+
     def setup_amplifier_frame(self):
         """Create special UI elements for Amplifier mode"""
 
@@ -479,9 +774,24 @@ class MackIITMGUI:
         test_frame = ttk.Frame(self.amplifier_test_frame)
         test_frame.pack(fill="x", expand=True)
 
+        # Multi-capture mode for drift and stability checks
+        capture_frame = ttk.Frame(test_frame)
+        capture_frame.pack(pady=5)
+        self.captures_entry = self.add_labeled_entry(capture_frame, "Captures:")
+        self.captures_entry.insert(0, "1")
+        self.capture_interval_entry = self.add_labeled_entry(
+            capture_frame, "Interval (seconds):"
+        )
+        self.capture_interval_entry.insert(0, "0")
+        self.save_raw_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            capture_frame, text="Save raw captures", variable=self.save_raw_var
+        ).pack(anchor="w")
+
         ttk.Button(
             test_frame, text="Save Traces", command=self.run_amplifier_test
         ).pack(pady=10)
+        ttk.Button(test_frame, text="Cancel", command=self.cancel_test).pack()
 
     def setup_calib_frame(self):
         frame_content = ttk.Frame(self.calib_frame)
@@ -540,6 +850,22 @@ class MackIITMGUI:
 
         self.save_ref_button.pack()
 
+        self.normalize_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            button_frame,
+            text="Normalize sweeps to the reference line",
+            variable=self.normalize_var,
+        ).pack(pady=5)
+
+        max_age_frame = ttk.Frame(button_frame)
+        max_age_frame.pack(pady=5)
+        ttk.Label(max_age_frame, text="Reuse reference for (hours):").pack(
+            side="left", padx=(0, 5)
+        )
+        self.ref_max_age_entry = ttk.Entry(max_age_frame, width=8)
+        self.ref_max_age_entry.insert(0, str(DEFAULT_MAX_AGE_HOURS))
+        self.ref_max_age_entry.pack(side="left")
+
         self.next_button = ttk.Button(
             button_frame,
             text="Next",
@@ -562,7 +888,14 @@ class MackIITMGUI:
         if directory:
             self.calib_path_var.set(directory)
 
-    def save_ref_line(self):
+    def save_ref_line(self, on_saved=None):
+        """
+        Captures the reference line into the calibration folder.
+
+        Args:
+            on_saved (callable, optional): Called on the Tk thread once the
+                reference has been saved.
+        """
         save_path = self.calib_path_var.get().strip()
 
         if not save_path:
@@ -571,10 +904,34 @@ class MackIITMGUI:
             messagebox.showerror("Error", "Please select a folder to save data.")
             return
 
+        if self.test_running:
+            self.log("[ERROR] A test is already running", "error")
+            return
+
         folder_path = f"{save_path}/ref_lines_{self.start_freq}-{self.stop_freq}"
-        os.makedirs(folder_path, exist_ok=True, mode=0o777)
-        self.vna.save_traces_amp(folder_path, self.start_freq, self.stop_freq)
-        self.log("Reference values saved", "success")
+        self.test_running = True
+        threading.Thread(
+            target=self._save_ref_line, args=(folder_path, on_saved), daemon=True
+        ).start()
+
+    def _save_ref_line(self, folder_path, on_saved=None):
+        """Fetch and store the reference traces off the Tk thread"""
+        try:
+            os.makedirs(folder_path, exist_ok=True, mode=0o777)
+            self.vna.save_traces_amp(folder_path, self.start_freq, self.stop_freq)
+            register_reference(
+                folder_path,
+                self.vna.get_configuration(),
+                self.start_freq,
+                self.stop_freq,
+            )
+            self.log_threadsafe("Reference values saved", "success")
+            if on_saved is not None:
+                self.root.after(0, on_saved)
+        except Exception as e:
+            self.log_threadsafe(f"[ERROR] Saving reference failed: {str(e)}", "error")
+        finally:
+            self.test_running = False
 
     def go_next(self):
         """Save calibration data to the specified path"""
@@ -586,6 +943,38 @@ class MackIITMGUI:
             messagebox.showerror("Error", "Please select a folder to save data.")
             return
 
+        if self.normalize_var.get():
+            folder_path, age = find_reference(
+                self.vna.get_configuration(),
+                self.start_freq,
+                self.stop_freq,
+                self.get_ref_max_age(),
+            )
+            self.raw_traces_confirmed = False
+            if folder_path is not None:
+                self.log(
+                    f"Reference line from {age:.1f} h ago matches the VNA configuration and will be reused",
+                    "info",
+                )
+            else:
+                capture = messagebox.askyesnocancel(
+                    "Reference line",
+                    "No valid reference line for this configuration.\n\n"
+                    "Connect the reference line and capture it now?\n"
+                    "Yes: capture it, then continue. No: continue and store raw "
+                    "traces only. Cancel: stay on this page.",
+                )
+                if capture is None:
+                    return
+                if capture:
+                    self.save_ref_line(on_saved=self.go_next)
+                    return
+                self.raw_traces_confirmed = True
+                self.log(
+                    "[WARN] No valid reference line for this configuration, storing raw traces only",
+                    "warning",
+                )
+
         try:
             self.save_path = save_path
             print(self.save_path)
@@ -607,22 +996,47 @@ class MackIITMGUI:
             self.log("[ERROR] A test is already running", "error")
             return
 
+        try:
+            captures = int(self.captures_entry.get())
+            interval = float(self.capture_interval_entry.get())
+            if captures < 1 or interval < 0:
+                raise ValueError
+        except ValueError:
+            self.log("[ERROR] Enter a valid number of captures and interval", "error")
+            return
+
         self.test_running = True
-        threading.Thread(target=self._run_amplifier_test, daemon=True).start()
+        threading.Thread(
+            target=self._run_amplifier_test,
+            args=(captures, interval, self.save_raw_var.get()),
+            daemon=True,
+        ).start()
 
-    def _run_amplifier_test(self):
+    def _run_amplifier_test(self, captures=1, interval=0, save_raw=False):
         """Perform the actual amplifier test"""
         folder_name = f"{self.save_path}/{datetime.datetime.now().strftime('measurement_%Y-%m-%d_%H-%M-%S')}"
         os.makedirs(folder_name, exist_ok=True, mode=0o777)
         try:
-            self.vna.save_traces_amp(
-                folder_name, self.start_freq, self.stop_freq
-            )  # TODO : UNCOMMENT
+            if captures > 1:
+                self.run_engine(
+                    "capture",
+                    folder_name,
+                    self.start_freq,
+                    self.stop_freq,
+                    captures,
+                    interval,
+                    save_raw=save_raw,
+                )
+            else:
+                self.vna.save_traces_amp(
+                    folder_name, self.start_freq, self.stop_freq
+                )  # TODO : UNCOMMENT
 
-            self.log_threadsafe("Amplifier data successfully saved", "success")
+                self.log_threadsafe("Amplifier data successfully saved", "success")
         except Exception as e:
             self.log_threadsafe(f"[ERROR] Amplifier test failed: {str(e)}", "error")
         finally:
+            self.cancel_event.clear()
             self.test_running = False
 
     def setup_frame2(self):
@@ -641,6 +1055,80 @@ class MackIITMGUI:
 
         self.start_freq_entry.bind("<KeyRelease>", self.hide_frame3_on_change)
         self.stop_freq_entry.bind("<KeyRelease>", self.hide_frame3_on_change)
+
+        # Further bands cut from the same sweeps, e.g. "15.5-16,17-17.5"
+        ttk.Label(frame_content, text="Extra Bands (GHz)").grid(
+            row=2, column=0, sticky="w", padx=5, pady=(5, 0)
+        )
+        self.extra_bands_entry = ttk.Entry(frame_content, width=24)
+        self.extra_bands_entry.grid(
+            row=2, column=1, columnspan=3, sticky="w", pady=(5, 0)
+        )
+        self.extra_bands_entry.bind("<KeyRelease>", self.hide_frame3_on_change)
+
+        # Channels other than 1 set up on the VNA are fetched with every state
+        self.all_channels_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame_content,
+            text="Measure all VNA channels",
+            variable=self.all_channels_var,
+            command=self.hide_frame3_on_change,
+        ).grid(row=3, column=0, columnspan=4, sticky="w", padx=5, pady=(5, 0))
+
+        # For large sweeps: the VNA keeps every state in a file of its own and
+        # all files are transferred once the sweep is done
+        self.store_on_vna_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame_content,
+            text="Store traces on VNA, transfer at end",
+            variable=self.store_on_vna_var,
+            command=self.hide_frame3_on_change,
+        ).grid(row=4, column=0, columnspan=4, sticky="w", padx=5, pady=(5, 0))
+
+        # Go/no-go screening reads markers and limit flags instead of traces
+        screen_frame = ttk.LabelFrame(frame_content, text="Screening (optional)")
+        screen_frame.grid(row=5, column=0, columnspan=6, sticky="ew", pady=(5, 0))
+        ttk.Label(screen_frame, text="Markers (GHz)").grid(
+            row=0, column=0, sticky="w", padx=5
+        )
+        self.screen_markers_entry = ttk.Entry(screen_frame, width=20)
+        self.screen_markers_entry.grid(row=0, column=1, sticky="w")
+        ttk.Label(screen_frame, text="Search").grid(row=0, column=2, sticky="w", padx=5)
+        self.screen_search_var = tk.StringVar(value="None")
+        ttk.Combobox(
+            screen_frame,
+            textvariable=self.screen_search_var,
+            values=["None"] + SEARCHES,
+            state="readonly",
+            width=6,
+        ).grid(row=0, column=3, sticky="w")
+        ttk.Label(screen_frame, text="Limits (lower:upper per trace)").grid(
+            row=1, column=0, sticky="w", padx=5
+        )
+        self.screen_limits_entry = ttk.Entry(screen_frame, width=20)
+        self.screen_limits_entry.grid(row=1, column=1, sticky="w", pady=(0, 5))
+
+        # Check every state against a golden limit mask built on the Analysis tab
+        mask_frame = ttk.Frame(frame_content)
+        mask_frame.grid(row=6, column=0, columnspan=6, sticky="w", pady=(5, 0))
+        ttk.Button(mask_frame, text="Select Limit Mask", command=self.select_mask).pack(
+            side="left", padx=5
+        )
+        self.mask_label = ttk.Label(mask_frame, text="No limit mask")
+        self.mask_label.pack(side="left", padx=5)
+        self.abort_on_fail_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            mask_frame, text="Abort on hard failure", variable=self.abort_on_fail_var
+        ).pack(side="left", padx=5)
+
+        # Keeps acquisition timing independent of the GUI and analysis
+        self.isolated_acquisition_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame_content,
+            text="Run acquisition in a separate process",
+            variable=self.isolated_acquisition_var,
+        ).grid(row=7, column=0, columnspan=4, sticky="w", padx=5, pady=(5, 0))
+
         self.config_button = ttk.Button(
             frame_content, text="CONFIGURE", command=self.configure_measurement
         )
@@ -669,13 +1157,77 @@ class MackIITMGUI:
         self.delay_entry.insert(0, str(self.delay))  # Set default value
         self.delay_entry.bind("<KeyRelease>", self.update_delay)
 
+        # Adaptive settling: in adaptive modes the delay above is the minimum wait
+        settle_frame = ttk.Frame(self.radio_panel)
+        settle_frame.pack(side="right", anchor="ne", padx=20)
+
+        ttk.Label(settle_frame, text="Settle:").grid(row=0, column=0, sticky="w")
+        self.settle_mode_var = tk.StringVar(value="Fixed")
+        ttk.Combobox(
+            settle_frame,
+            textvariable=self.settle_mode_var,
+            values=["Fixed", "Adaptive (trace)", "Adaptive (marker)"],
+            state="readonly",
+            width=16,
+        ).grid(row=0, column=1, sticky="w", padx=5)
+
+        ttk.Label(settle_frame, text="Tolerance:").grid(row=1, column=0, sticky="w")
+        self.settle_tolerance_entry = ttk.Entry(settle_frame, width=6)
+        self.settle_tolerance_entry.grid(row=1, column=1, sticky="w", padx=5)
+        self.settle_tolerance_entry.insert(0, str(self.settle_tolerance))
+        self.settle_tolerance_entry.bind("<KeyRelease>", self.update_settle)
+
+        ttk.Label(settle_frame, text="Max wait (s):").grid(row=2, column=0, sticky="w")
+        self.settle_max_wait_entry = ttk.Entry(settle_frame, width=6)
+        self.settle_max_wait_entry.grid(row=2, column=1, sticky="w", padx=5)
+        self.settle_max_wait_entry.insert(0, str(self.settle_max_wait))
+        self.settle_max_wait_entry.bind("<KeyRelease>", self.update_settle)
+
+        # Order in which states are triggered, results keep the requested order
+        ordering_frame = ttk.Frame(self.radio_panel)
+        ordering_frame.pack(side="right", anchor="ne", padx=20)
+
+        ttk.Label(ordering_frame, text="Order:").grid(row=0, column=0, sticky="w")
+        self.ordering_var = tk.StringVar(value="As entered")
+        ttk.Combobox(
+            ordering_frame,
+            textvariable=self.ordering_var,
+            values=list(ORDERINGS.keys()),
+            state="readonly",
+            width=16,
+        ).grid(row=0, column=1, sticky="w", padx=5)
+
+        self.keep_repeats_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            ordering_frame,
+            text="Keep repeated states",
+            variable=self.keep_repeats_var,
+        ).grid(row=1, column=0, columnspan=2, sticky="w")
+
+        # DUT queue: scanning a serial number (ending in Enter) starts the
+        # selected mode for that DUT, in a folder named by the serial number
+        queue_frame = ttk.Frame(self.radio_panel)
+        queue_frame.pack(side="right", anchor="ne", padx=20)
+
+        self.queue_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            queue_frame,
+            text="DUT queue",
+            variable=self.queue_var,
+            command=self.toggle_queue,
+        ).grid(row=0, column=0, columnspan=2, sticky="w")
+
+        ttk.Label(queue_frame, text="Serial:").grid(row=1, column=0, sticky="w")
+        self.serial_entry = ttk.Entry(queue_frame, width=14)
+        self.serial_entry.grid(row=1, column=1, sticky="w", padx=5)
+        self.serial_entry.bind("<Return>", self.queue_next_dut)
+
         self.mode_container = ttk.Frame(self.frame3)
         self.mode_container.pack(fill="x", expand=True, pady=5)
 
         self.single_frame = ttk.Frame(self.mode_container, padding=10)
         self.all_state_frame = ttk.Frame(self.mode_container, padding=10)
         self.upload_frame = ttk.Frame(self.mode_container, padding=10)
-        self.csv_label_var = tk.StringVar(value="No file selected")
 
         modes = {
             "Single State Transmission": "single",
@@ -800,7 +1352,7 @@ class MackIITMGUI:
             frame.pack_forget()
 
         # Show only the config frame
-        self.config_frame.pack(fill="x", pady=10)
+        self.show_frame(self.config_frame, fill="x", pady=10)
         self.device_type_var.set("")
         self.connect_button.state(["!disabled"])
 
@@ -931,7 +1483,7 @@ class MackIITMGUI:
 
     def skip_calib(self):
         self.config_frame.pack_forget()
-        self.frame2.pack(fill="x", pady=10)
+        self.show_frame(self.frame2, fill="x", pady=10)
         # self.calib_frame.pack()
 
     def update_sparams(self, event=None):
@@ -1050,36 +1602,30 @@ class MackIITMGUI:
             params = self.get_selected_sparams()
             print(params)
 
-            self.vna.write_command(
-                f"SENS:FREQ:START {start_freq * 10**9}"
-            )  # TODO: uncomment
-            self.vna.write_command(f"SENS:FREQ:STOP {end_freq * 10**9}")
-            self.vna.write_command(f"SENS:SWE:POIN {sweep_points}")
-            self.vna.write_command(f"SENS:AVER:COUN {avg}")
-
+            traces = []
             for para in params.keys():
                 name = para.upper()
                 parameter = para.split("-")[0].split("_")[0].upper()
                 print(name, parameter)
 
                 if params[para] == "db":
-                    self.vna.create_trace(
-                        name=f"{name} dB",
-                        parameter=parameter,
-                        unit="db",
-                    )
+                    traces.append((f"{name} dB", parameter, "db"))
                 elif params[para] == "deg":
-                    self.vna.create_trace(
-                        name=f"{name} deg",
-                        parameter=parameter,
-                        unit="deg",
-                    )
+                    traces.append((f"{name} deg", parameter, "deg"))
+
+            # Sweep settings and all traces go out as one batch
+            errors = self.vna.configure(start_freq, end_freq, sweep_points, avg, traces)
+            for error in errors:
+                self.log(f"[ERROR] VNA: {error}", "error")
 
             self.config_frame.pack_forget()
-            self.frame2.pack(fill="x", pady=10)
+            self.show_frame(self.frame2, fill="x", pady=10)
             # self.calib_frame.pack()
 
-            self.log("VNA values set", "success")
+            if errors:
+                self.log("[WARN] VNA values set with errors", "warning")
+            else:
+                self.log("VNA values set", "success")
 
         except ValueError:
             self.log("[ERROR] Enter Valid Inputs", "error")
@@ -1098,6 +1644,39 @@ class MackIITMGUI:
             self.log("[ERROR] Invalid delay value", "error")
             self.delay_entry.delete(0, tk.END)
 
+    def update_settle(self, event=None):
+        """Update adaptive settle tolerance and maximum wait from the entries"""
+        try:
+            tolerance = float(self.settle_tolerance_entry.get())
+            max_wait = float(self.settle_max_wait_entry.get())
+        except ValueError:
+            # Keep previous values while the user is still typing
+            return
+
+        if tolerance <= 0 or max_wait < 0:
+            self.log("[WARNING] Settle values must be positive", "warning")
+            return
+
+        self.settle_tolerance = tolerance
+        self.settle_max_wait = max_wait
+
+    def settle_after_trigger(self, state):
+        """Waits for the DUT to settle after a state has been triggered"""
+        mode = self.settle_mode_var.get()
+        if mode != "Fixed" and self.settle_phase is None:
+            # The trace formats do not change during a run, so they are read once
+            self.settle_phase = self.vna.get_phase_traces()
+        settle_state(
+            self.vna,
+            state,
+            mode,
+            self.delay,
+            self.settle_tolerance,
+            self.settle_max_wait,
+            self.log_threadsafe,
+            self.settle_phase,
+        )
+
     def setup_single_frame(self):
         container = ttk.Frame(self.single_frame)
         container.pack(expand=True)
@@ -1114,6 +1693,9 @@ class MackIITMGUI:
         container.pack(expand=True)
         self.bits_entry = self.add_labeled_entry(container, "Bits for Phase Shifter:")
         self.states_entry = self.add_labeled_entry(container, "Number of States:")
+        self.state_list_entry = self.add_labeled_entry(
+            container, "State list (optional):"
+        )
         ttk.Button(
             container,
             text="Trigger",
@@ -1125,6 +1707,9 @@ class MackIITMGUI:
         ttk.Button(container, text="Cancel", command=self.cancel_test).pack(
             side="left", padx=5
         )
+        ttk.Button(container, text="Resume", command=self.resume_test).pack(
+            side="left", padx=5
+        )
 
     def setup_upload_frame(self):
         container = ttk.Frame(self.upload_frame)
@@ -1143,6 +1728,9 @@ class MackIITMGUI:
         ttk.Button(container, text="Cancel", command=self.cancel_test).pack(
             side="left", padx=5
         )
+        ttk.Button(container, text="Resume", command=self.resume_test).pack(
+            side="left", padx=5
+        )
 
     def add_labeled_entry(self, parent, label_text, row=None, column=None):
         if row is not None and column is not None:
@@ -1179,10 +1767,10 @@ class MackIITMGUI:
             if self.vna.get_vendor_name() == "Keysight":
                 self.vna.write_command("INIT:CONT ON")
                 self.vna.write_command("SENS:AVER ON")
-                self.config_frame.pack(fill="x", pady=10)
+                self.show_frame(self.config_frame, fill="x", pady=10)
             else:
                 # self.config_frame.pack(fill="x", pady=10)  # TODO: comment this
-                self.frame2.pack(fill="x", pady=10)  # TODO: Uncomment this
+                self.show_frame(self.frame2, fill="x", pady=10)  # TODO: Uncomment this
         else:
             self.log_threadsafe("[ERROR] VNA Connection Failed", "error")
 
@@ -1216,13 +1804,14 @@ class MackIITMGUI:
             if self.device_type == "ku_trm":
                 self.role_dropdown.pack(side="left", padx=5)
                 self.module_type_dropdown.pack(side="left", padx=5)
-            self.frame3.pack()
+                self.full_module_check.pack(side="left", padx=5)
+            self.show_frame(self.frame3)
             self.log(
                 f"{'Phase shifter' if self.device_type == 'phase_shifter' else 'KU TRM Module'} measurement configuration successful.",
                 "success",
             )
         else:
-            self.amplifier_test_frame.pack(fill="x", pady=10)
+            self.show_frame(self.amplifier_test_frame, fill="x", pady=10)
             self.log("Amplifier measurement configuration successful.", "success")
 
     def configure_measurement(self):
@@ -1237,17 +1826,160 @@ class MackIITMGUI:
                 freq_range[0] <= start_freq < stop_freq <= freq_range[-1]
                 or freq_range[0] <= start_freq == stop_freq <= freq_range[-1]
             ):
+                try:
+                    self.extra_bands = self.parse_extra_bands(
+                        freq_range, (start_freq, stop_freq)
+                    )
+                except ValueError as e:
+                    self.log(f"[ERROR] {e}", "error")
+                    return
+
+                extra_channels = []
+                if self.all_channels_var.get():
+                    try:
+                        channels = self.vna.get_channels()
+                        extra_channels = [c for c in channels if c != 1]
+                        self.check_channel_bands(
+                            extra_channels,
+                            [(start_freq, stop_freq)] + self.extra_bands,
+                        )
+                    except Exception as e:
+                        self.log(f"[ERROR] Could not use VNA channels: {e}", "error")
+                        return
+                    self.log(
+                        f"[INFO] Measuring channels {', '.join(map(str, [1] + extra_channels))}"
+                    )
+                self.extra_channels = extra_channels
+
+                try:
+                    check_mask_options(self.mask_file_path, self.extra_channels)
+                except ValueError as e:
+                    self.log(f"[ERROR] {e}", "error")
+                    return
+
+                try:
+                    screening = self.get_screening()
+                except ValueError as e:
+                    self.log(f"[ERROR] {e}", "error")
+                    return
+                if screening:
+                    try:
+                        check_screening_options(
+                            self.extra_bands,
+                            self.extra_channels,
+                            self.store_on_vna_var.get(),
+                            self.mask_file_path,
+                        )
+                    except ValueError as e:
+                        self.log(f"[ERROR] {e}", "error")
+                        return
+                    self.log(
+                        "[INFO] Screening mode: only marker values and limit flags are saved"
+                    )
+                self.screening = screening
+
+                self.store_on_vna = self.store_on_vna_var.get()
+                self.abort_on_fail = self.abort_on_fail_var.get()
+                self.isolated_acquisition = self.isolated_acquisition_var.get()
                 self.start_freq = start_freq
                 self.stop_freq = stop_freq
                 self.config_button.state(["disabled"])
+                if self.extra_bands:
+                    self.log(
+                        f"[INFO] {len(self.extra_bands)} extra bands will be saved from the same sweeps"
+                    )
 
-                self.calib_frame.pack()
+                self.show_frame(self.calib_frame)
 
             else:
                 self.log("[ERROR] Frequency range not within sweep range", "error")
         except ValueError:
             self.log("[ERROR] Invalid input. Please enter valid numbers.", "error")
 
+    def select_mask(self):
+        """Selects the limit mask states are checked against, or clears it"""
+        file_path = filedialog.askopenfilename(filetypes=[("Limit mask", "*.npz")])
+        self.mask_file_path = file_path or ""
+        self.mask_label.config(
+            text=os.path.basename(file_path) if file_path else "No limit mask"
+        )
+        # The mask is checked against the other options when configuring
+        self.hide_frame3_on_change()
+
+    def get_screening(self):
+        """
+        Reads the screening inputs.
+
+        Returns:
+            dict or None: Screening setup, None if no screening is entered
+
+        Raises:
+            ValueError: If an input is invalid.
+        """
+        markers = self.screen_markers_entry.get().strip()
+        search = self.screen_search_var.get()
+        limits = self.screen_limits_entry.get()
+        if not markers and search == "None" and not limits.strip():
+            return None
+
+        return parse_screening(
+            [x for x in markers.split(",") if x.strip()],
+            None if search == "None" else search,
+            parse_limit_spec(limits),
+        )
+
+    def parse_extra_bands(self, freq_range, main_band):
+        """
+        Reads the extra bands entry, written as "start-stop" pairs in GHz
+        separated by commas.
+
+        Args:
+            freq_range (list[float]): Frequency axis of the sweep in GHz.
+            main_band (tuple): (start, stop) of the main band in GHz.
+
+        Returns:
+            list[tuple]: (start, stop) of every extra band, empty if none
+
+        Raises:
+            ValueError: If a band is malformed, outside the sweep range or
+                repeats another band.
+        """
+        spec = self.extra_bands_entry.get().strip()
+        if not spec:
+            return []
+
+        bands = []
+        for item in spec.split(","):
+            try:
+                start, stop = (float(x) for x in item.split("-"))
+            except ValueError:
+                raise ValueError(f"Band '{item.strip()}' is not start-stop")
+            bands.append((start, stop))
+
+        check_bands([tuple(main_band)] + bands, freq_range[0], freq_range[-1])
+        return bands
+
+    def check_channel_bands(self, channels, bands):
+        """
+        Checks that every band is covered by the frequency axis of every
+        channel.
+
+        Args:
+            channels (list[int]): Channels measured besides channel 1.
+            bands (list[tuple]): (start, stop) of every band in GHz.
+
+        Raises:
+            ValueError: If a channel does not cover a band.
+        """
+        for channel in channels:
+            freq_range, _ = self.vna.get_trace_info(channel=channel)
+            for start, stop in bands:
+                if not freq_range[0] <= start <= stop <= freq_range[-1]:
+                    raise ValueError(
+                        f"Channel {channel} sweeps {freq_range[0]}-{freq_range[-1]} GHz, "
+                        f"which does not cover {start}-{stop} GHz"
+                    )
+
     def show_selected_mode(self):
         for frame in [self.single_frame, self.all_state_frame, self.upload_frame]:
             frame.pack_forget()
@@ -1267,28 +1999,27 @@ class MackIITMGUI:
         # Reset mode selection
         self.mode_var.set("")
 
-        # Hide all mode-specific frames
-        for frame in [
-            self.single_frame,
-            self.all_state_frame,
-            self.upload_frame,
-            self.device_select_frame,
-            self.calib_frame,
-        ]:
+        for frame in [self.device_select_frame, self.calib_frame]:
             frame.pack_forget()
 
-        # Clear entries in all modes
-        for entry in [
-            self.n_entry,
-            self.state_entry,
-            self.bits_entry,
-            self.states_entry,
-            self.n_bits_entry,
-        ]:
-            try:
-                entry.delete(0, tk.END)
-            except Exception:
-                pass  # Entry might not exist yet
+        if self.is_built(self.frame3):
+            # Hide all mode-specific frames
+            for frame in [self.single_frame, self.all_state_frame, self.upload_frame]:
+                frame.pack_forget()
+
+            # Clear entries in all modes
+            for entry in [
+                self.n_entry,
+                self.state_entry,
+                self.bits_entry,
+                self.states_entry,
+                self.state_list_entry,
+                self.n_bits_entry,
+            ]:
+                try:
+                    entry.delete(0, tk.END)
+                except Exception:
+                    pass  # Entry might not exist yet
 
         self.csv_label_var.set("No file selected")
         self.config_button.state(["!disabled"])
@@ -1305,315 +2036,426 @@ class MackIITMGUI:
             self.log("CSV Upload cancelled.", "warning")
 
     # New method to start tests in a separate thread
-    def start_test_thread(self, mode):
+    def start_test_thread(self, mode, serial=None):
         if self.test_running:
             self.log("[ERROR] A test is already running", "error")
             return
 
         self.test_running = True
-        threading.Thread(target=self.start_test, args=(mode,), daemon=True).start()
+        threading.Thread(
+            target=self.start_test, args=(mode, serial), daemon=True
+        ).start()
+
+    def toggle_queue(self):
+        """
+        Starts or ends a DUT queue. While it runs the VNA's sweep metadata and
+        configuration are cached, so the fixture swap is the only time between
+        DUTs.
+        """
+        if self.queue_var.get():
+            self.vna.hold_sweep_info()
+            self.log(
+                "[INFO] DUT queue: swap the fixture, then scan the serial number to measure each DUT",
+                "info",
+            )
+            self.serial_entry.focus_set()
+        else:
+            self.vna.hold_sweep_info(False)
+            self.log("[INFO] DUT queue ended", "info")
+
+    def queue_next_dut(self, event=None):
+        """Starts the selected mode for the DUT whose serial number was entered"""
+        if not self.queue_var.get():
+            return
+
+        serial = self.serial_entry.get().strip()
+        modes = {"single": "single_state", "all": "all_states", "csv": "csv"}
+        if not serial:
+            self.log("[ERROR] Scan or enter the DUT serial number", "error")
+            return
+        if self.mode_var.get() not in modes:
+            self.log("[ERROR] Select a test mode for the DUT queue", "error")
+            return
+
+        self.start_test_thread(modes[self.mode_var.get()], serial)
+
+    def finish_dut(self, serial, folder_name, success, started, duration):
+        """Records a DUT of the queue and waits for the next serial number"""
+        try:
+            record_queue_result(
+                self.save_path, serial, folder_name, success, started, duration
+            )
+        except OSError as e:
+            self.log_threadsafe(f"[ERROR] Could not write the queue log: {e}", "error")
+
+        self.log_threadsafe(
+            f"DUT {serial} {'done' if success else 'FAILED'} in {duration:.1f} s",
+            "success" if success else "error",
+        )
+
+        def await_next():
+            self.serial_entry.delete(0, tk.END)
+            self.serial_entry.focus_set()
+            self.log("Swap fixture, then scan the next serial number", "info")
+
+        self.root.after(0, await_next)
+
+    def resume_test(self):
+        """Continue an interrupted measurement in its original folder"""
+        if self.test_running:
+            self.log("[ERROR] A test is already running", "error")
+            return
+
+        folder_name = filedialog.askdirectory(
+            title="Select measurement folder to resume",
+            initialdir=getattr(self, "save_path", "."),
+        )
+        if not folder_name:
+            return
+
+        self.test_running = True
+        threading.Thread(
+            target=self._resume_test, args=(folder_name,), daemon=True
+        ).start()
+
+    def _resume_test(self, folder_name):
+        try:
+            self.run_engine("resume", folder_name)
+        finally:
+            self.pause_event.clear()
+            self.cancel_event.clear()
+            self.test_running = False
+            self.vna.reset_indices()
+
+    def create_engine(self, reference_folder=None):
+        """Returns a sweep engine wired to the GUI's log, settle and pause/cancel"""
+        return SweepEngine(
+            self.vna,
+            self.fpga,
+            log=self.log_threadsafe,
+            settle=self.settle_after_trigger,
+            pause_event=self.pause_event,
+            cancel_event=self.cancel_event,
+            on_traces=self.publish_traces,
+            **self.engine_options(reference_folder),
+        )
+
+    def engine_options(self, reference_folder=None):
+        """Returns the sweep engine options chosen on the measurement page"""
+        return {
+            "reference_folder": reference_folder,
+            "bands": self.extra_bands,
+            "channels": self.extra_channels,
+            "storage": self.store_on_vna,
+            "screening": self.screening,
+            "mask": self.mask_file_path or None,
+            "abort_on_fail": self.abort_on_fail,
+        }
+
+    def run_engine(self, method, *args, reference_folder=None):
+        """
+        Runs a sweep engine call in the acquisition process if enabled,
+        otherwise on the calling thread.
+
+        Args:
+            method (str): "run", "run_blocks", "resume" or "capture".
+            *args: Arguments of the engine method.
+            reference_folder (str, optional): Reference-line folder to
+                normalize to.
+
+        Returns:
+            bool: Result of the engine method
+        """
+        if not self.isolated_acquisition:
+            self.settle_phase = None
+            engine = self.create_engine(reference_folder)
+            return getattr(engine, method)(*args)
+
+        process = AcquisitionProcess(
+            self.vna,
+            self.fpga,
+            self.pause_event,
+            self.cancel_event,
+            log=self.log_threadsafe,
+            on_traces=self.publish_traces,
+            settle={
+                "mode": (
+                    self.settle_mode_var.get()
+                    if self.is_built(self.frame3)
+                    else "Fixed"
+                ),
+                "tolerance": self.settle_tolerance,
+                "max_wait": self.settle_max_wait,
+            },
+            delay=self.delay,
+        )
+        return process.run(method, *args, **self.engine_options(reference_folder))
+
+    def get_reference_folder(self):
+        """
+        Returns the newest reference-line folder captured under the current VNA
+        configuration and band that is not older than the allowed age, if
+        normalization is enabled. Otherwise None.
+
+        Raises:
+            ValueError: If there is no valid reference line and the operator
+                did not choose to store raw traces, e.g. because the reference
+                expired after the calibration page.
+        """
+        if not self.is_built(self.calib_frame) or not self.normalize_var.get():
+            return None
+
+        folder_path, age = find_reference(
+            self.vna.get_configuration(),
+            self.start_freq,
+            self.stop_freq,
+            self.get_ref_max_age(),
+        )
+        if folder_path is None:
+            if not self.raw_traces_confirmed:
+                raise ValueError(
+                    "No valid reference line for this configuration. Capture it on "
+                    "the calibration page or turn off normalization."
+                )
+            self.log_threadsafe(
+                "[WARN] No valid reference line for this configuration, storing raw traces only",
+                "warning",
+            )
+            return None
+
+        self.log_threadsafe(
+            f"Using reference line from {age:.1f} h ago: {folder_path}", "info"
+        )
+        return folder_path
+
+    def get_ref_max_age(self):
+        """Returns the allowed reference age in hours from the calibration page"""
+        try:
+            return max(0.0, float(self.ref_max_age_entry.get()))
+        except ValueError:
+            self.log_threadsafe(
+                f"[WARN] Invalid reference age, using {DEFAULT_MAX_AGE_HOURS} hours",
+                "warning",
+            )
+            return DEFAULT_MAX_AGE_HOURS
 
     def log_threadsafe(self, message, tag="info"):
         """Thread-safe logging function"""
         self.root.after(0, lambda: self.log(message, tag))
 
-    def start_test(self, mode):
+    def start_test(self, mode, serial=None):
+        """
+        Runs the test of a mode. A DUT of the queue, given by its serial
+        number, is measured into a folder named by it and recorded in the
+        queue log.
+        """
+        success = None
         try:
-            folder_name = f"{self.save_path}/{datetime.datetime.now().strftime('measurement_%Y-%m-%d_%H-%M-%S')}"
+            try:
+                reference_folder = self.get_reference_folder()
+            except ValueError as e:
+                self.log_threadsafe(f"[ERROR] {e}", "error")
+                return
+
+            if serial:
+                folder_name = serial_folder(self.save_path, serial)
+                self.log_threadsafe(f"DUT {serial}", "info")
+            else:
+                folder_name = f"{self.save_path}/{datetime.datetime.now().strftime('measurement_%Y-%m-%d_%H-%M-%S')}"
             os.makedirs(folder_name, exist_ok=True, mode=0o777)
+            started = datetime.datetime.now()
+            t0 = time.perf_counter()
             print(self.role_var.get())
             print(self.module_type_var.get())
 
-            if mode == "csv":
-                try:
-                    if self.file_path:
-                        self.log_threadsafe("Reading CSV file...")
-                        with open(self.file_path, "r") as f:
-                            csv_data = csv.reader(f)
-                            states = []
-                            for i in list(csv_data)[0]:
-                                try:
-                                    states.append(int(i))
-                                except Exception:
-                                    pass
-
-                        if not states:
-                            self.log_threadsafe(
-                                "[ERROR] No valid states found in CSV", "error"
-                            )
-                            self.test_running = False
-                            return
-                        bits = int(self.n_bits_entry.get())
-
-                        if self.device_type_var.get() == "phase_shifter":
-                            if max(states) > 2**bits:
-                                self.log_threadsafe(
-                                    "[ERROR] CSV has a state greater than the number of states",
-                                    "error",
-                                )
-                                return
-
-                        if self.device_type_var.get() == "ku_trm":
-                            # if max(states) > 2**bits:
-                            low, high = self.trigger_states[
-                                (self.role_var.get(), self.module_type_var.get())
-                            ]
-                            if (max(states) > high) and (min(states) < low):
-                                self.log_threadsafe(
-                                    "[ERROR] CSV has a state greater than the number of states",
-                                    "error",
-                                )
-                                return
-
-                        for state in states:
-                            if self.cancel_event.is_set():
-                                self.log_threadsafe(
-                                    "[CANCELLED] Test was cancelled.", "warning"
-                                )
-                                return
-
-                            while self.pause_event.is_set():
-                                time.sleep(0.1)
-                            if self.cancel_event.is_set():
-                                self.log_threadsafe(
-                                    "[CANCELLED] Test was cancelled.", "warning"
-                                )
-                                return
-
-                            if not self.fpga.trigger_state(state):
-                                self.log_threadsafe(
-                                    "[ERROR] FPGA communication failed. Please make sure FPGA is connected and all applications using the port are closed",
-                                    "error",
-                                )
-                                return
-
-                            self.log_threadsafe(
-                                f"[TRIGGER] Triggered state {state}", "success"
-                            )
-
-                            while self.pause_event.is_set():
-                                time.sleep(0.1)
-                            if self.cancel_event.is_set():
-                                self.log_threadsafe(
-                                    "[CANCELLED] Test was cancelled.", "warning"
-                                )
-                                return
-
-                            time.sleep(self.delay)
-                            self.vna.save_traces(
-                                state, folder_name, self.start_freq, self.stop_freq
-                            )
-                            self.log_threadsafe(
-                                f"Saved measurement for state {state}", "success"
-                            )
-
-                        self.log_threadsafe("Test completed", "success")
-                        self.vna.reset_indices()
-                    else:
-                        self.log_threadsafe(
-                            "[ERROR] Please upload a CSV file first", "error"
-                        )
-                except ValueError:
-                    self.log_threadsafe("[ERROR] Enter valid integer", "error")
+            if self.device_type_var.get() == "ku_trm" and self.full_module_var.get():
+                blocks = module_blocks(
+                    ORDERINGS[self.ordering_var.get()],
+                    not self.keep_repeats_var.get(),
+                    self.trigger_states,
+                )
+                self.log_threadsafe(
+                    f"Full module: {sum(len(plan) for _, plan in blocks)} states in {len(blocks)} blocks",
+                    "info",
+                )
+                self.log_threadsafe(
+                    "[INFO] The selected mode and its state entries are ignored for a full module",
+                    "warning",
+                )
+                success = self.run_engine(
+                    "run_blocks",
+                    blocks,
+                    folder_name,
+                    self.start_freq,
+                    self.stop_freq,
+                    reference_folder=reference_folder,
+                )
+                return
 
-            elif mode == "single_state":
-                try:
-                    n = int(self.n_entry.get())
-                    state = int(self.state_entry.get())
-
-                    if self.device_type_var.get() == "phase_shifter":
-                        if state >= 2**bits:
-                            self.log_threadsafe(
-                                f"[ERROR] Invalid: State exceeds 2^{n}", "error"
-                            )
-                            return
-
-                    elif self.device_type_var.get() == "ku_trm":
-                        # if max(states) > 2**bits:
-                        low, high = self.trigger_states[
-                            (self.role_var.get(), self.module_type_var.get())
-                        ]
-                        if (state > high) and (state < low):
-                            self.log_threadsafe(
-                                f"[ERROR] Invalid: State needs to be within {low} and {high}",
-                                "error",
-                            )
-                            return
-
-                    if self.cancel_event.is_set():
-                        self.log_threadsafe(
-                            "[CANCELLED] Test was cancelled.", "warning"
-                        )
-                        return
+            states = self.get_test_states(mode)
+            if not states:
+                return
 
-                    while self.pause_event.is_set():
-                        time.sleep(0.1)
-                    if self.cancel_event.is_set():
-                        self.log_threadsafe(
-                            "[CANCELLED] Test was cancelled.", "warning"
-                        )
-                        return
+            plan = StatePlan(
+                states,
+                ordering=ORDERINGS[self.ordering_var.get()],
+                unique=not self.keep_repeats_var.get(),
+            )
+            if plan.needs_reorder:
+                self.log_threadsafe(
+                    f"Acquiring {len(plan)} states in {self.ordering_var.get().lower()} order",
+                    "info",
+                )
 
-                    self.log_threadsafe(f"Transmitting State {state} (n={n})", "info")
+            success = self.run_engine(
+                "run",
+                plan,
+                folder_name,
+                self.start_freq,
+                self.stop_freq,
+                reference_folder=reference_folder,
+            )
 
-                    if not self.fpga.trigger_state(state):
-                        self.log_threadsafe(
-                            "[ERROR] FPGA communication failed. Please make sure FPGA is connected and all applications using the port are closed",
-                            "error",
-                        )
-                        return
+        finally:
+            if serial and success is not None:
+                self.finish_dut(
+                    serial,
+                    folder_name,
+                    bool(success),
+                    started,
+                    time.perf_counter() - t0,
+                )
+            self.pause_event.clear()
+            self.cancel_event.clear()
+            self.test_running = False
+            self.vna.reset_indices()
+
+    def get_test_states(self, mode):
+        """
+        Builds the list of states for a test mode from the GUI inputs.
+
+        Args:
+            mode (str): "csv", "single_state" or "all_states"
+
+        Returns:
+            list[int] or None: States in logical order, None if inputs are invalid
+        """
+        device_type = self.device_type_var.get()
+        if device_type == "ku_trm":
+            low, high = self.trigger_states[
+                (self.role_var.get(), self.module_type_var.get())
+            ]
+
+        if mode == "csv":
+            if not self.file_path:
+                self.log_threadsafe("[ERROR] Please upload a CSV file first", "error")
+                return None
+
+            try:
+                self.log_threadsafe("Reading CSV file...")
+                states = read_states_csv(self.file_path)
+
+                if not states:
+                    self.log_threadsafe("[ERROR] No valid states found in CSV", "error")
+                    return None
+                bits = int(self.n_bits_entry.get())
+            except ValueError:
+                self.log_threadsafe("[ERROR] Enter valid integer", "error")
+                return None
+
+            if device_type == "phase_shifter":
+                low, high = 0, 2**bits - 1
+            if device_type in ["phase_shifter", "ku_trm"]:
+                if StatePlan(states).out_of_range(low, high):
+                    self.log_threadsafe(
+                        "[ERROR] CSV has a state greater than the number of states",
+                        "error",
+                    )
+                    return None
 
-                    self.log_threadsafe(f"[TRIGGER] Triggered state {state}", "success")
+            return states
 
-                    while self.pause_event.is_set():
-                        time.sleep(0.1)
-                    if self.cancel_event.is_set():
+        elif mode == "single_state":
+            try:
+                n = int(self.n_entry.get())
+                state = int(self.state_entry.get())
+            except ValueError:
+                self.log_threadsafe("[ERROR] Enter valid integers.", "error")
+                return None
+
+            if device_type == "phase_shifter":
+                if state >= 2**n:
+                    self.log_threadsafe(
+                        f"[ERROR] Invalid: State exceeds 2^{n}", "error"
+                    )
+                    return None
+
+            elif device_type == "ku_trm":
+                if not low <= state <= high:
+                    self.log_threadsafe(
+                        f"[ERROR] Invalid: State needs to be within {low} and {high}",
+                        "error",
+                    )
+                    return None
+
+            self.log_threadsafe(f"Transmitting State {state} (n={n})", "info")
+            return [state]
+
+        elif mode == "all_states":
+            try:
+                bits = int(self.bits_entry.get())
+                state_list = self.state_list_entry.get().strip()
+
+                if state_list:
+                    states = parse_state_spec(state_list)
+                else:
+                    count = int(self.states_entry.get())
+            except ValueError:
+                self.log_threadsafe("[ERROR] Invalid value added", "error")
+                return None
+
+            if device_type == "phase_shifter":
+                if state_list:
+                    if StatePlan(states).out_of_range(0, 2**bits - 1):
                         self.log_threadsafe(
-                            "[CANCELLED] Test was cancelled.", "warning"
+                            f"[ERROR] Invalid: Max states is {2**bits}", "error"
                         )
-                        return
+                        return None
+                    return states
 
-                    time.sleep(self.delay)
-                    self.vna.save_traces(
-                        state, folder_name, self.start_freq, self.stop_freq
-                    )
+                if count > 2**bits:
                     self.log_threadsafe(
-                        f"Saved measurement for state {state}", "success"
+                        f"[ERROR] Invalid: Max states is {2**bits}", "error"
                     )
-                    self.log_threadsafe("Test completed", "success")
-                    self.vna.reset_indices()
-                except ValueError:
-                    self.log_threadsafe("[ERROR] Enter valid integers.", "error")
+                    return None
 
-            elif mode == "all_states":
-                try:
-                    if self.device_type_var.get() == "phase_shifter":
-                        bits = int(self.bits_entry.get())
-                        states = int(self.states_entry.get())
-                        if states > 2**bits:
-                            self.log_threadsafe(
-                                f"[ERROR] Invalid: Max states is {2**bits}", "error"
-                            )
-                            return
+                self.log_threadsafe(
+                    f"All states mode: {count} states for {bits}-bit", "info"
+                )
+                return list(range(count))
 
+            elif device_type == "ku_trm":
+                if state_list:
+                    if StatePlan(states).out_of_range(low, high):
                         self.log_threadsafe(
-                            f"All states mode: {states} states for {bits}-bit", "info"
+                            f"[ERROR] Invalid: States need to be within {low} and {high}",
+                            "error",
                         )
+                        return None
+                    return states
 
-                        for state in range(states):
-                            if self.cancel_event.is_set():
-                                self.log_threadsafe(
-                                    "[CANCELLED] Test was cancelled.", "warning"
-                                )
-                                return
-
-                            while self.pause_event.is_set():
-                                time.sleep(0.1)
-                            if self.cancel_event.is_set():
-                                self.log_threadsafe(
-                                    "[CANCELLED] Test was cancelled.", "warning"
-                                )
-                                return
-
-                            if not self.fpga.trigger_state(state):
-                                self.log_threadsafe(
-                                    "[ERROR] FPGA communication failed. Please make sure FPGA is connected and all applications using the port are closed",
-                                    "error",
-                                )
-                                return
-
-                            self.log_threadsafe(
-                                f"[TRIGGER] Triggered state {state}", "success"
-                            )
-
-                            while self.pause_event.is_set():
-                                time.sleep(0.1)
-                            if self.cancel_event.is_set():
-                                self.log_threadsafe(
-                                    "[CANCELLED] Test was cancelled.", "warning"
-                                )
-                                return
-
-                            time.sleep(self.delay)
-                            self.vna.save_traces(
-                                state, folder_name, self.start_freq, self.stop_freq
-                            )
-                            self.log_threadsafe(
-                                f"Saved measurement for state {state}", "success"
-                            )
-
-                        self.log_threadsafe("Test completed", "success")
-                        self.vna.reset_indices()
-
-                    elif self.device_type_var.get() == "ku_trm":
-                        bits = int(self.bits_entry.get())
-                        states = int(self.states_entry.get())
-
-                        low, high = self.trigger_states[
-                            (self.role_var.get(), self.module_type_var.get())
-                        ]
-
-                        valid_states_range = high - low
-
-                        if valid_states_range < states:
-                            self.log_threadsafe(
-                                "[ERROR] States entered higher than valid range.",
-                                "error",
-                            )
-                            return
-
-                        for state in range(low, low + states + 1):
-                            if self.cancel_event.is_set():
-                                self.log_threadsafe(
-                                    "[CANCELLED] Test was cancelled.", "warning"
-                                )
-                                return
-
-                            while self.pause_event.is_set():
-                                time.sleep(0.1)
-                            if self.cancel_event.is_set():
-                                self.log_threadsafe(
-                                    "[CANCELLED] Test was cancelled.", "warning"
-                                )
-                                return
-
-                            if not self.fpga.trigger_state(state):
-                                self.log_threadsafe(
-                                    "[ERROR] FPGA communication failed. Please make sure FPGA is connected and all applications using the port are closed",
-                                    "error",
-                                )
-                                return
-
-                            self.log_threadsafe(
-                                f"[TRIGGER] Triggered state {state}", "success"
-                            )
-
-                            while self.pause_event.is_set():
-                                time.sleep(0.1)
-                            if self.cancel_event.is_set():
-                                self.log_threadsafe(
-                                    "[CANCELLED] Test was cancelled.", "warning"
-                                )
-                                return
-
-                            time.sleep(self.delay)
-                            self.vna.save_traces(
-                                state, folder_name, self.start_freq, self.stop_freq
-                            )
-                            self.log_threadsafe(
-                                f"Saved measurement for state {state}", "success"
-                            )
-
-                        self.log_threadsafe("Test completed", "success")
-                        self.vna.reset_indices()
-                except ValueError:
-                    self.log_threadsafe("[ERROR] Invalid value added", "error")
+                valid_states_range = high - low
 
-        finally:
-            self.pause_event.clear()
-            self.cancel_event.clear()
-            self.test_running = False
-            self.vna.reset_indices()
+                if valid_states_range < count:
+                    self.log_threadsafe(
+                        "[ERROR] States entered higher than valid range.",
+                        "error",
+                    )
+                    return None
+
+                return list(range(low, low + count + 1))
+
+        return None
 
     def pause_test(self):
         if self.test_running:
@@ -1635,4 +2477,5 @@ class MackIITMGUI:
 if __name__ == "__main__":
     root = tk.Tk()
     app = MackIITMGUI(root)
+    root.after_idle(app.report_startup_time)
     root.mainloop()
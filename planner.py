@@ -0,0 +1,241 @@
+import csv
+
+# Orderings offered to the operator, mapped to the names used by order_states
+ORDERINGS = {
+    "As entered": "as_entered",
+    "Numeric": "numeric",
+    "Gray code": "gray",
+    "Minimal bit flips": "min_flips",
+}
+
+# State blocks of the KU TRM module, (role, module) -> (first, last)
+KU_TRM_STATES = {
+    ("Transmitter", "Phase Shifter"): (0, 127),
+    ("Transmitter", "Attenuator"): (128, 383),
+    ("Receiver", "Phase Shifter"): (384, 511),
+    ("Receiver", "Attenuator"): (512, 767),
+}
+
+
+class StatePlan:
+    """
+    An ordered set of states to trigger during a sweep.
+
+    The logical order is the order in which results are reported, the
+    acquisition order is the order in which states are triggered on the FPGA.
+
+    Attributes:
+        logical_order (list[int]) : States in the requested order.
+        acquisition_order (list[int]) : States in the order they are triggered.
+        ordering (str) : Name of the ordering used for acquisition.
+    """
+
+    def __init__(self, states, ordering="as_entered", unique=True):
+        """
+        Initialization Function
+
+        Args:
+            states (list[int]): Requested states, in logical order.
+            ordering (str, optional): One of "as_entered", "numeric", "gray" or
+                "min_flips". Defaults to "as_entered".
+            unique (bool, optional): Drop repeated states, keeping the first
+                occurrence. Defaults to True.
+        """
+        states = list(states)
+        if unique:
+            states = dedupe(states)
+
+        self.logical_order = states
+        self.ordering = ordering
+        self.acquisition_order = order_states(states, ordering)
+
+    def __len__(self):
+        return len(self.logical_order)
+
+    @property
+    def needs_reorder(self):
+        """True if results have to be rearranged into the logical order"""
+        return self.acquisition_order != self.logical_order
+
+    def out_of_range(self, low, high):
+        """
+        Returns the states that lie outside low..high (inclusive).
+
+        Args:
+            low (int): Lowest valid state.
+            high (int): Highest valid state.
+
+        Returns:
+            list[int]: Invalid states
+        """
+        return [state for state in self.logical_order if not low <= state <= high]
+
+
+def parse_state_spec(spec):
+    """
+    Parses a state specification into a list of states.
+
+    Items are separated by commas or whitespace. "a-b" is an inclusive range,
+    "a-b:s" a range with step s and "item*n" repeats an item n times,
+    e.g. "0-127, 200, 5*3" or "(0-3)*2".
+
+    Args:
+        spec (str): State specification.
+
+    Returns:
+        list[int]: States in the given order
+
+    Raises:
+        ValueError: If an item cannot be parsed.
+    """
+    states = []
+    for item in spec.replace(",", " ").split():
+        repeat = 1
+        if "*" in item:
+            item, count = item.rsplit("*", 1)
+            repeat = int(count)
+        item = item.strip("()")
+
+        if "-" in item.lstrip("-"):
+            bounds, _, step = item.partition(":")
+            first, last = bounds.split("-", 1)
+            first, last = int(first), int(last)
+            step = int(step) if step else 1
+            if first > last:
+                step = -step
+            values = list(range(first, last + (1 if step > 0 else -1), step))
+        else:
+            values = [int(item)]
+
+        states.extend(values * repeat)
+
+    return states
+
+
+def read_states_csv(file_path):
+    """
+    Reads states from every row of a CSV file. Cells may hold single states or
+    state specifications; cells that cannot be parsed (e.g. headers) are skipped.
+
+    Args:
+        file_path (str): Path of the CSV file.
+
+    Returns:
+        list[int]: States in file order
+    """
+    states = []
+    with open(file_path, "r", newline="") as f:
+        for row in csv.reader(f):
+            for cell in row:
+                try:
+                    states.extend(parse_state_spec(cell))
+                except ValueError:
+                    pass
+    return states
+
+
+def dedupe(states):
+    """
+    Removes repeated states while keeping the first occurrence of each.
+
+    Args:
+        states (list[int]): States.
+
+    Returns:
+        list[int]: Unique states in their original order
+    """
+    seen = set()
+    unique = []
+    for state in states:
+        if state not in seen:
+            seen.add(state)
+            unique.append(state)
+    return unique
+
+
+def gray_rank(state):
+    """
+    Returns the position of a value in the binary reflected Gray code sequence.
+
+    Args:
+        state (int): Non-negative state.
+
+    Returns:
+        int: Index n such that n ^ (n >> 1) == state
+    """
+    rank = 0
+    while state:
+        rank ^= state
+        state >>= 1
+    return rank
+
+
+def bit_flips(a, b):
+    """Number of control bits that change between two states"""
+    return bin(a ^ b).count("1")
+
+
+def order_states(states, ordering="as_entered"):
+    """
+    Returns the states in the order they should be triggered.
+
+    "gray" walks the states along the Gray code sequence so that a contiguous
+    block changes one control bit per step. "min_flips" starts at the first
+    state and always moves to the remaining state with the fewest changed bits,
+    which also works for sparse lists.
+
+    Args:
+        states (list[int]): States in logical order.
+        ordering (str, optional): One of "as_entered", "numeric", "gray" or
+            "min_flips". Defaults to "as_entered".
+
+    Returns:
+        list[int]: States in acquisition order
+
+    Raises:
+        ValueError: If the ordering is unknown.
+    """
+    if ordering == "as_entered":
+        return list(states)
+    if ordering == "numeric":
+        return sorted(states)
+    if ordering == "gray":
+        return sorted(states, key=gray_rank)
+    if ordering == "min_flips":
+        remaining = sorted(states)
+        if not remaining:
+            return []
+        current = states[0]
+        remaining.remove(current)
+        ordered = [current]
+        while remaining:
+            current = min(remaining, key=lambda s: bit_flips(current, s))
+            remaining.remove(current)
+            ordered.append(current)
+        return ordered
+
+    raise ValueError(f"Unknown state ordering: {ordering}")
+
+
+def module_blocks(ordering="as_entered", unique=True, blocks=KU_TRM_STATES):
+    """
+    Returns the plans of a full KU TRM characterization: every state of every
+    block, each block in the given ordering.
+
+    Args:
+        ordering (str, optional): Ordering as in order_states. Defaults to
+            "as_entered".
+        unique (bool, optional): Drop repeated states. Defaults to True.
+        blocks (dict, optional): (role, module) -> (first, last) state.
+            Defaults to KU_TRM_STATES.
+
+    Returns:
+        list[tuple]: (block name, StatePlan) in the order of blocks
+    """
+    return [
+        (
+            f"{role}_{module}".replace(" ", "_"),
+            StatePlan(range(low, high + 1), ordering=ordering, unique=unique),
+        )
+        for (role, module), (low, high) in blocks.items()
+    ]
@@ -0,0 +1,113 @@
+import os
+import json
+import hashlib
+import datetime
+
+# Index of saved reference lines, shared by all sessions
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".mack_iitm")
+REFERENCE_INDEX_FILE = os.path.join(CACHE_DIR, "references.json")
+
+# Default time a reference line stays valid, in hours
+DEFAULT_MAX_AGE_HOURS = 8.0
+
+
+def configuration_key(config, start_freq, stop_freq):
+    """
+    Hashes the VNA configuration and the saved band into a short key. Two
+    references with the same key were captured under the same settings.
+
+    Args:
+        config (dict): VNA configuration from BaseVNA.get_configuration.
+        start_freq (float): Start frequency of the saved band in GHz.
+        stop_freq (float): Stop frequency of the saved band in GHz.
+
+    Returns:
+        str: Hex digest
+    """
+    payload = json.dumps(
+        {"config": config, "band": [float(start_freq), float(stop_freq)]},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def load_index():
+    """
+    Returns the reference index (key to list of entries), or an empty dict.
+    """
+    try:
+        with open(REFERENCE_INDEX_FILE, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_index(index):
+    """Writes the reference index atomically"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{REFERENCE_INDEX_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=4)
+    os.replace(tmp_path, REFERENCE_INDEX_FILE)
+
+
+def register_reference(folder_name, config, start_freq, stop_freq):
+    """
+    Records a freshly captured reference line. An older entry for the same
+    folder is replaced, since its files have been overwritten.
+
+    Args:
+        folder_name (str): Folder the reference traces were saved to.
+        config (dict): VNA configuration at capture time.
+        start_freq (float): Start frequency in GHz.
+        stop_freq (float): Stop frequency in GHz.
+    """
+    folder_name = os.path.abspath(folder_name)
+    index = load_index()
+    for key in list(index):
+        index[key] = [e for e in index[key] if e["folder"] != folder_name]
+        if not index[key]:
+            del index[key]
+
+    index.setdefault(configuration_key(config, start_freq, stop_freq), []).append(
+        {
+            "folder": folder_name,
+            "created": datetime.datetime.now().isoformat(),
+            "config": config,
+            "start_freq": start_freq,
+            "stop_freq": stop_freq,
+        }
+    )
+
+    try:
+        save_index(index)
+    except OSError as e:
+        print(f"[WARN] Could not update reference index: {e}")
+
+
+def find_reference(config, start_freq, stop_freq, max_age_hours=DEFAULT_MAX_AGE_HOURS):
+    """
+    Looks up the newest reference line captured under the same configuration
+    that is still on disk and not older than max_age_hours.
+
+    Args:
+        config (dict): Current VNA configuration.
+        start_freq (float): Start frequency in GHz.
+        stop_freq (float): Stop frequency in GHz.
+        max_age_hours (float, optional): Maximum age in hours.
+
+    Returns:
+        tuple: (folder or None, age in hours or None)
+    """
+    entries = load_index().get(configuration_key(config, start_freq, stop_freq), [])
+    now = datetime.datetime.now()
+
+    for entry in sorted(entries, key=lambda e: e["created"], reverse=True):
+        age = now - datetime.datetime.fromisoformat(entry["created"])
+        age_hours = age.total_seconds() / 3600
+        if age_hours > max_age_hours:
+            break
+        if os.path.isdir(entry["folder"]):
+            return entry["folder"], age_hours
+
+    return None, None
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+
+# Subfolder of a measurement that holds the reference-normalized traces
+NORMALIZED_FOLDER = "normalized"
+
+
+class Reference:
+    """
+    Reference-line traces saved by save_traces_amp, loaded once and aligned to
+    the frequency axis of a sweep so every fetched state can be normalized in
+    a single vectorized step.
+
+    Phase traces are normalized by subtracting the reference phase and
+    wrapping to [-180, 180), linear magnitude traces ("MLIN") by dividing and
+    all other formats (dB and friends) by subtracting.
+
+    Attributes:
+        folder_name (str) : Folder the reference traces were read from.
+        values (np.ndarray) : Reference, shape (traces, frequencies).
+        divide (np.ndarray) : Per trace, True if normalized by division.
+        phase (np.ndarray) : Per trace, True if the trace holds wrapped phase.
+    """
+
+    def __init__(self, folder_name, trace_names, frequencies, formats):
+        """
+        Initialization Function
+
+        Args:
+            folder_name (str): Folder with one reference CSV per trace
+                (frequency, value), named like the measurement's trace files.
+            trace_names (list[str]): Trace file names of the sweep.
+            frequencies (list[float]): Frequency axis of the sweep in GHz.
+            formats (list[str]): Display format of every trace.
+
+        Raises:
+            ValueError: If a reference trace is missing or does not cover the
+                frequency axis.
+        """
+        self.folder_name = folder_name
+        frequencies = np.asarray(frequencies, dtype=float)
+        formats = [fmt.upper() for fmt in formats]
+        self.phase = np.array([fmt.startswith("PHAS") for fmt in formats])
+        self.divide = np.array([fmt == "MLIN" for fmt in formats])
+
+        self.values = np.empty((len(trace_names), len(frequencies)))
+        for i, name in enumerate(trace_names):
+            file_path = os.path.join(folder_name, name)
+            if not os.path.exists(file_path):
+                raise ValueError(f"No reference trace {name} in {folder_name}")
+
+            ref = np.loadtxt(file_path, delimiter=",", ndmin=2)
+            ref_freqs, ref_values = ref[:, 0], ref[:, 1]
+            # Allow for the rounding of the frequency axis in the file
+            tolerance = 1e-9 * max(1.0, abs(frequencies).max())
+            if (
+                ref_freqs[0] > frequencies[0] + tolerance
+                or ref_freqs[-1] < frequencies[-1] - tolerance
+            ):
+                raise ValueError(
+                    f"Reference trace {name} covers {ref_freqs[0]}-{ref_freqs[-1]} GHz, "
+                    f"sweep needs {frequencies[0]}-{frequencies[-1]} GHz"
+                )
+
+            if self.phase[i]:
+                # Interpolate the continuous phase, not the wrapped one
+                ref_values = np.rad2deg(np.unwrap(np.deg2rad(ref_values)))
+            self.values[i] = np.interp(frequencies, ref_freqs, ref_values)
+
+    def apply(self, values):
+        """
+        Normalizes the traces of one state.
+
+        Args:
+            values (np.ndarray): Measured traces, shape (traces, frequencies).
+
+        Returns:
+            np.ndarray: Normalized traces, same shape
+        """
+        values = np.asarray(values, dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            normalized = np.where(
+                self.divide[:, None], values / self.values, values - self.values
+            )
+        normalized[self.phase] = (normalized[self.phase] + 180) % 360 - 180
+        return normalized
@@ -0,0 +1,756 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import datetime
+import argparse
+
+from acquisition import (
+    SweepEngine,
+    check_bands,
+    check_mask_options,
+    print_log,
+    settle_state,
+)
+from planner import (
+    KU_TRM_STATES,
+    ORDERINGS,
+    StatePlan,
+    module_blocks,
+    parse_state_spec,
+    read_states_csv,
+)
+from refcache import DEFAULT_MAX_AGE_HOURS, find_reference
+from screening import check_screening_options, parse_screening
+
+# Values used for keys a test plan leaves out
+PLAN_DEFAULTS = {
+    "configure_vna": True,
+    "port1": "1",
+    "port2": "2",
+    "sparameters": [],
+    "device_type": "phase_shifter",
+    "role": "Transmitter",
+    "module": "Phase Shifter",
+    "full_module": False,
+    "bits": None,
+    "states": None,
+    "states_csv": None,
+    "ordering": "As entered",
+    "keep_repeats": False,
+    "delay": 0.0,
+    "settle": {"mode": "Fixed", "tolerance": 0.05, "max_wait": 2.0},
+    "normalize": True,
+    "reference_max_age_hours": DEFAULT_MAX_AGE_HOURS,
+    "amplifier": {"captures": 1, "interval": 0.0, "save_raw": False},
+    "fpga": {},
+    "bands": [],
+    "channels": [],
+    "store_on_vna": False,
+    "screening": None,
+    "mask": None,
+}
+
+# Record of the DUTs of queue runs, kept in the output folder
+QUEUE_LOG_FILE = "queue_log.csv"
+
+DEVICE_TYPES = ["phase_shifter", "ku_trm", "amplifier"]
+SETTLE_MODES = ["Fixed", "Adaptive (trace)", "Adaptive (marker)"]
+
+
+def load_test_plan(file_path):
+    """
+    Reads a test plan. The file is a superset of the configuration saved from
+    the GUI (start_frequency, stop_frequency, average, sweep_points, port1,
+    port2, sparameters), extended with:
+
+        band: [start, stop] in GHz to save, defaults to the sweep range
+        bands: further [start, stop] bands in GHz cut from the same sweeps
+        channels: further VNA channels measured with every state, each
+                  {"channel": n, "start_frequency": ..., "stop_frequency": ...,
+                   "sweep_points": ..., "average": ..., "power": dBm,
+                   "sparameters": [...]}; only "channel" is needed when
+                  configure_vna is off
+        store_on_vna: keep every state in a file on the VNA and transfer all
+                      files once the sweep is done
+        screening: {"markers": [GHz, ...], "search": "min" | "max",
+                    "limits": [[lower, upper] or null per trace]} to read only
+                    marker values and limit flags per state
+        mask: {"file": limit mask .npz, "abort_on_fail": true} to check every
+              state against a golden-unit mask
+        device_type: "phase_shifter", "ku_trm" or "amplifier"
+        role, module: KU TRM block, e.g. "Receiver" and "Attenuator"
+        full_module: measure every state of all four KU TRM blocks instead
+        bits: phase shifter resolution
+        states: state spec ("0-127", "0-127:2,5*3") or list; defaults to all
+        states_csv: CSV with the states, instead of states
+        ordering: one of the GUI orderings, e.g. "Gray code"
+        keep_repeats: measure repeated states again
+        delay: fixed wait after each trigger in seconds
+        settle: {"mode": "Fixed" | "Adaptive (trace)" | "Adaptive (marker)",
+                 "tolerance": ..., "max_wait": ...}
+        normalize, reference_max_age_hours: reference-line normalization
+        amplifier: {"captures": ..., "interval": ..., "save_raw": ...}
+        fpga: keyword arguments for FPGA, e.g. {"baudrate": 9600}
+        output: folder the measurement folder is created in
+        configure_vna: set to false to keep the instrument's setup
+
+    Null or empty values count as unset. sweep_points and average are left as
+    set on the instrument when unset.
+
+    Args:
+        file_path (str): Test plan JSON file.
+
+    Returns:
+        dict: Test plan with defaults filled in
+
+    Raises:
+        ValueError: If a required key is missing or a value is invalid.
+    """
+    with open(file_path, "r") as f:
+        plan = json.load(f)
+
+    # Null and empty values, as in configurations saved from the GUI, are unset
+    for key, value in PLAN_DEFAULTS.items():
+        if isinstance(value, dict):
+            section = plan.get(key) or {}
+            if not isinstance(section, dict):
+                raise ValueError(f"{key} must be an object")
+            plan[key] = {
+                **value,
+                **{k: v for k, v in section.items() if not is_unset(v)},
+            }
+        elif is_unset(plan.get(key)):
+            plan[key] = value
+
+    for key in ["start_frequency", "stop_frequency", "output"]:
+        if is_unset(plan.get(key)):
+            raise ValueError(f"Test plan has no '{key}'")
+    plan["start_frequency"] = plan_number(plan, "start_frequency")
+    plan["stop_frequency"] = plan_number(plan, "stop_frequency")
+    if not all(isinstance(channel, dict) for channel in plan["channels"]):
+        raise ValueError("every entry of channels must be an object")
+    for section in [plan] + plan["channels"]:
+        for key in ["sweep_points", "average"]:
+            section[key] = plan_number(section, key)
+    if is_unset(plan.get("band")):
+        plan["band"] = [plan["start_frequency"], plan["stop_frequency"]]
+    plan["band"] = [float(x) for x in plan["band"]]
+
+    if plan["device_type"] not in DEVICE_TYPES:
+        raise ValueError(f"device_type must be one of {', '.join(DEVICE_TYPES)}")
+    if plan["ordering"] not in ORDERINGS:
+        raise ValueError(f"ordering must be one of {', '.join(ORDERINGS)}")
+    if plan["settle"]["mode"] not in SETTLE_MODES:
+        raise ValueError(f"settle mode must be one of {', '.join(SETTLE_MODES)}")
+    if plan["device_type"] == "ku_trm" and (
+        (plan["role"], plan["module"]) not in KU_TRM_STATES
+    ):
+        raise ValueError(f"Unknown KU TRM block {plan['role']}/{plan['module']}")
+
+    keys = sparameter_keys(plan_ports(plan))
+    for sparam in plan["sparameters"] + [
+        sparam
+        for channel in plan["channels"]
+        for sparam in channel.get("sparameters", [])
+    ]:
+        if sparam not in keys:
+            raise ValueError(f"Unknown S-parameter {sparam} for the plan's ports")
+
+    plan["bands"] = [[float(x) for x in band] for band in plan["bands"]]
+    check_bands(
+        [plan["band"]] + plan["bands"], plan["start_frequency"], plan["stop_frequency"]
+    )
+
+    if plan["screening"] is not None:
+        screening = plan["screening"]
+        if not isinstance(screening, dict):
+            raise ValueError("screening must be an object with markers, search, limits")
+        check_screening_options(
+            plan["bands"], plan["channels"], plan["store_on_vna"], plan["mask"]
+        )
+        plan["screening"] = parse_screening(
+            screening.get("markers"), screening.get("search"), screening.get("limits")
+        )
+
+    if plan["mask"] is not None:
+        plan["mask"] = {"abort_on_fail": False, **plan["mask"]}
+        if not os.path.exists(plan["mask"].get("file", "")):
+            raise ValueError("mask file not found")
+        check_mask_options(plan["mask"]["file"], plan["channels"])
+
+    for channel in plan["channels"]:
+        if "channel" not in channel or int(channel["channel"]) < 2:
+            raise ValueError("every entry of channels needs a channel number above 1")
+        if plan["configure_vna"]:
+            for key in ["start_frequency", "stop_frequency"]:
+                if is_unset(channel.get(key)):
+                    raise ValueError(f"channel {channel['channel']} has no '{key}'")
+                channel[key] = plan_number(channel, key)
+            for start, stop in [plan["band"]] + plan["bands"]:
+                if not (
+                    float(channel["start_frequency"])
+                    <= start
+                    <= stop
+                    <= float(channel["stop_frequency"])
+                ):
+                    raise ValueError(
+                        f"band {start}-{stop} must lie within the sweep range of channel {channel['channel']}"
+                    )
+
+    return plan
+
+
+def is_unset(value):
+    """Returns True for values a test plan leaves unset: null or empty"""
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def plan_number(section, key):
+    """
+    Reads a number of a test plan section.
+
+    Args:
+        section (dict): Test plan or one of its sections.
+        key (str): Key of the number.
+
+    Returns:
+        float or None: The number, None if it is unset
+
+    Raises:
+        ValueError: If the value is not a number.
+    """
+    value = section.get(key)
+    if is_unset(value):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be a number, not {value!r}")
+
+
+def plan_states(plan):
+    """
+    Returns the states of a test plan in logical order, checked against the
+    device's valid range.
+
+    Args:
+        plan (dict): Test plan from load_test_plan.
+
+    Returns:
+        list[int]: States
+
+    Raises:
+        ValueError: If no states can be derived or a state is out of range.
+    """
+    if plan["device_type"] == "ku_trm":
+        low, high = KU_TRM_STATES[(plan["role"], plan["module"])]
+    elif plan["bits"] is not None:
+        low, high = 0, 2 ** int(plan["bits"]) - 1
+    else:
+        low, high = None, None
+
+    if plan["states_csv"]:
+        states = read_states_csv(plan["states_csv"])
+    elif isinstance(plan["states"], str):
+        states = parse_state_spec(plan["states"])
+    elif plan["states"] is not None:
+        states = [int(state) for state in plan["states"]]
+    elif low is not None:
+        states = list(range(low, high + 1))
+    else:
+        raise ValueError("Test plan needs states, states_csv or bits")
+
+    if not states:
+        raise ValueError("Test plan has no states")
+    if low is not None and StatePlan(states).out_of_range(low, high):
+        raise ValueError(f"States need to be within {low} and {high}")
+    return states
+
+
+def plan_ports(plan):
+    """Returns the VNA ports of a test plan, as entered in the GUI"""
+    return [str(plan[key]).strip() for key in ["port1", "port2"]]
+
+
+def sparameter_keys(ports):
+    """
+    Returns the S-parameter selections of the given ports in the order of the
+    GUI's checkboxes, which the trace numbers follow.
+
+    Args:
+        ports (list[str]): VNA ports.
+
+    Returns:
+        list[str]: Selections such as "s21_db" and "s21_deg"
+    """
+    return [f"s{i}{j}_{unit}" for i in ports for j in ports for unit in ["db", "deg"]]
+
+
+def trace_specs(sparameters, ports, channel=1):
+    """
+    Converts S-parameter selections as saved by the GUI (e.g. "s21_db",
+    "s21_deg") to the (name, parameter, unit) tuples used by configure. Traces
+    are numbered by checkbox like the GUI does, so a headless run creates the
+    same trace names as the GUI.
+
+    Args:
+        sparameters (list[str]): Selected S-parameters.
+        ports (list[str]): VNA ports the selections refer to.
+        channel (int, optional): VNA channel; traces of channels other than 1
+            are prefixed with it to keep the names unique. Defaults to 1.
+
+    Returns:
+        list[tuple]: Traces to create
+    """
+    prefix = "" if channel == 1 else f"CH{channel}_"
+    keys = sparameter_keys(ports)
+    traces = []
+    for sparam in sorted(sparameters, key=keys.index):
+        name = f"{prefix}{sparam}-Trc_{keys.index(sparam) + 1}".upper()
+        parameter, unit = sparam.split("_")
+        label = "dB" if unit == "db" else "deg"
+        traces.append((f"{name} {label}", parameter.upper(), unit))
+    return traces
+
+
+def make_settle(vna, settle, delay, log):
+    """
+    Returns the settle callback of a test plan: sleep for the delay, then, in
+    an adaptive mode, poll the VNA until successive readings agree.
+
+    Args:
+        vna (BaseVNA): Connected VNA.
+        settle (dict): Settle section of the test plan.
+        delay (float): Fixed delay in seconds.
+        log (callable): Progress callback.
+
+    Returns:
+        callable: Called with the state after it has been triggered
+    """
+    # The trace formats do not change during a run, so they are read once
+    phase = []
+
+    def settle_after_trigger(state):
+        if settle["mode"] != "Fixed" and not phase:
+            phase.append(vna.get_phase_traces())
+        settle_state(
+            vna,
+            state,
+            settle["mode"],
+            delay,
+            float(settle["tolerance"]),
+            float(settle["max_wait"]),
+            log,
+            phase[0] if phase else None,
+        )
+
+    return settle_after_trigger
+
+
+def connect_instruments(plan, log=print_log, vna=None, fpga=None):
+    """
+    Connects the VNA and, except for amplifier plans, the FPGA.
+
+    Args:
+        plan (dict): Test plan from load_test_plan.
+        log (callable, optional): Progress callback. Defaults to print.
+        vna (BaseVNA, optional): Connected VNA. Defaults to discovering one.
+        fpga (FPGA, optional): Connected FPGA. Defaults to discovering one.
+
+    Returns:
+        tuple: (vna, fpga), (None, None) if an instrument was not found
+    """
+    if vna is None:
+        from vna import VNA
+
+        vna = VNA()
+        if not vna.initialize_vna():
+            log("[ERROR] VNA not found", "error")
+            return None, None
+
+    if fpga is None and plan["device_type"] != "amplifier":
+        from fpga import FPGA
+
+        fpga = FPGA(**plan["fpga"])
+        if not fpga.initialize_fpga():
+            log("[ERROR] FPGA not found", "error")
+            return None, None
+
+    return vna, fpga
+
+
+def configure_instrument(plan, vna, log=print_log):
+    """
+    Applies the plan's sweep settings and traces, and those of every further
+    channel, unless configure_vna is off.
+
+    Args:
+        plan (dict): Test plan from load_test_plan.
+        vna (BaseVNA): Connected VNA.
+        log (callable, optional): Progress callback. Defaults to print.
+
+    Returns:
+        bool: False if the VNA reported errors
+    """
+    if not plan["configure_vna"]:
+        return True
+
+    def setting(section, key):
+        # Unset keys keep the instrument's setting instead of a made-up default
+        value = section.get(key)
+        return plan.get(key) if value is None else value
+
+    ports = plan_ports(plan)
+    errors = vna.configure(
+        plan["start_frequency"],
+        plan["stop_frequency"],
+        setting(plan, "sweep_points"),
+        setting(plan, "average"),
+        trace_specs(plan["sparameters"], ports),
+    )
+    for channel in plan["channels"]:
+        number = int(channel["channel"])
+        errors += vna.configure(
+            float(channel["start_frequency"]),
+            float(channel["stop_frequency"]),
+            setting(channel, "sweep_points"),
+            setting(channel, "average"),
+            trace_specs(channel.get("sparameters", []), ports, number),
+            channel=number,
+            power=None if channel.get("power") is None else float(channel["power"]),
+        )
+    for error in errors:
+        log(f"[ERROR] VNA: {error}", "error")
+    return not errors
+
+
+def measure(plan, vna, fpga, folder_name, log=print_log):
+    """
+    Measures the plan's states (or captures the amplifier traces) into a folder
+    with already connected and configured instruments.
+
+    Args:
+        plan (dict): Test plan from load_test_plan.
+        vna (BaseVNA): Connected VNA.
+        fpga (FPGA or None): Connected FPGA.
+        folder_name (str): Measurement folder.
+        log (callable, optional): Progress callback. Defaults to print.
+
+    Returns:
+        bool: True if the measurement completed
+    """
+    start_freq, stop_freq = plan["band"]
+    os.makedirs(folder_name, exist_ok=True, mode=0o777)
+    log(f"Saving to {folder_name}", "info")
+
+    if plan["device_type"] == "amplifier":
+        amplifier = plan["amplifier"]
+        captures = int(amplifier["captures"])
+        if captures <= 1:
+            vna.save_traces_amp(folder_name, start_freq, stop_freq)
+            log("Amplifier data successfully saved", "success")
+            return True
+
+        engine = SweepEngine(vna, fpga, log=log)
+        return engine.capture(
+            folder_name,
+            start_freq,
+            stop_freq,
+            captures,
+            float(amplifier["interval"]),
+            bool(amplifier["save_raw"]),
+        )
+
+    reference_folder = None
+    if plan["normalize"]:
+        reference_folder, age = find_reference(
+            vna.cached_configuration(),
+            start_freq,
+            stop_freq,
+            float(plan["reference_max_age_hours"]),
+        )
+        if reference_folder is None:
+            log(
+                "[WARN] No valid reference line for this configuration, storing raw traces only",
+                "warning",
+            )
+        else:
+            log(f"Using reference line from {age:.1f} h ago", "info")
+
+    engine = SweepEngine(
+        vna,
+        fpga,
+        log=log,
+        settle=make_settle(vna, plan["settle"], float(plan["delay"]), log),
+        reference_folder=reference_folder,
+        bands=plan["bands"],
+        channels=[int(channel["channel"]) for channel in plan["channels"]],
+        storage=bool(plan["store_on_vna"]),
+        screening=plan["screening"],
+        mask=plan["mask"]["file"] if plan["mask"] else None,
+        abort_on_fail=bool(plan["mask"] and plan["mask"]["abort_on_fail"]),
+    )
+    try:
+        if plan["device_type"] == "ku_trm" and plan["full_module"]:
+            return engine.run_blocks(
+                module_blocks(ORDERINGS[plan["ordering"]], not plan["keep_repeats"]),
+                folder_name,
+                start_freq,
+                stop_freq,
+            )
+
+        state_plan = StatePlan(
+            plan_states(plan),
+            ordering=ORDERINGS[plan["ordering"]],
+            unique=not plan["keep_repeats"],
+        )
+        return engine.run(state_plan, folder_name, start_freq, stop_freq)
+    finally:
+        vna.reset_indices()
+
+
+def run_test_plan(plan, log=print_log, vna=None, fpga=None):
+    """
+    Runs a test plan end to end: connects the instruments, configures the
+    VNA, and measures into a new timestamped measurement folder.
+
+    Args:
+        plan (dict): Test plan from load_test_plan.
+        log (callable, optional): Progress callback. Defaults to print.
+        vna (BaseVNA, optional): Connected VNA. Defaults to discovering one.
+        fpga (FPGA, optional): Connected FPGA. Defaults to discovering one.
+
+    Returns:
+        tuple: (bool success, str measurement folder or None)
+    """
+    vna, fpga = connect_instruments(plan, log, vna, fpga)
+    if vna is None or not configure_instrument(plan, vna, log):
+        return False, None
+
+    folder_name = os.path.join(
+        plan["output"],
+        datetime.datetime.now().strftime("measurement_%Y-%m-%d_%H-%M-%S"),
+    )
+    return measure(plan, vna, fpga, folder_name, log), folder_name
+
+
+def serial_folder(output, serial):
+    """
+    Returns the measurement folder of a DUT, named by its serial number.
+    Characters that are not valid in file names are replaced and a retest of
+    the same DUT gets a numbered suffix instead of overwriting.
+
+    Args:
+        output (str): Folder the DUT folders are created in.
+        serial (str): DUT serial number.
+
+    Returns:
+        str: Folder path that does not exist yet
+    """
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", serial.strip()) or "unnamed"
+    folder_name = os.path.join(output, name)
+    retest = 2
+    while os.path.exists(folder_name):
+        folder_name = os.path.join(output, f"{name}_{retest}")
+        retest += 1
+    return folder_name
+
+
+def record_queue_result(output, serial, folder_name, success, started, duration):
+    """
+    Appends a DUT of a queue run to queue_log.csv in the output folder,
+    creating the file with its header first.
+
+    Args:
+        output (str): Folder the DUT folders are created in.
+        serial (str): DUT serial number.
+        folder_name (str): Measurement folder of the DUT.
+        success (bool): Whether the measurement completed.
+        started (datetime.datetime): Start of the measurement.
+        duration (float): Measurement time in seconds.
+    """
+    queue_log = os.path.join(output, QUEUE_LOG_FILE)
+    new = not os.path.exists(queue_log)
+    with open(queue_log, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new:
+            writer.writerow(["serial", "folder", "result", "started", "duration_s"])
+        writer.writerow(
+            [
+                serial,
+                folder_name,
+                "PASS" if success else "FAIL",
+                started.isoformat(),
+                f"{duration:.1f}",
+            ]
+        )
+
+
+def run_queue(plan, serials, log=print_log, vna=None, fpga=None):
+    """
+    Runs the same plan for a series of DUTs back to back. The instruments are
+    connected and the VNA configured once, and the sweep metadata and
+    configuration are cached for the whole queue, so the only time between
+    DUTs is the fixture swap. Every DUT is recorded in queue_log.csv in the
+    output folder.
+
+    Args:
+        plan (dict): Test plan from load_test_plan.
+        serials (iterable[str]): Serial numbers, e.g. read as they are scanned.
+            The next one should only be produced once the fixture is swapped.
+        log (callable, optional): Progress callback. Defaults to print.
+        vna (BaseVNA, optional): Connected VNA. Defaults to discovering one.
+        fpga (FPGA, optional): Connected FPGA. Defaults to discovering one.
+
+    Returns:
+        list[tuple]: (serial, folder, success) of every DUT
+    """
+    vna, fpga = connect_instruments(plan, log, vna, fpga)
+    if vna is None or not configure_instrument(plan, vna, log):
+        return []
+
+    os.makedirs(plan["output"], exist_ok=True, mode=0o777)
+
+    results = []
+    vna.hold_sweep_info()
+    try:
+        for serial in serials:
+            folder_name = serial_folder(plan["output"], serial)
+            log(f"DUT {serial}", "info")
+
+            started = datetime.datetime.now()
+            t0 = time.perf_counter()
+            try:
+                success = measure(plan, vna, fpga, folder_name, log)
+            except Exception as e:
+                log(f"[ERROR] DUT {serial} failed: {e}", "error")
+                success = False
+            duration = time.perf_counter() - t0
+
+            record_queue_result(
+                plan["output"], serial, folder_name, success, started, duration
+            )
+            results.append((serial, folder_name, success))
+            log(
+                f"DUT {serial} {'done' if success else 'FAILED'} in {duration:.1f} s "
+                f"({len(results)} in queue run)",
+                "success" if success else "error",
+            )
+    finally:
+        vna.hold_sweep_info(False)
+
+    return results
+
+
+def prompt_serials(serials=None):
+    """
+    Yields serial numbers for a queue run. Without a list the operator scans
+    or types each serial after swapping the fixture; with a list, Enter is
+    awaited before each DUT. An empty entry or end of input stops the queue.
+
+    Args:
+        serials (list[str], optional): Pre-entered serial numbers.
+    """
+    if serials is None:
+        while True:
+            try:
+                serial = input("Swap fixture, then scan serial (empty to stop): ")
+            except EOFError:
+                return
+            if not serial.strip():
+                return
+            yield serial.strip()
+    else:
+        for serial in serials:
+            try:
+                input(f"Swap fixture to DUT {serial}, then press Enter: ")
+            except EOFError:
+                return
+            yield serial
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a VNA test plan without the GUI.")
+    parser.add_argument("plan", help="Test plan JSON file")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only validate the plan and list the states, do not connect",
+    )
+    parser.add_argument(
+        "--queue",
+        action="store_true",
+        help="Run the plan for one DUT after another, prompting for each serial number",
+    )
+    parser.add_argument(
+        "--serials",
+        metavar="FILE",
+        help="With --queue, read the serial numbers from a file (one per line)",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="FOLDER",
+        help="Resume an interrupted measurement folder instead of starting a new one",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        plan = load_test_plan(args.plan)
+        states = None if plan["device_type"] == "amplifier" else plan_states(plan)
+    except (OSError, ValueError, json.JSONDecodeError) as e:
+        print(f"[ERROR] Invalid test plan: {e}")
+        return 2
+
+    if args.check:
+        if states is not None:
+            print(f"[INFO] {len(states)} states: {states[0]} ... {states[-1]}")
+        print("[INFO] Test plan is valid")
+        return 0
+
+    if args.resume:
+        from fpga import FPGA
+        from vna import VNA
+
+        vna, fpga = VNA(), FPGA(**plan["fpga"])
+        try:
+            found = vna.initialize_vna()
+        except Exception as e:
+            print(f"[ERROR] Could not search for the VNA: {e}")
+            return 1
+        if not found:
+            print("[ERROR] VNA not found")
+            return 1
+        if not fpga.initialize_fpga():
+            print("[ERROR] FPGA not found")
+            return 1
+        engine = SweepEngine(
+            vna,
+            fpga,
+            settle=make_settle(vna, plan["settle"], float(plan["delay"]), print_log),
+        )
+        try:
+            return 0 if engine.resume(args.resume) else 1
+        finally:
+            vna.reset_indices()
+
+    if args.queue:
+        serials = None
+        if args.serials:
+            with open(args.serials, "r") as f:
+                serials = [line.strip() for line in f if line.strip()]
+        results = run_queue(plan, prompt_serials(serials))
+        failed = [serial for serial, _, success in results if not success]
+        print(f"[INFO] {len(results)} DUTs measured, {len(failed)} failed")
+        for serial in failed:
+            print(f"[ERROR] DUT {serial} failed")
+        return 0 if results and not failed else 1
+
+    success, _ = run_test_plan(plan)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import os
+
+# File the screening results of a sweep are written to
+SCREENING_FILE = "screening.csv"
+
+# Marker searches, tracking the trace minimum or maximum
+SEARCHES = ["min", "max"]
+
+# Markers per trace available on all supported VNAs
+MAX_MARKERS = 10
+
+
+def parse_screening(markers, search=None, limits=None):
+    """
+    Checks a screening setup and brings it into the form stored in a
+    checkpoint.
+
+    Args:
+        markers (list[float]): Marker frequencies in GHz.
+        search (str, optional): "min" or "max" adds a marker tracking the
+            trace minimum or maximum (e.g. the worst insertion loss).
+        limits (list, optional): Per trace, None or [lower, upper] in the
+            trace's unit, either bound None. A trace fails when it leaves the
+            bounds anywhere in the saved band.
+
+    Returns:
+        dict: Screening setup
+
+    Raises:
+        ValueError: If the setup is empty or invalid.
+    """
+    markers = [float(freq) for freq in markers or []]
+    if search is not None and search not in SEARCHES:
+        raise ValueError(f"search must be one of {', '.join(SEARCHES)}")
+    if len(markers) + (search is not None) > MAX_MARKERS:
+        raise ValueError(f"At most {MAX_MARKERS} markers per trace")
+
+    parsed = []
+    for limit in limits or []:
+        if not limit:
+            parsed.append(None)
+            continue
+        lower, upper = (None if bound is None else float(bound) for bound in limit)
+        if lower is None and upper is None:
+            parsed.append(None)
+            continue
+        if lower is not None and upper is not None and lower > upper:
+            raise ValueError(f"Lower limit {lower} is above upper limit {upper}")
+        parsed.append([lower, upper])
+
+    if not markers and search is None and not any(parsed):
+        raise ValueError("Screening needs a marker, a search or a limit")
+
+    return {"markers": markers, "search": search, "limits": parsed}
+
+
+def check_screening_options(bands, channels, store_on_vna, mask):
+    """
+    Checks that screening is not combined with an option that works on
+    traces. Screening reads no traces, so none of them could run with it.
+
+    Args:
+        bands (list): Extra bands.
+        channels (list): Channels measured besides channel 1.
+        store_on_vna (bool): Whether traces are stored on the VNA.
+        mask (str or None): Limit mask file.
+
+    Raises:
+        ValueError: If one of them is used.
+    """
+    combined = [
+        name
+        for name, used in [
+            ("extra bands", bands),
+            ("further channels", channels),
+            ("storing traces on the VNA", store_on_vna),
+            ("a limit mask", mask),
+        ]
+        if used
+    ]
+    if combined:
+        raise ValueError(f"Screening cannot be combined with {', '.join(combined)}")
+
+
+def parse_limit_spec(spec):
+    """
+    Parses limits written per trace as "lower:upper", separated by commas and
+    in trace order; a bound or a whole entry may be left empty (e.g.
+    "-3:0,,-10:").
+
+    Args:
+        spec (str): Limit specification.
+
+    Returns:
+        list: Per trace, None or [lower, upper]
+
+    Raises:
+        ValueError: If an entry is malformed.
+    """
+    if not spec.strip():
+        return []
+
+    limits = []
+    for item in spec.split(","):
+        if not item.strip():
+            limits.append(None)
+            continue
+        bounds = item.split(":")
+        if len(bounds) != 2:
+            raise ValueError(f"Invalid limit '{item.strip()}', expected lower:upper")
+        limits.append([float(b) if b.strip() else None for b in bounds])
+    return limits
+
+
+class Screen:
+    """
+    Go/no-go screening on the VNA itself: markers and limit lines are set up
+    once, and every state is then read back as a handful of marker values and
+    limit fail flags in a single query instead of full sweeps. One row per
+    state is written to screening.csv, ending with 1 if the state passed.
+
+    Attributes:
+        vna (BaseVNA) : Connected VNA.
+        columns (list[str]) : Names of the values read back per state.
+        file_path (str) : Screening results file.
+    """
+
+    def __init__(self, vna, config, folder_name, start_freq, stop_freq):
+        """
+        Initialization Function
+
+        Args:
+            vna (BaseVNA): Connected VNA.
+            config (dict): Screening setup from parse_screening.
+            folder_name (str): Measurement folder.
+            start_freq (float): Start frequency of the band in GHz.
+            stop_freq (float): Stop frequency of the band in GHz.
+
+        Raises:
+            ValueError: If the VNA does not support screening.
+        """
+        self.vna = vna
+        program = vna.screen_program(
+            config["markers"],
+            config["search"],
+            config["limits"],
+            (start_freq, stop_freq),
+        )
+        if program is None:
+            raise ValueError(f"{vna.get_vendor_name()} VNA does not support screening")
+        self.setup_commands, self.queries, self.columns = program
+        self.fail_columns = [
+            i for i, name in enumerate(self.columns) if name.endswith("limit fail")
+        ]
+
+        self.file_path = os.path.join(folder_name, SCREENING_FILE)
+        if not os.path.exists(self.file_path):
+            with open(self.file_path, mode="w") as f:
+                f.write(",".join(["state"] + self.columns + ["pass"]) + "\n")
+
+    def setup(self):
+        """
+        Programs the markers and limit lines.
+
+        Returns:
+            list[str]: Errors reported by the instrument, empty on success
+        """
+        return self.vna.run_batch(self.setup_commands)
+
+    def measure(self):
+        """
+        Reads the markers and limit flags of the current state.
+
+        Returns:
+            tuple: (list of values in column order, bool passed)
+
+        Raises:
+            ValueError: If the response does not match the columns.
+        """
+        responses = self.vna.query_batch(self.queries)
+        if len(responses) != len(self.columns):
+            raise ValueError(
+                f"Screening returned {len(responses)} values, expected {len(self.columns)}"
+            )
+
+        # Marker readouts may hold a second (imaginary) value
+        values = [float(response.split(",")[0]) for response in responses]
+        passed = not any(values[i] for i in self.fail_columns)
+        return values, passed
+
+    def save(self, state, values, passed):
+        """
+        Appends the row of one state.
+
+        Args:
+            state (int): Measured state.
+            values (list[float]): Values from measure.
+            passed (bool): Whether the state passed.
+        """
+        with open(self.file_path, mode="a") as f:
+            f.write(f"{state}," + ",".join(map(str, values)) + f",{int(passed)}\n")
+
+    def summary(self):
+        """
+        Counts the states written so far.
+
+        Returns:
+            tuple: (states screened, states failed)
+        """
+        with open(self.file_path, "r") as f:
+            next(f)
+            results = [line.rstrip("\n").rsplit(",", 1)[-1] for line in f]
+        return len(results), results.count("0")
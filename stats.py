@@ -0,0 +1,125 @@
+import numpy as np
+
+
+class StreamingStats:
+    """
+    Per-point statistics over repeated captures of a trace, updated one capture
+    at a time so memory does not depend on the number of captures.
+
+    Linear traces use Welford's update for mean and variance. Phase traces
+    (circular=True, in degrees) keep the running mean of the unit phasors and
+    report the circular mean and circular standard deviation; their min/max
+    are taken on the deviation from the first capture so wrapping at +/-180
+    does not produce spurious extremes.
+
+    Attributes:
+        circular (bool) : Treat values as phase in degrees.
+        count (int) : Number of captures seen.
+    """
+
+    def __init__(self, circular=False):
+        """
+        Initialization Function
+
+        Args:
+            circular (bool, optional): Treat values as phase in degrees.
+                Defaults to False.
+        """
+        self.circular = circular
+        self.count = 0
+        self._mean = None
+        self._m2 = None
+        self._cos = None
+        self._sin = None
+        self._reference = None
+        self._min = None
+        self._max = None
+
+    def update(self, values):
+        """
+        Adds one capture.
+
+        Args:
+            values (array-like): Trace values, one per frequency point.
+        """
+        x = np.asarray(values, dtype=float)
+        self.count += 1
+
+        if self.circular:
+            radians = np.deg2rad(x)
+            if self._reference is None:
+                self._reference = x.copy()
+                self._cos = np.cos(radians)
+                self._sin = np.sin(radians)
+                self._min = np.zeros_like(x)
+                self._max = np.zeros_like(x)
+            else:
+                self._cos += (np.cos(radians) - self._cos) / self.count
+                self._sin += (np.sin(radians) - self._sin) / self.count
+                deviation = wrap_phase(x - self._reference)
+                np.minimum(self._min, deviation, out=self._min)
+                np.maximum(self._max, deviation, out=self._max)
+            return
+
+        if self._mean is None:
+            self._mean = x.copy()
+            self._m2 = np.zeros_like(x)
+            self._min = x.copy()
+            self._max = x.copy()
+            return
+
+        delta = x - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (x - self._mean)
+        np.minimum(self._min, x, out=self._min)
+        np.maximum(self._max, x, out=self._max)
+
+    @property
+    def mean(self):
+        if self.circular:
+            return np.rad2deg(np.arctan2(self._sin, self._cos))
+        return self._mean
+
+    @property
+    def std(self):
+        if self.circular:
+            resultant = np.clip(np.hypot(self._cos, self._sin), 1e-12, 1.0)
+            return np.rad2deg(np.sqrt(-2 * np.log(resultant)))
+        if self.count < 2:
+            return np.zeros_like(self._mean)
+        return np.sqrt(self._m2 / (self.count - 1))
+
+    @property
+    def min(self):
+        if self.circular:
+            return wrap_phase(self._reference + self._min)
+        return self._min
+
+    @property
+    def max(self):
+        if self.circular:
+            return wrap_phase(self._reference + self._max)
+        return self._max
+
+    def save(self, file_path, frequencies):
+        """
+        Writes the summary as CSV with one row per frequency point.
+
+        Args:
+            file_path (str): Output file.
+            frequencies (list[float]): Frequency axis in GHz.
+        """
+        table = np.column_stack([frequencies, self.mean, self.std, self.min, self.max])
+        np.savetxt(
+            file_path,
+            table,
+            delimiter=",",
+            fmt="%.10g",
+            header=f"frequency,mean,std,min,max (captures={self.count})",
+            comments="",
+        )
+
+
+def wrap_phase(degrees):
+    """Wraps phase values into [-180, 180)"""
+    return (np.asarray(degrees) + 180) % 360 - 180
@@ -0,0 +1,88 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+# Bump when the layout of the sidecar files changes
+CACHE_VERSION = 1
+
+
+def cache_paths(file_path):
+    """
+    Returns the paths of the binary sidecar files of a trace CSV.
+
+    Args:
+        file_path (str): Trace CSV file.
+
+    Returns:
+        tuple: (values .npy path, metadata .json path)
+    """
+    return f"{file_path}.npy", f"{file_path}.json"
+
+
+def source_signature(file_path):
+    """Modification time and size used to decide if a sidecar is still valid"""
+    info = os.stat(file_path)
+    return {"mtime_ns": info.st_mtime_ns, "size": info.st_size}
+
+
+def load_trace_csv(file_path):
+    """
+    Loads a wide trace CSV (frequencies as columns, states as rows) as a
+    DataFrame, the same way pd.read_csv(file_path, index_col=0) would.
+
+    On the first read the values are stored next to the CSV as a .npy file with
+    a small .json holding the labels and the CSV's mtime/size. Later reads
+    memory-map the .npy instead of parsing the text, until the CSV changes.
+
+    Args:
+        file_path (str): Trace CSV file.
+
+    Returns:
+        pd.DataFrame: Trace values indexed by state
+    """
+    values_path, meta_path = cache_paths(file_path)
+    signature = source_signature(file_path)
+
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        if meta["version"] == CACHE_VERSION and meta["source"] == signature:
+            values = np.load(values_path, mmap_mode="r")
+            return pd.DataFrame(
+                values,
+                index=pd.Index(meta["index"], name=meta["index_name"]),
+                columns=meta["columns"],
+                copy=False,
+            )
+    except (OSError, ValueError, KeyError):
+        pass
+
+    data = pd.read_csv(file_path, index_col=0)
+
+    try:
+        values = data.to_numpy(dtype=float)
+    except (TypeError, ValueError):
+        # Not a purely numeric table, nothing to cache
+        return data
+
+    try:
+        with open(f"{values_path}.tmp", "wb") as f:
+            np.save(f, values)
+        os.replace(f"{values_path}.tmp", values_path)
+
+        meta = {
+            "version": CACHE_VERSION,
+            "source": signature,
+            "index": data.index.tolist(),
+            "index_name": data.index.name,
+            "columns": [str(c) for c in data.columns],
+        }
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+    except OSError as e:
+        print(f"[WARN] Could not write trace cache for {file_path}: {e}")
+
+    return data
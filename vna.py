@@ -1,6 +1,42 @@
-import pyvisa as visa
 import os
+import json
+import time
+import bisect
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+# Location where the last successfully connected resource is remembered
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".mack_iitm")
+VNA_CACHE_FILE = os.path.join(CACHE_DIR, "vna.json")
+
+# Timeout (ms) used while probing resources with *IDN?
+PROBE_TIMEOUT_MS = 2000
+PROBE_WORKERS = 8
+
+# Upper bound on SYST:ERR? reads after a command batch
+MAX_ERROR_DRAIN = 50
+
+
+def band_slice(frequencies, start_freq, end_freq, include_next=False):
+    """
+    Finds the index range of a frequency band with a binary search.
+
+    Args:
+        frequencies (list[float]): Ascending frequency axis in GHz.
+        start_freq (float): Start frequency in GHz.
+        end_freq (float): End frequency in GHz.
+        include_next (bool, optional): Also include the first point above
+            end_freq when end_freq is not on the axis. Defaults to False.
+
+    Returns:
+        slice: Indices of the band on the frequency axis
+    """
+    start = bisect.bisect_left(frequencies, start_freq)
+    if include_next:
+        stop = min(bisect.bisect_left(frequencies, end_freq) + 1, len(frequencies))
+    else:
+        stop = bisect.bisect_right(frequencies, end_freq)
+    return slice(start, stop)
 
 
 class BaseVNA(ABC):
@@ -19,26 +55,21 @@ class BaseVNA(ABC):
         self.stop_index = None
         self.sep = ","
         self.rm = None
+        self.resource_name = None
+        self.sweep_cache = None
 
     def initialize_vna(self):
         """
         Attempts to initialize and connect to a VNA using PyVISA.
+        Discovery is delegated to VNAFactory, restricted to this implementation.
         Sets the connected attribute to True on success.
         """
-        self.rm = visa.ResourceManager()
-        for r in self.rm.list_resources():
-            try:
-                instru = self.rm.open_resource(r)
-                res = instru.query("*IDN?").split(",")
-
-                # Check if this is a VNA we can handle
-                if self.is_compatible_vna(res):
-                    self.instru = instru
-                    self.connected = True
-                    break
-            except Exception:
-                # print(f"Error connecting to {r}: {e}")
-                continue
+        vna = VNAFactory.create_vna(vna_classes=(type(self),))
+        if vna is not None:
+            self.rm = vna.rm
+            self.instru = vna.instru
+            self.resource_name = vna.resource_name
+            self.connected = True
 
         if self.connected:
             print(f"Connected successfully to {self.get_vendor_name()} VNA")
@@ -47,6 +78,29 @@ class BaseVNA(ABC):
             # print("Couldn't find compatible VNA device")
             return False
 
+    def attach(self, rm, instru, resource_name, idn_response):
+        """
+        Binds an opened VISA resource to this object if the instrument is compatible.
+
+        Args:
+            rm (ResourceManager): Resource manager that opened the resource.
+            instru (Resource): Opened VISA resource.
+            resource_name (str): VISA resource string.
+            idn_response (list): Split response from *IDN? query
+
+        Returns:
+            bool: True if the instrument was accepted, False otherwise
+        """
+        self.rm = rm
+        self.instru = instru
+        if not self.is_compatible_vna(idn_response):
+            self.instru = None
+            return False
+
+        self.resource_name = resource_name
+        self.connected = True
+        return True
+
     @abstractmethod
     def is_compatible_vna(self, idn_response):
         """
@@ -84,13 +138,14 @@ class BaseVNA(ABC):
         pass
 
     @abstractmethod
-    def get_trace_info(self, start_freq=None, stop_freq=None):
+    def get_trace_info(self, start_freq=None, stop_freq=None, channel=1):
         """
         Retrieves frequency points and trace metadata from the VNA.
 
         Args:
             start_freq (float, optional): Custom start frequency (in GHz).
             stop_freq (float, optional): Custom stop frequency (in GHz).
+            channel (int, optional): VNA channel. Defaults to 1.
 
         Returns:
             tuple: (List[float] frequency points in GHz, List[str] trace names)
@@ -98,15 +153,77 @@ class BaseVNA(ABC):
         pass
 
     @abstractmethod
-    def get_trace_data(self):
+    def get_trace_data(self, channel=1):
         """
-        Retrieves all trace data from the VNA.
+        Retrieves all trace data of a channel from the VNA.
+
+        Args:
+            channel (int, optional): VNA channel. Defaults to 1.
 
         Returns:
             list: Trace values
         """
         pass
 
+    @abstractmethod
+    def get_trace_formats(self, channel=1):
+        """
+        Retrieves the display format of every trace, in the same order as the
+        traces returned by get_trace_info.
+
+        Args:
+            channel (int, optional): VNA channel. Defaults to 1.
+
+        Returns:
+            list[str]: Format names, e.g. "MLOG" or "PHAS"
+        """
+        pass
+
+    def get_channels(self):
+        """
+        Returns the numbers of the channels set up on the instrument. Vendors
+        that support several channels override this.
+
+        Returns:
+            list[int]: Channel numbers, in ascending order
+        """
+        return [1]
+
+    @staticmethod
+    def trace_file_name(start_freq, stop_freq, trace, channel=1):
+        """
+        Returns the file name a trace is saved under. Traces of channel 1 keep
+        the plain name; other channels are marked so their files stay apart.
+
+        Args:
+            start_freq (float): Start frequency of the saved band in GHz.
+            stop_freq (float): Stop frequency of the saved band in GHz.
+            trace (str): Trace name on the instrument.
+            channel (int, optional): VNA channel. Defaults to 1.
+
+        Returns:
+            str: File name
+        """
+        if channel == 1:
+            return f"{start_freq}-{stop_freq}_{trace}.csv"
+        return f"{start_freq}-{stop_freq}_Ch{channel}_{trace}.csv"
+
+    def get_phase_traces(self):
+        """
+        Returns a flag per trace telling whether it holds wrapped phase.
+        """
+        return [fmt.upper().startswith("PHAS") for fmt in self.get_trace_formats()]
+
+    @abstractmethod
+    def get_marker_values(self):
+        """
+        Retrieves the readout of marker 1, enabling the marker if needed.
+
+        Returns:
+            list: Marker values
+        """
+        pass
+
     def reset_indices(self):
         """
         Resets the values of start and stop indices
@@ -114,16 +231,174 @@ class BaseVNA(ABC):
         self.start_index = None
         self.stop_index = None
 
+    def release(self):
+        """
+        Closes the VISA session, e.g. while another process talks to the VNA.
+        USB-TMC and GPIB instruments accept only one session at a time.
+        """
+        self.instru.close()
+
+    def reopen(self):
+        """Opens the session again after release"""
+        self.instru = self.rm.open_resource(self.resource_name)
+
+    def get_configuration(self):
+        """
+        Reads back the instrument settings that determine the layout of saved
+        traces, so that two sessions can be checked for compatibility.
+
+        Returns:
+            dict: Setting name to the instrument's response (None if unavailable)
+        """
+        queries = {
+            "start_frequency": "SENS1:FREQ:STAR?",
+            "stop_frequency": "SENS1:FREQ:STOP?",
+            "sweep_points": "SENS1:SWE:POIN?",
+            "average": "SENS1:AVER:COUN?",
+            "traces": self.TRACE_CATALOG_QUERY,
+            "parameters": self.PARAMETER_CATALOG_QUERY,
+        }
+
+        config = {"vendor": self.get_vendor_name()}
+        for key, command in queries.items():
+            try:
+                config[key] = self.instru.query(command).strip()
+            except Exception:
+                config[key] = None
+        return config
+
+    def hold_sweep_info(self, hold=True):
+        """
+        While held, the frequency axis, trace names and configuration are read
+        from the instrument once and then reused, for back-to-back runs with an
+        unchanged setup. Releasing drops the cached values.
+
+        Args:
+            hold (bool, optional): Start (True) or stop (False) caching.
+        """
+        self.sweep_cache = {} if hold else None
+
+    def cached_trace_info(self, start_freq=None, stop_freq=None, channel=1):
+        """get_trace_info, served from the sweep cache while it is held"""
+        if self.sweep_cache is None:
+            return self.get_trace_info(start_freq, stop_freq, channel)
+
+        key = ("trace_info", start_freq, stop_freq, channel)
+        if key not in self.sweep_cache:
+            self.sweep_cache[key] = self.get_trace_info(start_freq, stop_freq, channel)
+        return self.sweep_cache[key]
+
+    def cached_configuration(self):
+        """get_configuration, served from the sweep cache while it is held"""
+        if self.sweep_cache is None:
+            return self.get_configuration()
+
+        if "configuration" not in self.sweep_cache:
+            self.sweep_cache["configuration"] = self.get_configuration()
+        return self.sweep_cache["configuration"]
+
+    def cached_channels(self):
+        """get_channels, served from the sweep cache while it is held"""
+        if self.sweep_cache is None:
+            return self.get_channels()
+
+        if "channels" not in self.sweep_cache:
+            self.sweep_cache["channels"] = self.get_channels()
+        return self.sweep_cache["channels"]
+
+    def get_sweep_time(self, channel=1):
+        """
+        Returns the duration of a single sweep of a channel in seconds, or 0 if
+        unknown.
+        """
+        try:
+            return float(self.instru.query(f"SENS{channel}:SWE:TIME?"))
+        except Exception:
+            return 0.0
+
+    @staticmethod
+    def max_change(previous, current, phase=()):
+        """
+        Returns the largest point-wise difference between two readings, which
+        hold the traces one after another. Differences of phase traces are
+        folded modulo 360 so phase wrapping is not seen as a change.
+
+        Args:
+            previous (list): Earlier reading.
+            current (list): Later reading.
+            phase (list[bool], optional): Per trace, whether it holds wrapped
+                phase, as from get_phase_traces. Defaults to no folding.
+
+        Returns:
+            float: Largest absolute difference
+        """
+        if len(previous) != len(current):
+            return float("inf")
+
+        if phase and len(current) % len(phase) == 0:
+            steps = len(current) // len(phase)
+            wrapped = [phase[i // steps] for i in range(len(current))]
+        else:
+            # Values that cannot be assigned to a trace are folded only if
+            # every trace is phase
+            wrapped = [bool(phase) and all(phase)] * len(current)
+
+        largest = 0.0
+        for a, b, fold in zip(previous, current, wrapped):
+            diff = abs(a - b)
+            if fold:
+                diff %= 360
+                diff = min(diff, 360 - diff)
+            if diff > largest:
+                largest = diff
+        return largest
+
+    def wait_for_settle(self, tolerance, max_wait, source="trace", phase=None):
+        """
+        Takes successive readings after a state change until the change between
+        two readings falls below the tolerance, or max_wait seconds have passed.
+        Readings are spaced by at least one sweep so each one sees new data.
+
+        Args:
+            tolerance (float): Allowed change between readings (dB or degrees).
+            max_wait (float): Maximum time to wait in seconds.
+            source (str, optional): "trace" compares full sweeps, "marker" only
+                the marker readout. Defaults to "trace".
+            phase (list[bool], optional): Phase flag per trace from
+                get_phase_traces, read once per run by the caller. Defaults to
+                reading them here.
+
+        Returns:
+            tuple: (bool settled, float seconds waited)
+        """
+        read = self.get_marker_values if source == "marker" else self.get_trace_data
+        interval = self.get_sweep_time()
+        if phase is None:
+            phase = self.get_phase_traces()
+
+        start = time.perf_counter()
+        previous = read()
+        while time.perf_counter() - start < max_wait:
+            time.sleep(interval)
+            current = read()
+            if self.max_change(previous, current, phase) <= tolerance:
+                return True, time.perf_counter() - start
+            previous = current
+
+        return False, time.perf_counter() - start
+
     def save_traces_amp(self, folder_name, start_freq, end_freq):
         """
         Saves trace data for amplifiers in a given frequency range to individual CSV files.
+        Existing files are overwritten. The band is located with a binary search
+        and each trace is written with a single call.
 
         Args:
             folder_name (str): The directory to store CSV files.
             start_freq (float): Start frequency in GHz.
             end_freq (float): End frequency in GHz.
         """
-        in_gigs, trace_names = self.get_trace_info(start_freq, end_freq)
+        in_gigs, trace_names = self.cached_trace_info(start_freq, end_freq)
         steps = len(in_gigs)
 
         trace_values = self.get_trace_data()
@@ -131,24 +406,13 @@ class BaseVNA(ABC):
         # Create folder if it doesn't exist
         os.makedirs(folder_name, exist_ok=True, mode=0o777)
 
-        for i, name in enumerate(trace_names):
-            if name not in os.listdir(folder_name):
-                with open(f"{folder_name}/{name}", mode="w") as f:
-                    for j, v in enumerate(in_gigs):
-                        print(v, start_freq)
-                        if v < start_freq:
-                            continue
-
-                        h = (
-                            str(v)
-                            + self.sep
-                            + str(trace_values[j + (i * steps)])
-                            + "\n"
-                        )
-                        f.write(h)
+        band = band_slice(in_gigs, start_freq, end_freq, include_next=True)
+        freqs = in_gigs[band]
 
-                        if v >= end_freq:
-                            break
+        for i, name in enumerate(trace_names):
+            values = trace_values[band.start + (i * steps) : band.stop + (i * steps)]
+            with open(f"{folder_name}/{name}", mode="w") as f:
+                f.write("".join(f"{v}{self.sep}{x}\n" for v, x in zip(freqs, values)))
 
     def save_traces(self, state, folder_name, start_freq, end_freq):
         """
@@ -160,8 +424,11 @@ class BaseVNA(ABC):
             folder_name (str): Directory to store trace CSV files.
             start_freq (float): Start frequency in GHz.
             end_freq (float): End frequency in GHz.
+
+        Returns:
+            list: All trace values as fetched, for further processing
         """
-        in_gigs, trace_names = self.get_trace_info(start_freq, end_freq)
+        in_gigs, trace_names = self.cached_trace_info(start_freq, end_freq)
         steps = len(in_gigs)
 
         trace_values = self.get_trace_data()
@@ -169,19 +436,16 @@ class BaseVNA(ABC):
         # Create folder if it doesn't exist
         os.makedirs(folder_name, exist_ok=True, mode=0o777)
 
+        # Band indices are cached so that files appended to later (e.g. when a
+        # sweep is resumed) use the same columns as the header
+        if self.start_index is None or self.stop_index is None:
+            band = band_slice(in_gigs, start_freq, end_freq)
+            self.start_index = band.start
+            self.stop_index = band.stop - 1
+
         for i, name in enumerate(trace_names):
-            if name not in os.listdir(folder_name):
+            if not os.path.exists(f"{folder_name}/{name}"):
                 with open(f"{folder_name}/{name}", mode="w") as f:
-                    for j, v in enumerate(in_gigs):
-                        if v >= start_freq and self.start_index is None:
-                            self.start_index = j
-                        if v == end_freq and self.stop_index is None:
-                            self.stop_index = j
-                            break
-                        elif v > end_freq and self.stop_index is None:
-                            self.stop_index = j - 1
-                            break
-
                     h = (
                         self.sep
                         + self.sep.join(
@@ -215,6 +479,8 @@ class BaseVNA(ABC):
                 )
                 f.write(vals)
 
+        return trace_values
+
     def write_command(self, command):
         try:
             self.instru.write(command)
@@ -231,12 +497,325 @@ class BaseVNA(ABC):
             print(f"[ERROR] {e}")
             return False
 
+    def run_batch(self, commands):
+        """
+        Sends several commands as one message, joined with ";:" so that each
+        starts from the root of the command tree, and ends it with *OPC? and
+        SYST:ERR?. A clean batch therefore costs a single round-trip; the error
+        queue is only read further if an error was reported.
+
+        Args:
+            commands (list[str]): SCPI commands (no queries).
+
+        Returns:
+            list[str]: Errors reported by the instrument, empty on success
+        """
+        if not commands:
+            return []
+
+        message = ";:".join(command.strip().lstrip(":") for command in commands)
+        try:
+            response = self.instru.query(f":{message};*OPC?;:SYST:ERR?")
+        except Exception as e:
+            print(f"[ERROR] {e}")
+            return [str(e)]
+
+        errors = []
+        error = response.partition(";")[2].strip()
+        for _ in range(MAX_ERROR_DRAIN):
+            if not error or self.is_no_error(error):
+                break
+            print(f"[ERROR] VNA reported: {error}")
+            errors.append(error)
+            try:
+                error = self.instru.query("SYST:ERR?").strip()
+            except Exception as e:
+                print(f"[ERROR] {e}")
+                break
+        return errors
+
+    def query_batch(self, units):
+        """
+        Sends several message units as one message and returns the responses
+        of the queries among them, in order. Commands between the queries
+        (e.g. selecting a trace) produce no response.
+
+        Args:
+            units (list[str]): SCPI queries and commands.
+
+        Returns:
+            list[str]: One response per query
+        """
+        message = ";:".join(unit.strip().lstrip(":") for unit in units)
+        response = self.instru.query(f":{message}")
+        return [part.strip() for part in response.strip().split(";")]
+
+    @staticmethod
+    def is_no_error(error):
+        """True if a SYST:ERR? response is the "no error" entry"""
+        try:
+            return int(error.split(",", 1)[0]) == 0
+        except ValueError:
+            return False
+
+    def configure(
+        self, start_freq, stop_freq, points, average, traces=(), channel=1, power=None
+    ):
+        """
+        Applies the sweep settings of a channel and creates its traces in a
+        single batch. A channel other than 1 is created if it does not exist.
+
+        Args:
+            start_freq (float): Start frequency in GHz.
+            stop_freq (float): Stop frequency in GHz.
+            points (int): Number of sweep points, None to keep the
+                instrument's.
+            average (int): Averaging count, None to keep the instrument's.
+            traces (list[tuple], optional): (name, parameter, unit) of every
+                trace to create, unit being "db" or "deg".
+            channel (int, optional): VNA channel. Defaults to 1.
+            power (float, optional): Source power in dBm. Defaults to None
+                (unchanged).
+
+        Returns:
+            list[str]: Errors reported by the instrument, empty on success
+        """
+        # The setup changes, cached sweep information is no longer valid
+        if self.sweep_cache is not None:
+            self.sweep_cache.clear()
+
+        commands = [
+            f"SENS{channel}:FREQ:START {start_freq * 10**9}",
+            f"SENS{channel}:FREQ:STOP {stop_freq * 10**9}",
+        ]
+        if points is not None:
+            commands.append(f"SENS{channel}:SWE:POIN {points:g}")
+        if average is not None:
+            commands.append(f"SENS{channel}:AVER:COUN {average:g}")
+        if power is not None:
+            commands.append(f"SOUR{channel}:POW {power:g}")
+        return self.run_batch(
+            self.channel_commands(channel)
+            + commands
+            + self.trace_commands(traces, channel)
+        )
+
+    def channel_commands(self, channel):
+        """
+        Returns the commands that create a channel, for use in a batch.
+        Vendors that need them override this.
+
+        Args:
+            channel (int): VNA channel.
+
+        Returns:
+            list[str]: SCPI commands
+        """
+        return []
+
+    def trace_commands(self, traces, channel=1):
+        """
+        Returns the commands that create traces, for use in a batch. Vendors
+        that support creating traces override this.
+
+        Args:
+            traces (list[tuple]): (name, parameter, unit) of every trace.
+            channel (int, optional): VNA channel. Defaults to 1.
+
+        Returns:
+            list[str]: SCPI commands
+        """
+        return []
+
+    def store_command(self, file_name, channel=1):
+        """
+        Returns the command that stores the formatted traces of a channel to
+        a CSV file on the instrument, or None if the vendor does not support
+        it.
+
+        Args:
+            file_name (str): File on the instrument.
+            channel (int, optional): VNA channel. Defaults to 1.
+
+        Returns:
+            str or None: SCPI command
+        """
+        return None
+
+    def store_trace_data(self, file_name, channel=1):
+        """
+        Stores the current traces of a channel to a file on the instrument.
+        Costs a single round-trip, which also waits for the file to be
+        written.
+
+        Args:
+            file_name (str): File on the instrument.
+            channel (int, optional): VNA channel. Defaults to 1.
+
+        Returns:
+            list[str]: Errors reported by the instrument, empty on success
+        """
+        command = self.store_command(file_name, channel)
+        if command is None:
+            return [f"{self.get_vendor_name()} VNA cannot store traces"]
+        return self.run_batch([command])
+
+    def read_stored_file(self, file_name):
+        """
+        Transfers a file from the instrument.
+
+        Args:
+            file_name (str): File on the instrument.
+
+        Returns:
+            str: File contents
+        """
+        data = self.instru.query_binary_values(
+            self.FILE_QUERY.format(file=file_name), datatype="B", container=bytes
+        )
+        return data.decode(errors="replace")
+
+    def delete_stored_file(self, file_name):
+        """Deletes a file on the instrument, ignoring failures"""
+        return self.write_command(f"MMEM:DEL '{file_name}'")
+
+    def screen_targets(self):
+        """
+        Returns, for every trace of channel 1, what the screening commands
+        address, or None if the vendor does not support screening.
+
+        Returns:
+            list[tuple] or None: (command selecting the trace or None, command
+                prefix of the trace, trace label)
+        """
+        return None
+
+    def search_commands(self, prefix, marker, search):
+        """
+        Returns the commands that make a marker track the minimum or maximum
+        of its trace.
+
+        Args:
+            prefix (str): Command prefix of the trace.
+            marker (int): Marker number.
+            search (str): "min" or "max".
+
+        Returns:
+            list[str]: SCPI commands
+        """
+        return []
+
+    def screen_program(self, markers, search=None, limits=None, band=None):
+        """
+        Builds the commands that set up markers and limit lines on every trace
+        of channel 1 and the message units that read them back in a single
+        query. For every trace the read-back holds the value at each marker
+        frequency, then the search marker if search is set, then the limit
+        fail flag if the trace has limits.
+
+        Args:
+            markers (list[float]): Marker frequencies in GHz.
+            search (str, optional): "min" or "max" adds a marker tracking the
+                trace minimum or maximum. Defaults to None.
+            limits (list, optional): Per trace, None or [lower, upper] with
+                either bound None. Defaults to None.
+            band (tuple, optional): (start, stop) in GHz the limits apply to.
+
+        Returns:
+            tuple or None: (setup commands, read-back units, column names),
+                None if the vendor does not support screening
+        """
+        targets = self.screen_targets()
+        if targets is None:
+            return None
+
+        setup, queries, columns = [], [], []
+        for i, (select, prefix, label) in enumerate(targets):
+            if select:
+                setup.append(select)
+                queries.append(select)
+
+            for n, freq in enumerate(markers, start=1):
+                setup += [
+                    f"{prefix}:MARK{n}:STAT ON",
+                    f"{prefix}:MARK{n}:X {freq * 10**9}",
+                ]
+                queries.append(f"{prefix}:MARK{n}:Y?")
+                columns.append(f"{label} {freq} GHz")
+
+            if search:
+                n = len(markers) + 1
+                setup.append(f"{prefix}:MARK{n}:STAT ON")
+                setup += self.search_commands(prefix, n, search)
+                queries.append(f"{prefix}:MARK{n}:Y?")
+                columns.append(f"{label} {search}")
+
+            limit = limits[i] if limits and i < len(limits) else None
+            if limit and band is not None:
+                start, stop = (f * 10**9 for f in band)
+                lower, upper = limit
+                segments = []
+                if upper is not None:
+                    segments.append(f"1,{start},{stop},{upper},{upper}")
+                if lower is not None:
+                    segments.append(f"2,{start},{stop},{lower},{lower}")
+                setup += [
+                    f"{prefix}:LIM:DATA {','.join(segments)}",
+                    f"{prefix}:LIM:STAT ON",
+                ]
+                queries.append(f"{prefix}:LIM:FAIL?")
+                columns.append(f"{label} limit fail")
+
+        return setup, queries, columns
+
+    @staticmethod
+    def parse_stored_traces(text, traces):
+        """
+        Reads the trace values out of a CSV file stored by the instrument.
+        Lines that are not all numbers (comments, headers, section markers)
+        are skipped. The first column is the stimulus; when every trace has
+        two columns (as in formatted R&S files), the first of each pair is
+        the formatted value.
+
+        Args:
+            text (str): File contents.
+            traces (int): Number of traces in the file.
+
+        Returns:
+            list[float]: Trace values, trace after trace as in get_trace_data
+
+        Raises:
+            ValueError: If the file does not hold the expected traces.
+        """
+        rows = []
+        for line in text.splitlines():
+            fields = [x for x in line.replace(";", ",").split(",") if x.strip()]
+            try:
+                rows.append([float(x) for x in fields])
+            except ValueError:
+                continue
+
+        columns = list(zip(*rows))[1:]
+        if len(columns) == 2 * traces:
+            columns = columns[0::2]
+        if not rows or len(columns) != traces:
+            raise ValueError(
+                f"Stored file has {len(columns)} value columns, expected {traces}"
+            )
+
+        return [value for column in columns for value in column]
+
 
 class RohdeSchwartzVNA(BaseVNA):
     """
     Implementation for Rohde & Schwarz VNAs.
     """
 
+    TRACE_CATALOG_QUERY = "CONF:TRAC:CAT?"
+    # The trace catalog holds names only, this lists each trace's S-parameter
+    PARAMETER_CATALOG_QUERY = "CALC1:PAR:CAT?"
+    FILE_QUERY = "MMEM:DATA? '{file}'"
+
     def is_compatible_vna(self, idn_response):
         """Check if the instrument is a compatible Rohde & Schwarz VNA"""
         if idn_response[0] == "Rohde-Schwarz":
@@ -252,30 +831,92 @@ class RohdeSchwartzVNA(BaseVNA):
         """Return vendor name"""
         return "Rohde & Schwarz"
 
-    def get_trace_info(self, start_freq=None, stop_freq=None):
+    def get_trace_info(self, start_freq=None, stop_freq=None, channel=1):
         """
         Retrieves frequency points and trace metadata from R&S VNA.
         """
-        freq_points = self.instru.query("TRAC:STIM? CH1DATA").split(",")
+        freq_points = self.instru.query(f"TRAC:STIM? CH{channel}DATA").split(",")
         in_gigs = [float(freq_point) / 1000000000 for freq_point in freq_points]
 
-        trace_id_name = self.instru.query("CONF:TRAC:CAT?").split(",")
+        trace_id_name = self.instru.query(f"CONF:CHAN{channel}:TRAC:CAT?").split(",")
         trace_id_name = list(map(lambda x: str(x).strip(), trace_id_name))
 
         trace_names = []
         for i in range(1, len(trace_id_name), 2):
             if start_freq is None and stop_freq is None:
-                trace_names.append(f"{in_gigs[0]}-{in_gigs[-1]}_{trace_id_name[i]}.csv")
+                trace_names.append(
+                    self.trace_file_name(
+                        in_gigs[0], in_gigs[-1], trace_id_name[i], channel
+                    )
+                )
             elif start_freq is not None and stop_freq is not None:
-                trace_names.append(f"{start_freq}-{stop_freq}_{trace_id_name[i]}.csv")
+                trace_names.append(
+                    self.trace_file_name(
+                        start_freq, stop_freq, trace_id_name[i], channel
+                    )
+                )
 
         return in_gigs, trace_names
 
-    def get_trace_data(self):
-        """Get trace data from R&S VNA"""
-        trace_values = self.instru.query("CALCulate1:DATA:ALL? FDAT").split(",")
+    def get_trace_data(self, channel=1):
+        """Get trace data of a channel from R&S VNA"""
+        if channel == 1 and len(self.cached_channels()) <= 1:
+            query = "CALCulate1:DATA:ALL? FDAT"
+        else:
+            # DATA:ALL? covers every channel of the setup; this reads the
+            # formatted traces of this channel only, in catalog order
+            query = f"CALC{channel}:DATA:CHAN:ALL? FDAT"
+        trace_values = self.instru.query(query).split(",")
         return list(map(float, trace_values))
 
+    def get_trace_formats(self, channel=1):
+        """Get the format of every trace of a channel from R&S VNA"""
+        trace_id_name = self.instru.query(f"CONF:CHAN{channel}:TRAC:CAT?").split(",")
+        trace_id_name = list(map(lambda x: str(x).strip().strip("'"), trace_id_name))
+
+        formats = []
+        for i in range(1, len(trace_id_name), 2):
+            self.instru.write(f"CALC{channel}:PAR:SEL '{trace_id_name[i]}'")
+            formats.append(self.instru.query(f"CALC{channel}:FORM?").strip())
+        return formats
+
+    def get_channels(self):
+        """Get the numbers of the channels set up on the R&S VNA"""
+        catalog = self.instru.query("CONF:CHAN:CAT?").strip().strip("'").split(",")
+        return sorted(int(catalog[i]) for i in range(0, len(catalog), 2))
+
+    def channel_commands(self, channel):
+        """Creates the channel on the R&S VNA"""
+        if channel == 1:
+            return []
+        return [f"CONF:CHAN{channel} ON"]
+
+    def screen_targets(self):
+        """Screening addresses the selected trace of channel 1 on R&S VNA"""
+        catalog = self.instru.query("CONF:CHAN1:TRAC:CAT?").split(",")
+        catalog = list(map(lambda x: str(x).strip().strip("'"), catalog))
+        return [
+            (f"CALC1:PAR:SEL '{catalog[i]}'", "CALC1", catalog[i])
+            for i in range(1, len(catalog), 2)
+        ]
+
+    def search_commands(self, prefix, marker, search):
+        """Marker search with tracking on R&S VNA"""
+        return [
+            f"{prefix}:MARK{marker}:FUNC:EXEC {search.upper()}",
+            f"{prefix}:MARK{marker}:SEAR:TRAC ON",
+        ]
+
+    def store_command(self, file_name, channel=1):
+        """Stores the formatted traces of a channel as CSV on the R&S VNA"""
+        return f"MMEM:STOR:TRAC:CHAN {channel}, '{file_name}', FORM, COMP, POIN, COMM"
+
+    def get_marker_values(self):
+        """Get marker 1 readout from R&S VNA"""
+        self.instru.write("CALC1:MARK1 ON")
+        values = self.instru.query("CALC1:MARK1:Y?").split(",")
+        return list(map(float, values))
+
     def create_trace(self, name, parameter, unit):
         pass
 
@@ -285,6 +926,10 @@ class KeysightVNA(BaseVNA):
     Implementation for Keysight VNAs.
     """
 
+    TRACE_CATALOG_QUERY = "CALC:PAR:CAT?"
+    PARAMETER_CATALOG_QUERY = "CALC:PAR:CAT?"
+    FILE_QUERY = "MMEM:TRAN? '{file}'"
+
     def is_compatible_vna(self, idn_response):
         """Check if the instrument is a compatible Keysight VNA"""
         if (
@@ -298,10 +943,13 @@ class KeysightVNA(BaseVNA):
         """Return vendor name"""
         return "Keysight"
 
-    def get_trace_info(self, start_freq=None, stop_freq=None):
+    def get_trace_info(self, start_freq=None, stop_freq=None, channel=1):
         """
         Retrieves frequency points and trace metadata from Keysight VNA.
         """
+        if channel != 1:
+            return self.get_channel_trace_info(start_freq, stop_freq, channel)
+
         trace_info = self.instru.query("CALC:PAR:CAT?").split(",")
         print(trace_info)
         only_trace_names = []
@@ -334,8 +982,40 @@ class KeysightVNA(BaseVNA):
 
         return in_gigs, trace_names
 
-    def get_trace_data(self):
-        """Get trace data from Keysight VNA"""
+    def get_channel_trace_info(self, start_freq, stop_freq, channel):
+        """
+        Retrieves frequency points and trace metadata of a channel other than
+        1 from Keysight VNA.
+        """
+        numbers = self.measurement_numbers(channel)
+        freq_points = self.instru.query(f"SENS{channel}:X?").split(",")
+        in_gigs = [float(freq_point) / 1000000000 for freq_point in freq_points]
+
+        if start_freq is None and stop_freq is None:
+            start_freq, stop_freq = in_gigs[0], in_gigs[-1]
+        trace_names = [
+            self.trace_file_name(start_freq, stop_freq, f"Trc{i + 1}", channel)
+            for i in range(len(numbers))
+        ]
+        return in_gigs, trace_names
+
+    def measurement_numbers(self, channel):
+        """Numbers of the measurements of a channel on Keysight VNA"""
+        catalog = self.instru.query(f"SYST:MEAS:CAT? {channel}").strip().strip('"')
+        return [int(n) for n in catalog.split(",") if n.strip()]
+
+    def get_channels(self):
+        """Get the numbers of the channels set up on the Keysight VNA"""
+        catalog = self.instru.query("SYST:CHAN:CAT?").strip().strip('"')
+        return sorted(int(n) for n in catalog.split(",") if n.strip())
+
+    def get_trace_data(self, channel=1):
+        """Get trace data of a channel from Keysight VNA"""
+        if channel != 1:
+            numbers = ",".join(map(str, self.measurement_numbers(channel)))
+            d = self.instru.query(f'CALC{channel}:DATA:MFD? "{numbers}"')
+            return list(map(float, d.strip().split(",")))
+
         # Make sure we're getting data in the right format
         trace_info = self.instru.query("CALC:PAR:CAT?").split(",")
         # print(trace_info)
@@ -356,55 +1036,216 @@ class KeysightVNA(BaseVNA):
 
         return all_data
 
+    def get_trace_formats(self, channel=1):
+        """Get the format of every measurement of a channel from Keysight VNA"""
+        if channel == 1:
+            trace_info = self.instru.query("CALC:PAR:CAT?").split(",")
+            numbers = range(1, int(len(trace_info) // 2) + 1)
+        else:
+            numbers = self.measurement_numbers(channel)
+        return [self.instru.query(f"CALC:MEAS{i}:FORM?").strip() for i in numbers]
+
+    def get_marker_values(self):
+        """Get marker 1 readout of every measurement from Keysight VNA"""
+        trace_info = self.instru.query("CALC:PAR:CAT?").split(",")
+        values = []
+
+        for i in range(1, int(len(trace_info) // 2) + 1):
+            self.instru.write(f"CALC:MEAS{i}:MARK1 ON")
+            d = self.instru.query(f"CALC:MEAS{i}:MARK1:Y?")
+            values.extend(list(map(float, d.strip().split(","))))
+
+        return values
+
     def create_trace(self, name, parameter, unit):
-        command = f"CALC:PAR:DEF:EXT '{name}', '{parameter}'"  # create Trace
-        try:
-            self.instru.write(command)
-        except Exception as e:
+        if self.run_batch(self.trace_commands([(name, parameter, unit)])):
             print("[ERROR] Invalid parameter or Trace with name already exists")
-            print(e)
-            return
 
-        count = self.instru.query("CALC:PAR:COUN?")  # get number of traces
-        count = int(count)
-        if unit == "deg":
-            self.instru.write(f"CALC:MEAS{count}:FORM PHAS")
+    def trace_commands(self, traces, channel=1):
+        """
+        Builds the commands creating, formatting and displaying traces. New
+        measurements are numbered after the highest existing one of any
+        channel, since measurement numbers are global, so the catalog is
+        queried once for the whole batch. Defining a measurement in a channel
+        that does not exist yet creates the channel.
+        """
+        if not traces:
+            return []
+
+        catalog = self.instru.query("SYST:MEAS:CAT?").strip().strip('"')
+        count = max([int(n) for n in catalog.split(",") if n.strip()], default=0)
+        commands = []
+        for number, (name, parameter, unit) in enumerate(traces, start=count + 1):
+            commands.append(f"CALC{channel}:PAR:DEF:EXT '{name}', '{parameter}'")
+            if unit == "deg":
+                commands.append(f"CALC:MEAS{number}:FORM PHAS")
+            commands.append(f"DISP:WIND:TRAC{number}:FEED '{name}'")
+        return commands
+
+    def screen_targets(self):
+        """Screening addresses every measurement of channel 1 on Keysight VNA"""
+        trace_info = self.instru.query("CALC:PAR:CAT?").split(",")
+        return [
+            (None, f"CALC:MEAS{i}", f"Trc{i}")
+            for i in range(1, int(len(trace_info) // 2) + 1)
+        ]
 
-        command = f"DISP:WIND:TRAC{count}:FEED '{name}'"  # Display trace
+    def search_commands(self, prefix, marker, search):
+        """Marker search with tracking on Keysight VNA"""
+        return [
+            f"{prefix}:MARK{marker}:FUNC:SEL {search.upper()}",
+            f"{prefix}:MARK{marker}:FUNC:TRAC ON",
+        ]
 
-        try:
-            self.instru.write(command)
-        except Exception as e:
-            print(e)
+    def store_command(self, file_name, channel=1):
+        """Stores the displayed traces of a channel as CSV on the Keysight VNA"""
+        return f"MMEM:STOR:DATA '{file_name}','CSV Formatted Data','Channel','Displayed',{channel}"
 
 
 class VNAFactory:
     """
     Factory class to create appropriate VNA instance based on available hardware.
+
+    All resources are probed in a single concurrent pass with a short timeout and
+    each responding instrument is offered to the vendor classes in order. The
+    resource string of the last successful connection is remembered and tried
+    on its own before the full scan.
     """
 
     @staticmethod
-    def create_vna():
+    def create_vna(vna_classes=None, timeout=PROBE_TIMEOUT_MS):
         """
         Try to connect to available VNAs and return the appropriate instance.
 
+        Args:
+            vna_classes (tuple, optional): VNA classes to match against, in order
+                of preference. Defaults to Rohde & Schwarz then Keysight.
+            timeout (int, optional): Probe timeout in milliseconds.
+
         Returns:
             BaseVNA: Instance of a VNA class that successfully connected
         """
-        # Try Rohde & Schwarz first
-        vna = RohdeSchwartzVNA()
-        if vna.initialize_vna():
-            return vna
+        import pyvisa as visa
+
+        if vna_classes is None:
+            vna_classes = (RohdeSchwartzVNA, KeysightVNA)
 
-        # Try Keysight next
-        vna = KeysightVNA()
-        if vna.initialize_vna():
-            return vna
+        rm = visa.ResourceManager()
+        try:
+            resources = list(rm.list_resources())
+        except Exception as e:
+            print(f"[ERROR] Could not list VISA resources: {e}")
+            resources = []
+
+        # Try the remembered resource first
+        last_resource = VNAFactory.load_last_resource()
+        if last_resource in resources:
+            vna = VNAFactory.probe_resource(rm, last_resource, vna_classes, timeout)
+            if vna is not None:
+                return vna
+            resources.remove(last_resource)
+
+        if resources:
+            workers = min(PROBE_WORKERS, len(resources))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                found = list(
+                    pool.map(
+                        lambda r: VNAFactory.probe_resource(
+                            rm, r, vna_classes, timeout
+                        ),
+                        resources,
+                    )
+                )
+
+            # Keep the first match in resource order, release the others
+            matches = [vna for vna in found if vna is not None]
+            for extra in matches[1:]:
+                try:
+                    extra.instru.close()
+                except Exception:
+                    pass
+
+            if matches:
+                VNAFactory.save_last_resource(matches[0])
+                return matches[0]
 
         # If no compatible VNA is found, return None
         print("No compatible VNA found")
         return None
 
+    @staticmethod
+    def probe_resource(rm, resource_name, vna_classes, timeout=PROBE_TIMEOUT_MS):
+        """
+        Opens a single resource with a short timeout, sends *IDN? and hands it to
+        the first matching VNA class.
+
+        Args:
+            rm (ResourceManager): Resource manager used to open the resource.
+            resource_name (str): VISA resource string.
+            vna_classes (tuple): VNA classes to match against.
+            timeout (int, optional): Probe timeout in milliseconds.
+
+        Returns:
+            BaseVNA or None: Connected VNA instance, None if nothing matched
+        """
+        try:
+            instru = rm.open_resource(resource_name, open_timeout=timeout)
+        except Exception:
+            return None
+
+        try:
+            default_timeout = instru.timeout
+            instru.timeout = timeout
+            res = instru.query("*IDN?").split(",")
+
+            for vna_class in vna_classes:
+                vna = vna_class()
+                if vna.attach(rm, instru, resource_name, res):
+                    instru.timeout = default_timeout
+                    return vna
+        except Exception:
+            # print(f"Error connecting to {resource_name}: {e}")
+            pass
+
+        try:
+            instru.close()
+        except Exception:
+            pass
+        return None
+
+    @staticmethod
+    def load_last_resource():
+        """
+        Returns the resource string of the last connected VNA, or None.
+        """
+        try:
+            with open(VNA_CACHE_FILE, "r") as f:
+                return json.load(f).get("resource")
+        except Exception:
+            return None
+
+    @staticmethod
+    def save_last_resource(vna):
+        """
+        Remembers the resource string of a connected VNA for the next start.
+
+        Args:
+            vna (BaseVNA): Connected VNA instance.
+        """
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(VNA_CACHE_FILE, "w") as f:
+                json.dump(
+                    {
+                        "resource": vna.resource_name,
+                        "vendor": vna.get_vendor_name(),
+                    },
+                    f,
+                    indent=4,
+                )
+        except Exception as e:
+            print(f"[WARN] Could not remember VNA resource: {e}")
+
 
 # For backwards compatibility with existing code
 class VNA(BaseVNA):
@@ -428,7 +1269,9 @@ class VNA(BaseVNA):
         self._impl = VNAFactory.create_vna()
         if self._impl:
             self.connected = True
+            self.rm = self._impl.rm
             self.instru = self._impl.instru
+            self.resource_name = self._impl.resource_name
             return True
         return False
 
@@ -444,16 +1287,34 @@ class VNA(BaseVNA):
             return self._impl.get_vendor_name()
         return "Unknown"
 
-    def get_trace_info(self, start_freq=None, stop_freq=None):
+    def get_trace_info(self, start_freq=None, stop_freq=None, channel=1):
         """Delegate to implementation"""
         if self._impl:
-            return self._impl.get_trace_info(start_freq, stop_freq)
+            return self._impl.get_trace_info(start_freq, stop_freq, channel)
         return [15.5, 17.5], "hehe"  # Original debug values
 
-    def get_trace_data(self):
+    def get_trace_data(self, channel=1):
+        """Delegate to implementation"""
+        if self._impl:
+            return self._impl.get_trace_data(channel)
+        return []
+
+    def get_trace_formats(self, channel=1):
+        """Delegate to implementation"""
+        if self._impl:
+            return self._impl.get_trace_formats(channel)
+        return []
+
+    def get_channels(self):
         """Delegate to implementation"""
         if self._impl:
-            return self._impl.get_trace_data()
+            return self._impl.get_channels()
+        return [1]
+
+    def get_marker_values(self):
+        """Delegate to implementation"""
+        if self._impl:
+            return self._impl.get_marker_values()
         return []
 
     def save_traces_amp(self, folder_name, start_freq, end_freq):
@@ -464,11 +1325,75 @@ class VNA(BaseVNA):
     def save_traces(self, state, folder_name, start_freq, end_freq):
         """Delegate to implementation"""
         if self._impl:
-            self._impl.save_traces(state, folder_name, start_freq, end_freq)
+            return self._impl.save_traces(state, folder_name, start_freq, end_freq)
+        return []
+
+    def reset_indices(self):
+        """Delegate to implementation"""
+        super().reset_indices()
+        if self._impl:
+            self._impl.reset_indices()
+
+    def release(self):
+        """Delegate to implementation"""
+        if self._impl:
+            self._impl.release()
+
+    def reopen(self):
+        """Delegate to implementation"""
+        if self._impl:
+            self._impl.reopen()
+            self.instru = self._impl.instru
+
+    def get_configuration(self):
+        """Delegate to implementation"""
+        if self._impl:
+            return self._impl.get_configuration()
+        return {}
 
     def create_trace(self, name, parameter, unit):
         self._impl.create_trace(name, parameter, unit)
 
+    def hold_sweep_info(self, hold=True):
+        """Hold the sweep cache here and in the implementation"""
+        super().hold_sweep_info(hold)
+        if self._impl:
+            self._impl.hold_sweep_info(hold)
+
+    def channel_commands(self, channel):
+        """Delegate to implementation"""
+        if self._impl:
+            return self._impl.channel_commands(channel)
+        return []
+
+    def store_command(self, file_name, channel=1):
+        """Delegate to implementation"""
+        if self._impl:
+            return self._impl.store_command(file_name, channel)
+        return None
+
+    def read_stored_file(self, file_name):
+        """Delegate to implementation"""
+        return self._impl.read_stored_file(file_name)
+
+    def screen_targets(self):
+        """Delegate to implementation"""
+        if self._impl:
+            return self._impl.screen_targets()
+        return None
+
+    def search_commands(self, prefix, marker, search):
+        """Delegate to implementation"""
+        if self._impl:
+            return self._impl.search_commands(prefix, marker, search)
+        return []
+
+    def trace_commands(self, traces, channel=1):
+        """Delegate to implementation"""
+        if self._impl:
+            return self._impl.trace_commands(traces, channel)
+        return []
+
 
 if __name__ == "__main__":
     v = VNA()